@@ -0,0 +1,297 @@
+import logging
+import datetime
+import numpy as np
+
+from dates import to_datetime
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+FETCH_BATCH_SIZE = 5000
+
+# Dimensions analyze_expenses can group by
+DIMENSIONS = ("year", "month", "weekday", "category", "payment_method")
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Upper bound on groups returned in one response
+MAX_GROUPS = 500
+# Upper bound on points per series returned by spending_trends
+MAX_POINTS = 366
+
+
+class Snapshot:
+    """Columnar, dictionary-encoded copy of the expenses in a date range.
+
+    amounts are float64, days are int32 days since 1970-01-01, and
+    categories / payment methods are int32 codes into small lookup tables.
+    """
+
+    def __init__(self, start: str, end: str, amounts, days, categories, category_codes,
+                 payment_methods, payment_method_codes):
+        self.start = start
+        self.end = end
+        self.amounts = amounts
+        self.days = days
+        self.categories = categories
+        self.category_codes = category_codes
+        self.payment_methods = payment_methods
+        self.payment_method_codes = payment_method_codes
+
+    @property
+    def rows(self) -> int:
+        return len(self.amounts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.amounts.nbytes + self.days.nbytes + self.category_codes.nbytes + self.payment_method_codes.nbytes
+
+    def mask(self, start: str, end: str, category=None):
+        """Boolean row mask for a sub-range (and optionally one category)."""
+        first = (to_datetime(start) - EPOCH).days
+        last = (to_datetime(end) - EPOCH).days
+        mask = (self.days >= first) & (self.days <= last)
+
+        if category is not None:
+            code = self.categories.index(category) if category in self.categories else -1
+            mask &= self.category_codes == code
+        return mask
+
+
+async def load_snapshot(collection, start: str, end: str, extra_filter=None) -> Snapshot:
+    """Stream a date range out of MongoDB straight into columnar arrays."""
+    query = {"date_at": {"$gte": to_datetime(start), "$lte": to_datetime(end)}}
+    if extra_filter:
+        query.update(extra_filter)
+
+    amounts, days, category_codes, payment_method_codes = [], [], [], []
+    category_index, payment_method_index = {}, {}
+
+    cursor = collection.find(
+        query,
+        {"_id": 0, "date_at": 1, "amount": 1, "category": 1, "payment_method": 1}
+    ).batch_size(FETCH_BATCH_SIZE)
+
+    async for doc in cursor:
+        amounts.append(doc.get("amount") or 0.0)
+        days.append((doc["date_at"] - EPOCH).days)
+        category_codes.append(category_index.setdefault(doc.get("category"), len(category_index)))
+        payment_method_codes.append(payment_method_index.setdefault(doc.get("payment_method"), len(payment_method_index)))
+
+    return Snapshot(
+        start, end,
+        np.asarray(amounts, dtype=np.float64),
+        np.asarray(days, dtype=np.int32),
+        list(category_index),
+        np.asarray(category_codes, dtype=np.int32),
+        list(payment_method_index),
+        np.asarray(payment_method_codes, dtype=np.int32)
+    )
+
+
+class SnapshotStore:
+    """Snapshots cached by date range, bounded by count and array bytes.
+
+    A request for a range inside a cached snapshot's range is answered
+    from that snapshot with a row mask instead of a new fetch.
+    """
+
+    def __init__(self, max_entries: int = 4, max_bytes: int = 256 * 1024 * 1024):
+        self.cache = ResultCache(max_entries, max_bytes, size_of=lambda snapshot: snapshot.nbytes)
+
+    async def get(self, collection, start: str, end: str, scope=None, extra_filter=None) -> tuple:
+        """Return (snapshot, cached) covering [start, end]."""
+        kind = ("snapshot", scope)
+        snapshot = self.cache.get_covering(kind, start, end)
+        if snapshot is not None:
+            return snapshot, True
+
+        generation = self.cache.generation
+        snapshot = await load_snapshot(collection, start, end, extra_filter)
+        self.cache.put((kind, start, end), snapshot, start, end, generation)
+        return snapshot, False
+
+    def invalidate_dates(self, dates):
+        self.cache.invalidate_dates(dates)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+def _dimension_codes(snapshot: Snapshot, mask, dimension: str) -> tuple:
+    """(integer code per selected row, code -> label function) for one dimension."""
+    if dimension == "category":
+        return snapshot.category_codes[mask], lambda c: snapshot.categories[c]
+    if dimension == "payment_method":
+        return snapshot.payment_method_codes[mask], lambda c: snapshot.payment_methods[c]
+
+    dates = snapshot.days[mask].astype("datetime64[D]")
+    if dimension == "year":
+        years = dates.astype("datetime64[Y]").astype(np.int64)
+        return years, lambda c: str(1970 + int(c))
+    if dimension == "month":
+        months = dates.astype("datetime64[M]").astype(np.int64)
+        return months, lambda c: str(np.datetime64(int(c), "M"))
+    if dimension == "weekday":
+        # 1970-01-01 was a Thursday
+        weekdays = (snapshot.days[mask].astype(np.int64) + 3) % 7
+        return weekdays, lambda c: WEEKDAYS[int(c)]
+
+    raise ValueError(f"Unknown group_by dimension: {dimension}. Use any of {', '.join(DIMENSIONS)}")
+
+
+def group_by(snapshot: Snapshot, mask, dimensions: list, limit: int = MAX_GROUPS) -> dict:
+    """Sum/count/mean per combination of dimensions, largest sums first."""
+    amounts = snapshot.amounts[mask]
+    if not dimensions or not len(amounts):
+        return {"groups": [], "truncated": False}
+
+    columns, labels = zip(*(_dimension_codes(snapshot, mask, d) for d in dimensions))
+    keys, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    sums = np.bincount(inverse, weights=amounts, minlength=len(keys))
+    counts = np.bincount(inverse, minlength=len(keys))
+    order = np.argsort(-sums, kind="stable")[:limit]
+
+    groups = [
+        {
+            **{d: label(code) for d, label, code in zip(dimensions, labels, keys[i])},
+            "total_amount": float(sums[i]),
+            "count": int(counts[i]),
+            "mean": float(sums[i] / counts[i])
+        }
+        for i in order
+    ]
+    return {"groups": groups, "truncated": len(keys) > limit}
+
+
+def percentiles(snapshot: Snapshot, mask, points: list) -> dict:
+    amounts = snapshot.amounts[mask]
+    if not len(amounts):
+        return {}
+    values = np.percentile(amounts, points)
+    return {f"p{p:g}": float(v) for p, v in zip(points, values)}
+
+
+def top_expenses(snapshot: Snapshot, mask, n: int) -> list:
+    """The n largest individual expenses in the selection."""
+    rows = np.flatnonzero(mask)
+    if not len(rows) or n <= 0:
+        return []
+
+    n = min(n, len(rows))
+    amounts = snapshot.amounts[rows]
+    top = rows[np.argpartition(-amounts, n - 1)[:n]]
+    top = top[np.argsort(-snapshot.amounts[top], kind="stable")]
+
+    return [
+        {
+            "date": str(np.datetime64(int(snapshot.days[i]), "D")),
+            "amount": float(snapshot.amounts[i]),
+            "category": snapshot.categories[snapshot.category_codes[i]],
+            "payment_method": snapshot.payment_methods[snapshot.payment_method_codes[i]]
+        }
+        for i in top
+    ]
+
+
+def _round(value):
+    return None if value is None or np.isnan(value) else round(float(value), 2)
+
+
+def _series_points(series, label_format: str, max_points: int, extra=None) -> dict:
+    """Most recent `max_points` of a series as [{period, total, ...}]."""
+    truncated = len(series) > max_points
+    series = series.iloc[-max_points:]
+    extra = {name: col.iloc[-max_points:] for name, col in (extra or {}).items()}
+
+    points = [
+        {
+            "period": period.strftime(label_format),
+            "total": _round(value),
+            **{name: _round(col.iloc[i]) for name, col in extra.items()}
+        }
+        for i, (period, value) in enumerate(series.items())
+    ]
+    return {"points": points, "truncated": truncated}
+
+
+def spending_trends(snapshot: Snapshot, mask, start: str, end: str,
+                    granularity: str = "auto", max_points: int = 120) -> dict:
+    """Daily/weekly/monthly series, rolling averages, MoM/YoY deltas and run rates.
+
+    Everything is derived from one dense daily total series built with a
+    single bincount over the selected rows, so the cost is one pass over
+    the snapshot regardless of how many series are returned.
+    """
+    # Only this tool needs pandas; keep it out of the server's import time
+    import pandas as pd
+
+    max_points = max(1, min(int(max_points), MAX_POINTS))
+    first = (to_datetime(start) - EPOCH).days
+    n_days = (to_datetime(end) - EPOCH).days - first + 1
+
+    days = snapshot.days[mask] - first
+    amounts = snapshot.amounts[mask]
+    index = pd.date_range(start, periods=n_days, freq="D")
+
+    daily = pd.Series(np.bincount(days, weights=amounts, minlength=n_days)[:n_days], index=index)
+    rolling_7 = daily.rolling(7, min_periods=1).mean()
+    rolling_30 = daily.rolling(30, min_periods=1).mean()
+    weekly = daily.resample("W-MON", label="left", closed="left").sum()
+    monthly = daily.resample("MS").sum()
+
+    if granularity == "auto":
+        granularity = "daily" if n_days <= max_points else ("weekly" if len(weekly) <= max_points else "monthly")
+
+    if granularity == "daily":
+        series = _series_points(daily, "%Y-%m-%d", max_points, {"rolling_7d": rolling_7, "rolling_30d": rolling_30})
+    elif granularity == "weekly":
+        series = _series_points(weekly, "%Y-%m-%d", max_points)
+    elif granularity == "monthly":
+        series = _series_points(monthly, "%Y-%m", max_points)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}. Use auto, daily, weekly or monthly")
+
+    monthly_deltas = _series_points(monthly, "%Y-%m", max_points, {
+        "mom_delta": monthly.diff(),
+        "mom_pct": monthly.pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan) * 100,
+        "yoy_delta": monthly.diff(12),
+        "yoy_pct": monthly.pct_change(12, fill_method=None).replace([np.inf, -np.inf], np.nan) * 100
+    })
+
+    # Per-category monthly run rate: over the whole range and over its last 30 days
+    codes = snapshot.category_codes[mask]
+    n_categories = len(snapshot.categories)
+    totals = np.bincount(codes, weights=amounts, minlength=n_categories)
+    recent = days >= n_days - 30
+    recent_totals = np.bincount(codes[recent], weights=amounts[recent], minlength=n_categories)
+    recent_days = min(30, n_days)
+
+    run_rates = sorted(
+        (
+            {
+                "category": snapshot.categories[c],
+                "total": _round(totals[c]),
+                "monthly_run_rate": _round(totals[c] / n_days * 30),
+                "last_30d_monthly_run_rate": _round(recent_totals[c] / recent_days * 30)
+            }
+            for c in range(n_categories) if totals[c]
+        ),
+        key=lambda r: r["total"],
+        reverse=True
+    )
+
+    return {
+        "granularity": granularity,
+        "series": series["points"],
+        "series_truncated": series["truncated"],
+        "rolling_average": {
+            "last_7d": _round(rolling_7.iloc[-1]),
+            "last_30d": _round(rolling_30.iloc[-1])
+        },
+        "monthly": monthly_deltas["points"],
+        "monthly_truncated": monthly_deltas["truncated"],
+        "category_run_rates": run_rates[:MAX_GROUPS]
+    }
@@ -1,12 +1,7 @@
-# from mcp.server.fastmcp import FastMCP
-# from fastmcp import FastMCP
+"""ASGI entry point for running the server under an external ASGI server:
 
+    uvicorn app:app --host 0.0.0.0 --port $PORT
+"""
+from main import create_app
 
-# # Create MCP instance
-# mcp = FastMCP("Expenses-tracker-mcp-server")
-
-# # Import your tools AFTER mcp is created
-# from main import *   # all tools, prompts, resources attach to mcp
-
-# # Create ASGI application
-# app = mcp.http_app()
+app = create_app()
@@ -0,0 +1,121 @@
+"""Payload size and encode time: row dicts vs the compact columnar format.
+
+Builds listing responses from synthetic expenses and encodes them the way
+the server sends them: row responses are pretty-printed by FastMCP
+(pydantic_core.to_json with indent=2), compact responses are returned as
+minified JSON text. Compares the default row format against
+format="compact", with and without a field projection. Sizes beyond the
+1000-row page limit stand for the combined pages of a large range.
+
+    python bench_compact.py --sizes 1000,10000,100000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import statistics
+
+from bson import ObjectId
+import pydantic_core
+
+from bench_tools import RESULTS_DIR, git_commit, synthetic_expenses
+from catalog import CategoryCatalog
+from pagination import compact_json, format_page, serialize_expense
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category.json")
+PROJECTION = ["date", "amount", "category"]
+
+
+def build_rows(size: int, rng: random.Random) -> list:
+    """Serialized expenses exactly as a listing page carries them."""
+    categories = CategoryCatalog(CATEGORIES_PATH).categories
+    rows = []
+    for chunk in synthetic_expenses(size, categories, rng):
+        for doc in chunk:
+            doc.pop("user_id")
+            doc.pop("created_at")
+            doc.pop("search_terms")
+            doc["_id"] = ObjectId()
+            rows.append(serialize_expense(doc))
+    return rows
+
+
+def encode(rows: list, response_format: str, fields) -> str:
+    page = format_page({"expenses": rows, "page_size": len(rows), "has_more": False, "next_cursor": None},
+                       response_format, fields)
+    response = {"status": "success", "count": len(rows), **page}
+    if response_format == "compact":
+        return compact_json(response)
+    return pydantic_core.to_json(response, fallback=str, indent=2).decode()
+
+
+def measure(rows: list, response_format: str, fields, repeats: int) -> dict:
+    if fields is not None:
+        # Projection happens in MongoDB, so it is applied outside the timed part
+        rows = [{f: row.get(f) for f in fields} for row in rows]
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        payload = encode(rows, response_format, fields)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {"bytes": len(payload), "encode_ms": round(statistics.median(timings), 3)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Compare row and compact listing payloads")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated row counts")
+    parser.add_argument("--repeats", type=int, default=5, help="Encodes per variant (median reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: bench_results/compact-<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    variants = {
+        "rows": ("rows", None),
+        "compact": ("compact", None),
+        "rows_projected": ("rows", PROJECTION),
+        "compact_projected": ("compact", PROJECTION),
+    }
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        rows = build_rows(size, rng)
+        results[str(size)] = measured = {
+            name: measure(rows, fmt, fields, args.repeats)
+            for name, (fmt, fields) in variants.items()
+        }
+        base = measured["rows"]
+        print(f"\n{size} rows")
+        print(f"  {'variant':<20} {'bytes':>12} {'vs rows':>8} {'encode ms':>10} {'vs rows':>8}")
+        for name, m in measured.items():
+            m["size_ratio"] = round(m["bytes"] / base["bytes"], 3)
+            m["time_ratio"] = round(m["encode_ms"] / base["encode_ms"], 3) if base["encode_ms"] else None
+            print(f"  {name:<20} {m['bytes']:>12,} {m['size_ratio']:>8.2f} {m['encode_ms']:>10.2f} {m['time_ratio'] or 0:>8.2f}")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "repeats": args.repeats,
+            "projection": PROJECTION,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"compact-{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,83 @@
+"""Micro-benchmark for convert_date.
+
+Compares the old dateutil-only parser with the tiered parser (cold, i.e.
+with the LRU cache cleared before every pass) and with a warm cache.
+
+    python bench_dates.py [--rows 20000]
+"""
+import time
+import random
+import argparse
+import datetime
+from dateutil import parser
+
+import dates
+
+
+def dateutil_only(date_str: str) -> str:
+    """The previous convert_date: every call goes through dateutil."""
+    return parser.parse(date_str, dayfirst=True).strftime("%Y-%m-%d")
+
+
+def dateutil_reference(date_str: str) -> str:
+    """What convert_date must return: dateutil, year first for inputs that start with a year."""
+    if dates.YEAR_FIRST_RE.match(date_str):
+        return parser.parse(date_str, yearfirst=True).strftime("%Y-%m-%d")
+    return parser.parse(date_str, dayfirst=True).strftime("%Y-%m-%d")
+
+
+def realistic_inputs(rows: int, seed: int = 7) -> list:
+    """Mix of formats an LLM client actually sends, weighted towards ISO."""
+    rng = random.Random(seed)
+    start = datetime.date(2023, 1, 1)
+    formats = [
+        (55, lambda d: d.isoformat()),
+        (5, lambda d: f"{d.isoformat()} 10:30"),
+        (15, lambda d: f"{d.day}/{d.month}/{d.year % 100:02d}"),
+        (10, lambda d: d.strftime("%d/%m/%Y")),
+        (10, lambda d: f"{d.strftime('%b')} {d.day} {d.year}"),
+        (5, lambda d: f"{d.day} {d.strftime('%B')}, {d.year}"),
+    ]
+    weights = [w for w, _ in formats]
+
+    inputs = []
+    for _ in range(rows):
+        day = start + datetime.timedelta(days=rng.randrange(3 * 365))
+        _, fmt = rng.choices(formats, weights)[0]
+        inputs.append(fmt(day))
+    return inputs
+
+
+def run(label: str, fn, inputs: list, before_pass=None, passes: int = 3) -> float:
+    best = float("inf")
+    for _ in range(passes):
+        if before_pass:
+            before_pass()
+        t0 = time.perf_counter()
+        for value in inputs:
+            fn(value)
+        best = min(best, time.perf_counter() - t0)
+
+    per_call = best / len(inputs) * 1e6
+    print(f"{label:<28} {best * 1000:>10.1f} ms {per_call:>10.2f} us/call")
+    return best
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--rows", type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    inputs = realistic_inputs(args.rows)
+
+    # The tiered parser must agree with dateutil on every input
+    mismatches = [v for v in set(inputs) if dates.convert_date(v) != dateutil_reference(v)]
+    if mismatches:
+        raise SystemExit(f"Parsers disagree on: {mismatches[:5]}")
+
+    print(f"{args.rows} inputs, {len(set(inputs))} distinct")
+    baseline = run("dateutil (previous)", dateutil_only, inputs)
+    cold = run("tiered, cold cache", dates.convert_date, inputs, before_pass=dates._convert.cache_clear)
+    warm = run("tiered, warm cache", dates.convert_date, inputs)
+
+    print(f"speedup cold: {baseline / cold:.1f}x, warm: {baseline / warm:.1f}x")
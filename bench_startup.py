@@ -0,0 +1,231 @@
+"""Cold-start benchmark with a budget.
+
+Every run starts a fresh interpreter so nothing is warm:
+
+  * import: `python -X importtime -c "import app"`. Reports the total import
+    time and the slowest modules, and flags modules that are meant to load
+    lazily (pandas, numpy, ...) but were imported at startup.
+  * first call: boots `app:app` with its lifespan, opens an MCP session over
+    streamable HTTP and calls a database-backed tool. The clock runs from
+    interpreter launch to the first successful tool result.
+
+Medians over --runs are compared with the budgets and the script exits 1
+when either budget is exceeded or a lazy module leaked into startup.
+
+    python bench_startup.py
+    python bench_startup.py --import-budget-ms 1500 --first-call-budget-ms 3000
+    python bench_startup.py --mongo-url mongodb://127.0.0.1:27017
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Modules only some tools need; importing any of them at startup is a regression
+LAZY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "motor", "dateutil"]
+FIRST_TOOL = "list_expenses_by_date"
+MCP_HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Total self time and per-module cumulative times from -X importtime output."""
+    modules = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        modules[name.strip()] = int(cumulative_us)
+    return {"total_us": total_us, "modules": modules}
+
+
+def measure_import(env: dict, top: int) -> dict:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=HERE, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app failed:\n{proc.stderr[-2000:]}")
+
+    parsed = parse_importtime(proc.stderr)
+    slowest = sorted(parsed["modules"].items(), key=lambda kv: -kv[1])
+    # Top-level modules only; their cumulative time already covers submodules
+    slowest = [(name, us) for name, us in slowest if "." not in name][:top]
+    return {
+        "import_ms": round(parsed["total_us"] / 1000, 1),
+        "wall_ms": round(wall_ms, 1),
+        "slowest": [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in slowest],
+        "lazy_modules_loaded": [m for m in LAZY_MODULES if m in parsed["modules"]]
+    }
+
+
+def rpc(client, session_id, method, params=None, request_id=None) -> dict:
+    """One JSON-RPC message over streamable HTTP; returns the decoded result (if any)."""
+    message = {"jsonrpc": "2.0", "method": method}
+    if params is not None:
+        message["params"] = params
+    if request_id is not None:
+        message["id"] = request_id
+
+    headers = dict(MCP_HEADERS)
+    if session_id:
+        headers["mcp-session-id"] = session_id
+    response = client.post("/mcp", json=message, headers=headers)
+    response.raise_for_status()
+    if request_id is None:
+        return {"headers": response.headers}
+
+    # Responses arrive as a single SSE event (or plain JSON when json_response is on)
+    body = response.text
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        body = "\n".join(line[len("data:"):] for line in body.splitlines() if line.startswith("data:"))
+    reply = json.loads(body)
+    if "error" in reply:
+        raise RuntimeError(f"{method} failed: {reply['error']}")
+    return {"headers": response.headers, "result": reply["result"]}
+
+
+def first_call_child():
+    """Runs in the fresh interpreter started by measure_first_call."""
+    launched_at = float(os.environ["BENCH_LAUNCHED_AT"])
+
+    import app
+    imported_at = time.time()
+
+    from starlette.testclient import TestClient
+
+    with TestClient(app.app) as client:
+        ready_at = time.time()
+        init = rpc(client, None, "initialize", {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "bench_startup", "version": "1"}
+        }, request_id=1)
+        session_id = init["headers"].get("mcp-session-id")
+        rpc(client, session_id, "notifications/initialized")
+
+        today = datetime.date.today().isoformat()
+        call = rpc(client, session_id, "tools/call", {
+            "name": FIRST_TOOL, "arguments": {"start_date": today, "end_date": today}
+        }, request_id=2)["result"]
+        called_at = time.time()
+
+    if call.get("isError"):
+        raise RuntimeError(f"{FIRST_TOOL} raised: {call.get('content')}")
+    payload = call.get("structuredContent", {}).get("result") or json.loads(call["content"][0]["text"])
+    if payload.get("status") != "success":
+        raise RuntimeError(f"{FIRST_TOOL} returned: {payload}")
+
+    print(json.dumps({
+        "import_ms": round((imported_at - launched_at) * 1000, 1),
+        "ready_ms": round((ready_at - launched_at) * 1000, 1),
+        "first_call_ms": round((called_at - launched_at) * 1000, 1)
+    }))
+
+
+def measure_first_call(env: dict) -> dict:
+    env = dict(env, BENCH_LAUNCHED_AT=repr(time.time()))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=HERE, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"first tool call failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def median(runs: list, key: str) -> float:
+    return round(statistics.median(r[key] for r in runs), 1)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Measure cold start and fail when it exceeds a budget")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--import-budget-ms", type=float, default=1500, help="Budget for `import app` (median)")
+    parser.add_argument("--first-call-budget-ms", type=float, default=3000,
+                        help="Budget from interpreter launch to the first successful tool call (median)")
+    parser.add_argument("--mongo-url", help="Database for the first call (default: in-process mongomock)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to report")
+    parser.add_argument("--output", help="Result file (default: bench_results/startup-<timestamp>-<commit>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        first_call_child()
+        return
+
+    from bench_tools import RESULTS_DIR, git_commit
+
+    env = dict(os.environ, MONGO_DB_URL=args.mongo_url or "mongomock://bench", DB_NAME="expenses_bench_startup")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    # One throwaway run so .pyc files exist, as they do in a deployed image
+    measure_import(env, args.top)
+
+    imports = [measure_import(env, args.top) for _ in range(args.runs)]
+    calls = [measure_first_call(env) for _ in range(args.runs)]
+
+    import_ms = median(imports, "import_ms")
+    first_call_ms = median(calls, "first_call_ms")
+    leaked = sorted({m for r in imports for m in r["lazy_modules_loaded"]})
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms}ms > budget {args.import_budget_ms}ms")
+    if first_call_ms > args.first_call_budget_ms:
+        failures.append(f"first tool call {first_call_ms}ms > budget {args.first_call_budget_ms}ms")
+    if leaked:
+        failures.append(f"lazy modules imported at startup: {', '.join(leaked)}")
+
+    print(f"import app:       {import_ms:8.1f} ms (budget {args.import_budget_ms:g})")
+    print(f"app ready:        {median(calls, 'ready_ms'):8.1f} ms")
+    print(f"first tool call:  {first_call_ms:8.1f} ms (budget {args.first_call_budget_ms:g})")
+    print("slowest imports:")
+    for entry in imports[-1]["slowest"]:
+        print(f"  {entry['module']:<30} {entry['cumulative_ms']:8.1f} ms")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": "mongod" if args.mongo_url else "mongomock",
+            "runs": args.runs,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "budgets": {"import_ms": args.import_budget_ms, "first_call_ms": args.first_call_budget_ms},
+        "results": {
+            "import_ms": import_ms,
+            "ready_ms": median(calls, "ready_ms"),
+            "first_call_ms": first_call_ms,
+            "slowest_imports": imports[-1]["slowest"],
+            "lazy_modules_loaded": leaked,
+            "runs": {"import": imports, "first_call": calls}
+        },
+        "failures": failures
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"startup-{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if failures:
+        print("\nStartup budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,310 @@
+"""Latency/memory benchmark for every MCP tool.
+
+Points db.py at an in-process Mongo stand-in (mongomock-motor), or at a
+throwaway local mongod, seeds synthetic expenses and measures p50/p95/p99
+latency and peak RSS per tool. Results are written as JSON so runs from
+different commits can be compared with --baseline.
+
+    python bench_tools.py --sizes 10000,100000,1000000
+    python bench_tools.py --backend mongod --mongod-path /usr/bin/mongod
+    python bench_tools.py --baseline bench_results/<earlier run>.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import datetime
+import platform
+import resource
+import subprocess
+import tempfile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+PAYMENT_METHODS = ["cash", "upi", "credit card", "debit card", "gpay"]
+MERCHANTS = ["uber", "swiggy", "zomato", "amazon", "flipkart", "netflix", "bigbasket", "indian oil", "starbucks", "airtel"]
+SEED_CHUNK = 10000
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def start_mongod(mongod_path: str):
+    """Start a throwaway mongod on a free port; returns (process, url, dbpath)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+    proc = subprocess.Popen(
+        [mongod_path, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"mongodb://127.0.0.1:{port}", dbpath
+        except OSError:
+            time.sleep(0.2)
+
+    proc.kill()
+    raise RuntimeError("mongod did not start within 30s")
+
+
+def synthetic_expenses(count: int, categories: dict, rng: random.Random):
+    """Yield chunks of expense documents in the stored schema."""
+    from dates import to_datetime
+    from search import search_terms
+    from tenancy import DEFAULT_USER_ID
+
+    names = list(categories) or ["misc"]
+    start = datetime.date(2023, 1, 1)
+
+    for offset in range(0, count, SEED_CHUNK):
+        chunk = []
+        for _ in range(min(SEED_CHUNK, count - offset)):
+            day = (start + datetime.timedelta(days=rng.randrange(3 * 365))).isoformat()
+            category = rng.choice(names)
+            chunk.append({
+                "user_id": DEFAULT_USER_ID,
+                "date": day,
+                "date_at": to_datetime(day),
+                "amount": round(rng.uniform(10, 5000), 2),
+                "category": category,
+                "subcategory": rng.choice(categories.get(category) or [""]),
+                "note": f"{rng.choice(MERCHANTS)} order {offset + len(chunk)}",
+                "payment_method": rng.choice(PAYMENT_METHODS),
+                "created_at": datetime.datetime.now()
+            })
+            chunk[-1]["search_terms"] = search_terms(chunk[-1])
+        yield chunk
+
+
+async def seed(main, size: int, rng: random.Random):
+    import rollups
+
+    for collection in (main.expenses_collection, main.daily_rollups_collection, main.monthly_rollups_collection):
+        await collection.delete_many({})
+    main.result_cache.clear()
+
+    categories = main.category_catalog.categories
+    for chunk in synthetic_expenses(size, categories, rng):
+        await main.expenses_collection.insert_many(chunk, ordered=False)
+
+    await rollups.rebuild(main.expenses_collection, main.daily_rollups_collection, main.monthly_rollups_collection)
+
+
+def random_range(rng: random.Random, max_days: int) -> tuple:
+    start = datetime.date(2023, 1, 1) + datetime.timedelta(days=rng.randrange(3 * 365 - max_days))
+    end = start + datetime.timedelta(days=rng.randrange(1, max_days))
+    return start.isoformat(), end.isoformat()
+
+
+async def sample_ids(main, count: int) -> list:
+    docs = await main.expenses_collection.aggregate([
+        {"$sample": {"size": count}},
+        {"$project": {"_id": 1}}
+    ]).to_list(count)
+    return [str(d["_id"]) for d in docs]
+
+
+async def measure(label: str, calls) -> dict:
+    """Run each zero-argument coroutine factory once and summarize latency."""
+    samples = []
+    errors = 0
+    for call in calls:
+        t0 = time.perf_counter()
+        result = await call()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if isinstance(result, dict) and result.get("status") == "error":
+            errors += 1
+
+    stats = {
+        "calls": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+    print(f"  {label:<24} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+          f"p99 {stats['p99_ms']:>9.2f} ms  rss {stats['peak_rss_mb']:>8.1f} MB"
+          + (f"  errors {errors}" if errors else ""))
+    return stats
+
+
+async def bench_size(main, size: int, iterations: int, rng: random.Random) -> dict:
+    from tenancy import DEFAULT_USER_ID
+
+    t0 = time.perf_counter()
+    await seed(main, size, rng)
+    print(f"\n{size} expenses (seeded in {time.perf_counter() - t0:.1f}s)")
+
+    update_ids = await sample_ids(main, iterations)
+    delete_ids = await sample_ids(main, iterations)
+    categories = list(main.category_catalog.categories) or ["misc"]
+
+    def add_call():
+        start, _ = random_range(rng, 2)
+        return lambda: main.add_expense(start, rng.uniform(10, 500), rng.choice(categories), note="bench")
+
+    def list_call():
+        start, end = random_range(rng, 31)
+        return lambda: main.list_expenses_by_date(start, end)
+
+    def summarize_call():
+        start, end = random_range(rng, 365)
+        return lambda: main.summarize(start, end)
+
+    def search_call(prefix: bool):
+        word = rng.choice(MERCHANTS)
+        return lambda: main.search_expenses(word[:3] if prefix else word, prefix=prefix, limit=20)
+
+    def search_scan_call():
+        # What a client does without search: pull every row and filter locally
+        word = rng.choice(MERCHANTS)
+
+        async def scan():
+            docs = main.expenses_collection.find({"user_id": DEFAULT_USER_ID}, {"note": 1, "date_at": 1})
+            return [d async for d in docs if word in d["note"]][-20:]
+        return scan
+
+    results = {}
+    results["add_expense"] = await measure("add_expense", [add_call() for _ in range(iterations)])
+    results["get_all_expenses"] = await measure(
+        "get_all_expenses", [lambda: main.get_all_expenses() for _ in range(iterations)]
+    )
+    results["list_expenses_by_date"] = await measure("list_expenses_by_date", [list_call() for _ in range(iterations)])
+    results["summarize"] = await measure("summarize", [summarize_call() for _ in range(iterations)])
+    results["search_expenses_prefix"] = await measure(
+        "search_expenses_prefix", [search_call(True) for _ in range(iterations)]
+    )
+    if not os.environ["MONGO_DB_URL"].startswith("mongomock://"):
+        # mongomock has no $text
+        results["search_expenses"] = await measure("search_expenses", [search_call(False) for _ in range(iterations)])
+    results["search_python_scan"] = await measure(
+        "search_python_scan", [search_scan_call() for _ in range(max(1, iterations // 10))]
+    )
+    results["update_expense"] = await measure("update_expense", [
+        (lambda i=i: main.update_expense(expense_id=i, new_note="bench update")) for i in update_ids
+    ])
+    results["delete_expense"] = await measure("delete_expense", [
+        (lambda i=i: main.delete_expense(expense_id=i)) for i in delete_ids if i not in update_ids
+    ])
+    return results
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nComparison with baseline {baseline['meta'].get('commit')}")
+    for size, tools in current["results"].items():
+        base_tools = baseline["results"].get(size)
+        if not base_tools:
+            continue
+        for tool, stats in tools.items():
+            base = base_tools.get(tool)
+            if not base:
+                continue
+            ratio = stats["p95_ms"] / base["p95_ms"] if base["p95_ms"] else float("inf")
+            print(f"  {size:>8} {tool:<24} p95 {base['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ms ({ratio:.2f}x)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark every MCP tool")
+    parser.add_argument("--sizes", default="10000", help="Comma separated dataset sizes (e.g. 10000,100000,1000000)")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per tool per size")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongod-path", default=shutil.which("mongod"), help="mongod binary for --backend mongod")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled (off by default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: bench_results/<timestamp>-<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    mongod = None
+    if args.backend == "mongod":
+        if not args.mongod_path:
+            parser.error("--backend mongod needs a mongod binary (--mongod-path)")
+        mongod, url, dbpath = start_mongod(args.mongod_path)
+        os.environ["MONGO_DB_URL"] = url
+    else:
+        os.environ["MONGO_DB_URL"] = "mongomock://bench"
+    os.environ["DB_NAME"] = "expenses_bench"
+    if not args.cache:
+        os.environ["RESULT_CACHE_MAX_ENTRIES"] = "0"
+
+    import logging
+    import main
+    logging.getLogger().setLevel(logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    rng = random.Random(args.seed)
+    commit = git_commit()
+
+    async def run():
+        await main.run_startup_tasks()
+        return {str(size): await bench_size(main, size, args.iterations, rng) for size in sizes}
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        if mongod:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "iterations": args.iterations,
+            "cache": args.cache,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,155 @@
+"""add_expense throughput under concurrency: one insert per call vs the write batcher.
+
+Runs the same burst of concurrent add_expense calls with batching off
+(WRITE_BATCH_WINDOW_MS=0, the default) and with each --windows value, and
+reports calls per second, per-call latency and the batcher's flush metrics.
+On the in-process mongomock backend every database call holds one of
+--connections pooled connections for --rtt-ms, standing in for the round
+trip to a remote cluster; the number of round trips is reported too.
+
+    python bench_writes.py --concurrency 64 --calls 2000 --rtt-ms 20
+    python bench_writes.py --mongo-url mongodb+srv://... --windows 2,5,10
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import platform
+import inspect
+
+from bench_tools import RESULTS_DIR, git_commit, percentile
+
+
+class Delayed:
+    """Collection proxy that holds a connection for `rtt` seconds on every database call."""
+
+    round_trips = 0
+
+    def __init__(self, collection, rtt: float, pool: asyncio.Semaphore):
+        self._collection = collection
+        self._rtt = rtt
+        self._pool = pool
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            async with self._pool:
+                Delayed.round_trips += 1
+                await asyncio.sleep(self._rtt)
+            return await attr(*args, **kwargs)
+        return call
+
+
+async def burst(main, window_ms: float, max_size: int, calls: int, concurrency: int) -> dict:
+    import write_batcher
+
+    main.expense_writer = write_batcher.WriteBatcher(
+        main.expenses_collection, after_insert=main.on_batch_inserted, window_ms=window_ms, max_size=max_size
+    )
+    await main.expenses_collection.delete_many({})
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+    Delayed.round_trips = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            result = await main.add_expense(f"2025-0{1 + i % 9}-1{i % 10}", 100 + i % 50, "food", note=f"bench {i}")
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += result["status"] != "success"
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - t0
+
+    stats = {
+        "calls_per_second": round(calls / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "errors": errors,
+        "round_trips": Delayed.round_trips or None,
+        "stored": await main.expenses_collection.count_documents({}),
+        "batcher": main.expense_writer.stats() if main.expense_writer.enabled else None
+    }
+    label = f"window {window_ms:g} ms" if window_ms else "one insert per call"
+    print(f"  {label:<22} {stats['calls_per_second']:>9.1f} calls/s  p50 {stats['p50_ms']:>8.2f} ms  "
+          f"p99 {stats['p99_ms']:>8.2f} ms"
+          + (f"  round trips {Delayed.round_trips}" if Delayed.round_trips else "")
+          + (f"  mean batch {stats['batcher']['mean_batch_size']}" if stats["batcher"] else "")
+          + (f"  errors {errors}" if errors else ""))
+    return stats
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Compare add_expense throughput with and without write batching")
+    parser.add_argument("--calls", type=int, default=1000, help="add_expense calls per variant")
+    parser.add_argument("--concurrency", type=int, default=32, help="Calls in flight at once")
+    parser.add_argument("--windows", default="2,5,10", help="Comma separated batch windows in ms")
+    parser.add_argument("--max-size", type=int, default=100, help="WRITE_BATCH_MAX_SIZE for the batched variants")
+    parser.add_argument("--rtt-ms", type=float, default=20, help="Simulated round trip per call (mongomock only)")
+    parser.add_argument("--connections", type=int, default=8, help="Simulated connection pool size (mongomock only)")
+    parser.add_argument("--mongo-url", help="Database to write to (default: in-process mongomock)")
+    parser.add_argument("--output", help="Result file (default: bench_results/writes-<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    os.environ["MONGO_DB_URL"] = args.mongo_url or "mongomock://bench"
+    os.environ["DB_NAME"] = "expenses_bench_writes"
+    os.environ["RECURRING_SCHEDULER"] = "off"
+    os.environ["RESULT_CACHE_MAX_ENTRIES"] = "0"
+
+    import logging
+    import main
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def run():
+        await main.run_startup_tasks()
+        if not args.mongo_url and args.rtt_ms:
+            rtt, pool = args.rtt_ms / 1000, asyncio.Semaphore(args.connections)
+            for name in ("expenses_collection", "daily_rollups_collection", "monthly_rollups_collection"):
+                setattr(main, name, Delayed(getattr(main, name), rtt, pool))
+            main.budget_book.counters = Delayed(main.budget_book.counters, rtt, pool)
+
+        print(f"{args.calls} calls, concurrency {args.concurrency}")
+        results = {"off": await burst(main, 0, args.max_size, args.calls, args.concurrency)}
+        for window in [float(w) for w in args.windows.split(",") if w]:
+            results[f"{window:g}ms"] = await burst(main, window, args.max_size, args.calls, args.concurrency)
+        await main.expenses_collection.delete_many({})
+        return results
+
+    results = asyncio.run(run())
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": "remote" if args.mongo_url else "mongomock",
+            "rtt_ms": None if args.mongo_url else args.rtt_ms,
+            "connections": None if args.mongo_url else args.connections,
+            "calls": args.calls,
+            "concurrency": args.concurrency,
+            "max_size": args.max_size,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"writes-{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,391 @@
+import os
+import time
+import asyncio
+import logging
+import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("weekly", "monthly", "yearly")
+# Category of a budget that covers every expense
+ALL_CATEGORIES = "*"
+# Fractions of the limit that raise an alert when a write crosses them
+DEFAULT_THRESHOLDS = (0.8, 1.0)
+# Seconds a user's budget definitions are reused by the write path
+DEFINITIONS_TTL = float(os.getenv("BUDGET_DEFINITIONS_TTL", 30))
+# Scans a seed retries while concurrent writes keep moving the counters
+SEED_ATTEMPTS = 5
+# Spent amounts closer than this count as equal
+SUM_TOLERANCE = 1e-6
+
+DEFINITION_INDEX = "mx_budget_user_category_period"
+COUNTER_INDEX = "mx_budget_counter_key"
+
+
+def period_key(period: str, iso_date: str) -> str:
+    """Key of the period containing an ISO date: 2025-W09, 2025-03 or 2025."""
+    if period == "monthly":
+        return iso_date[:7]
+    if period == "yearly":
+        return iso_date[:4]
+    if period == "weekly":
+        year, week, _ = datetime.date.fromisoformat(iso_date).isocalendar()
+        return f"{year}-W{week:02d}"
+    raise ValueError(f"Unknown budget period {period!r}; expected one of {', '.join(PERIODS)}")
+
+
+def _status(definition: dict, spent: float, count: int, previous: float = None) -> dict:
+    """Remaining amount and thresholds for one budget counter."""
+    limit = definition["limit"]
+    status = {
+        "category": definition["category"],
+        "period": definition["period"],
+        "limit": limit,
+        "spent": round(spent, 2),
+        "count": count,
+        "remaining": round(limit - spent, 2),
+        "used": round(spent / limit, 4) if limit else None,
+        "over_budget": spent > limit
+    }
+    if previous is not None:
+        # Only writes that push the total up can cross a threshold
+        status["crossed"] = [t for t in definition["thresholds"] if previous < t * limit <= spent]
+    return status
+
+
+def alerts(statuses: list) -> list:
+    """One readable line per alert threshold crossed by a write."""
+    lines = []
+    for status in statuses:
+        name = "Overall" if status["category"] == ALL_CATEGORIES else status["category"]
+        for threshold in status.get("crossed", []):
+            lines.append(
+                f"{name} {status['period']} budget ({status['key']}) reached {threshold:.0%}: "
+                f"{status['spent']} of {status['limit']} spent, {status['remaining']} remaining"
+            )
+    return lines
+
+
+def _touches(status: dict, expense: dict) -> bool:
+    return (status["category"] in (ALL_CATEGORIES, expense.get("category"))
+            and status["key"] == period_key(status["period"], expense["date"]))
+
+
+def touching(statuses: list, expense: dict) -> list:
+    """The statuses (one user's) whose budget and period include an expense."""
+    return [s for s in statuses if _touches(s, expense)]
+
+
+def per_expense(statuses: list, expenses: list) -> list:
+    """Split the statuses of one user's batched insert into what each insert would have seen alone.
+
+    The batch is replayed in order from each counter's total before it, so
+    every expense reports the running total after itself and only the
+    thresholds it crossed.
+    """
+    running = {}
+    for status in statuses:
+        batch = [e for e in expenses if _touches(status, e)]
+        running[(status["category"], status["period"], status["key"])] = (
+            status["spent"] - sum(float(e["amount"]) for e in batch), status["count"] - len(batch)
+        )
+
+    result = []
+    for expense in expenses:
+        own = []
+        for status in touching(statuses, expense):
+            key = (status["category"], status["period"], status["key"])
+            spent, count = running[key]
+            running[key] = (spent + float(expense["amount"]), count + 1)
+            # The batch's crossed thresholds are the only ones any single insert could cross
+            definition = {**status, "thresholds": status.get("crossed", [])}
+            own.append({"key": status["key"], **_status(definition, running[key][0], running[key][1], spent)})
+        result.append(own)
+    return result
+
+
+class BudgetBook:
+    """Budget definitions and their per-period running counters.
+
+    A definition is (user_id, category, period) -> limit; each one has a
+    counter document per period key holding the amount spent. Expense
+    writes $inc the counters they touch, so checking a budget reads one
+    document instead of aggregating expenses.
+    """
+
+    def __init__(self, budgets, counters, ttl: float = DEFINITIONS_TTL):
+        self.budgets = budgets
+        self.counters = counters
+        self.ttl = ttl
+        self._definitions = {}
+        self._reseeds = set()
+
+    async def ensure_indexes(self):
+        await self.budgets.create_index(
+            [("user_id", 1), ("category", 1), ("period", 1)], name=DEFINITION_INDEX, unique=True
+        )
+        await self.counters.create_index(
+            [("user_id", 1), ("category", 1), ("period", 1), ("key", 1)], name=COUNTER_INDEX, unique=True
+        )
+
+    async def definitions(self, user_id: str) -> list:
+        """A user's budget definitions, cached for `ttl` seconds."""
+        cached = self._definitions.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        definitions = await self.budgets.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+        self._definitions[user_id] = (time.monotonic(), definitions)
+        return definitions
+
+    async def set_budget(self, expenses, user_id: str, category: str, period: str, limit: float,
+                         thresholds=DEFAULT_THRESHOLDS) -> dict:
+        """Create or replace a budget and seed its counters from existing expenses."""
+        period_key(period, "2000-01-01")  # validates the period
+        definition = {
+            "user_id": user_id,
+            "category": category,
+            "period": period,
+            "limit": float(limit),
+            "thresholds": sorted(float(t) for t in thresholds),
+            "updated_at": datetime.datetime.now()
+        }
+        await self.budgets.replace_one(
+            {"user_id": user_id, "category": category, "period": period}, definition, upsert=True
+        )
+        self._definitions.pop(user_id, None)
+        seeded = await self.seed(expenses, definition)
+        self._reseed_later(expenses, definition)
+        return {**definition, "seeded_periods": seeded}
+
+    def _reseed_later(self, expenses, definition: dict):
+        """Seed again once every process's cached definitions have expired.
+
+        Other workers keep writing without the new budget for up to `ttl`
+        seconds; the second seed folds those writes into its counters.
+        """
+        if self.ttl <= 0:
+            return
+
+        async def reseed():
+            await asyncio.sleep(self.ttl + 1)
+            key_fields = {f: definition[f] for f in ("user_id", "category", "period")}
+            try:
+                if await self.budgets.find_one(key_fields) is not None:
+                    await self.seed(expenses, definition)
+            except Exception as e:
+                logger.error(f"Error reseeding budget {key_fields}: {e}")
+
+        task = asyncio.create_task(reseed())
+        self._reseeds.add(task)
+        task.add_done_callback(self._reseeds.discard)
+
+    async def delete_budget(self, user_id: str, category: str, period: str) -> bool:
+        key = {"user_id": user_id, "category": category, "period": period}
+        result = await self.budgets.delete_one(key)
+        await self.counters.delete_many(key)
+        self._definitions.pop(user_id, None)
+        return result.deleted_count > 0
+
+    async def _totals(self, expenses, definition: dict) -> dict:
+        """Period key -> (spent, count) of one budget, aggregated from raw expenses."""
+        query = {"user_id": definition["user_id"]}
+        if definition["category"] != ALL_CATEGORIES:
+            query["category"] = definition["category"]
+
+        totals = {}
+        async for doc in expenses.find(query, {"_id": 0, "date": 1, "amount": 1}):
+            key = period_key(definition["period"], doc["date"])
+            spent, count = totals.get(key, (0.0, 0))
+            totals[key] = (spent + float(doc.get("amount") or 0), count + 1)
+        return totals
+
+    async def _counters(self, key_fields: dict) -> dict:
+        return {
+            c["key"]: (c.get("spent", 0.0), c.get("count", 0))
+            async for c in self.counters.find(key_fields, {"_id": 0, "key": 1, "spent": 1, "count": 1})
+        }
+
+    async def seed(self, expenses, definition: dict) -> int:
+        """Bring one budget's counters in line with raw expenses without losing concurrent writes.
+
+        The expenses are scanned between two reads of the counters and the
+        scan is retried while writes move them. The differences are then
+        applied as $inc updates that only match a counter still holding the
+        value read, so an increment landing meanwhile is never overwritten
+        (the next attempt accounts for it). Returns the number of periods.
+        """
+        key_fields = {f: definition[f] for f in ("user_id", "category", "period")}
+
+        for _ in range(SEED_ATTEMPTS):
+            before = await self._counters(key_fields)
+            totals = await self._totals(expenses, definition)
+            after = await self._counters(key_fields)
+            if before != after:
+                continue
+
+            ops = []
+            for key in totals.keys() | after.keys():
+                spent, count = totals.get(key, (0.0, 0))
+                if key not in after:
+                    # Fails on the unique index if a write created the counter meanwhile
+                    ops.append(UpdateOne(
+                        {**key_fields, "key": key, "count": {"$exists": False}},
+                        {"$set": {"spent": spent, "count": count}}, upsert=True
+                    ))
+                    continue
+                current_spent, current_count = after[key]
+                if current_count != count or abs(current_spent - spent) > SUM_TOLERANCE:
+                    ops.append(UpdateOne(
+                        {**key_fields, "key": key, "spent": current_spent, "count": current_count},
+                        {"$inc": {"spent": spent - current_spent, "count": count - current_count}}
+                    ))
+            if not ops:
+                return len(totals)
+
+            try:
+                result = await self.counters.bulk_write(ops, ordered=False)
+                applied = result.matched_count + result.upserted_count
+            except BulkWriteError as e:
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+                applied = -1
+            if applied == len(ops):
+                return len(totals)
+
+        logger.warning(f"Budget {key_fields} kept changing during {SEED_ATTEMPTS} seed attempts; "
+                       "run `python budgets.py reseed` to reconcile it")
+        return len(totals)
+
+    async def verify(self, expenses, user_id: str = None) -> dict:
+        """Compare every budget's counters with totals recomputed from raw expenses."""
+        query = {"user_id": user_id} if user_id else {}
+        definitions = await self.budgets.find(query, {"_id": 0}).to_list(None)
+
+        drift = []
+        for definition in definitions:
+            key_fields = {f: definition[f] for f in ("user_id", "category", "period")}
+            totals = await self._totals(expenses, definition)
+            counters = await self._counters(key_fields)
+            for key in totals.keys() | counters.keys():
+                expected, actual = totals.get(key, (0.0, 0)), counters.get(key, (0.0, 0))
+                if expected[1] != actual[1] or abs(expected[0] - actual[0]) > SUM_TOLERANCE:
+                    drift.append({
+                        **key_fields, "key": key,
+                        "expected": {"spent": expected[0], "count": expected[1]},
+                        "actual": {"spent": actual[0], "count": actual[1]}
+                    })
+
+        orphans = await self._orphan_counters(definitions, query)
+        return {
+            "status": "ok" if not drift and not orphans else "drift",
+            "budgets": len(definitions),
+            "drift": drift,
+            "orphan_counters": len(orphans)
+        }
+
+    async def _orphan_counters(self, definitions: list, query: dict) -> list:
+        """_ids of counters left behind by deleted budgets (other workers may $inc them briefly)."""
+        defined = {(d["user_id"], d["category"], d["period"]) for d in definitions}
+        return [
+            c["_id"] async for c in self.counters.find(query, {"user_id": 1, "category": 1, "period": 1})
+            if (c["user_id"], c["category"], c["period"]) not in defined
+        ]
+
+    async def reseed(self, expenses, user_id: str = None) -> dict:
+        """Reconcile every budget's counters with raw expenses and drop orphaned counters."""
+        query = {"user_id": user_id} if user_id else {}
+        definitions = await self.budgets.find(query, {"_id": 0}).to_list(None)
+        periods = 0
+        for definition in definitions:
+            periods += await self.seed(expenses, definition)
+
+        orphans = await self._orphan_counters(definitions, query)
+        if orphans:
+            await self.counters.delete_many({"_id": {"$in": orphans}})
+        self._definitions.clear()
+        return {"budgets": len(definitions), "periods": periods, "orphan_counters_removed": len(orphans)}
+
+    async def apply(self, changes: list) -> list:
+        """Fold expense writes into the counters of every budget they touch.
+
+        `changes` is a list of (expense, sign) with sign +1 for an insert and
+        -1 for a removal (an update is one of each). Every touched counter is
+        adjusted with one atomic $inc, and the budget's new state is returned,
+        including any alert threshold the write crossed.
+        """
+        deltas = {}
+        for expense, sign in changes:
+            user_id = expense.get("user_id") or DEFAULT_USER_ID
+            for definition in await self.definitions(user_id):
+                if definition["category"] not in (ALL_CATEGORIES, expense.get("category")):
+                    continue
+                key = (user_id, definition["category"], definition["period"],
+                       period_key(definition["period"], expense["date"]))
+                spent, count, _ = deltas.get(key, (0.0, 0, definition))
+                deltas[key] = (spent + sign * float(expense["amount"]), count + sign, definition)
+
+        async def inc(key, spent, count, definition):
+            user_id, category, period, period_id = key
+            counter = await self.counters.find_one_and_update(
+                {"user_id": user_id, "category": category, "period": period, "key": period_id},
+                {"$inc": {"spent": spent, "count": count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return {"key": period_id, **_status(definition, counter["spent"], counter["count"], counter["spent"] - spent)}
+
+        return await asyncio.gather(*(
+            inc(key, spent, count, definition)
+            for key, (spent, count, definition) in deltas.items()
+            if (spent, count) != (0.0, 0)
+        ))
+
+    async def status(self, user_id: str, iso_date: str, category: str = None) -> list:
+        """Every budget of a user for the periods containing `iso_date`, from the counters only."""
+        definitions = [
+            d for d in await self.budgets.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+            if category is None or d["category"] == category
+        ]
+        if not definitions:
+            return []
+
+        keys = [(d["category"], d["period"], period_key(d["period"], iso_date)) for d in definitions]
+        counters = {
+            (c["category"], c["period"], c["key"]): c
+            async for c in self.counters.find({
+                "user_id": user_id,
+                "$or": [{"category": cat, "period": period, "key": key} for cat, period, key in keys]
+            })
+        }
+
+        statuses = []
+        for definition, key in zip(definitions, keys):
+            counter = counters.get(key) or {}
+            statuses.append({"key": key[2], **_status(definition, counter.get("spent", 0.0), counter.get("count", 0))})
+        return statuses
+
+
+if __name__ == "__main__":
+    # python budgets.py verify | reseed [--user-id ID]
+    import sys
+    import json
+    import argparse
+    from db import expenses_collection, budgets_collection, budget_counters_collection
+
+    arg_parser = argparse.ArgumentParser(description="Check or reconcile budget counters against raw expenses")
+    arg_parser.add_argument("command", choices=["verify", "reseed"])
+    arg_parser.add_argument("--user-id", help="Only this user's budgets (default: every user)")
+    args = arg_parser.parse_args()
+
+    book = BudgetBook(budgets_collection, budget_counters_collection)
+    if args.command == "verify":
+        report = asyncio.run(book.verify(expenses_collection, args.user_id))
+        print(json.dumps(report, indent=2, default=str))
+        sys.exit(0 if report["status"] == "ok" else 1)
+
+    print(json.dumps(asyncio.run(book.reseed(expenses_collection, args.user_id)), indent=2, default=str))
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Served (and validation disabled) when category.json is missing
+DEFAULT_CATEGORIES = {
+    "categories": [
+        "Food & Dining",
+        "Transportation",
+        "Shopping",
+        "Entertainment",
+        "Bills & Utilities",
+        "Healthcare",
+        "Travel",
+        "Education",
+        "Business",
+        "Other"
+    ]
+}
+
+# Common names clients use -> canonical "category" or "category/subcategory"
+ALIASES = {
+    "food_and_dining": "food",
+    "dining": "food/dining_out",
+    "restaurant": "food/dining_out",
+    "restaurants": "food/dining_out",
+    "grocery": "food/groceries",
+    "transportation": "transport",
+    "cab": "transport/cab_ride_hailing",
+    "taxi": "transport/cab_ride_hailing",
+    "uber": "transport/cab_ride_hailing",
+    "petrol": "transport/fuel",
+    "bills": "utilities",
+    "bills_and_utilities": "utilities",
+    "healthcare": "health",
+    "medical": "health",
+    "kids": "family_kids",
+    "family": "family_kids",
+    "subscription": "subscriptions",
+    "gifts": "gifts_donations",
+    "donations": "gifts_donations",
+    "charity": "gifts_donations",
+    "fees": "finance_fees",
+    "bank_fees": "finance_fees",
+    "tax": "taxes",
+    "investment": "investments",
+    "pets": "pet",
+    "other": "misc",
+    "miscellaneous": "misc",
+}
+
+# How often (seconds) the file's mtime is checked for changes
+CHECK_INTERVAL = 1.0
+
+
+def normalize_key(name: str) -> str:
+    """Case-folded lookup key: 'Food & Dining' -> 'food_and_dining'."""
+    key = name.casefold().replace("&", " and ")
+    return re.sub(r"[^0-9a-z]+", "_", key).strip("_")
+
+
+class CategoryCatalog:
+    """category.json held in memory with a precomputed lookup index.
+
+    The file is re-read only when its mtime changes, and the resource
+    payload is serialized once per load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self.categories = {}
+        self.index = {}
+        self.sub_index = {}
+        self.serialized = json.dumps(DEFAULT_CATEGORIES, indent=2)
+
+    def _build_index(self, categories: dict) -> tuple:
+        """Name/alias -> (category, subcategory) and (category, key) -> subcategory."""
+        index = {}
+        sub_index = {}
+        subcategory_owners = {}
+
+        for category, subcategories in categories.items():
+            for sub in subcategories:
+                sub_index[(category, normalize_key(sub))] = sub
+                subcategory_owners.setdefault(normalize_key(sub), []).append((category, sub))
+
+        # Subcategory names that belong to exactly one category resolve on their own
+        for key, owners in subcategory_owners.items():
+            if len(owners) == 1:
+                index[key] = owners[0]
+
+        for alias, target in ALIASES.items():
+            category, _, sub = target.partition("/")
+            if category in categories:
+                index[alias] = (category, sub or None)
+
+        # Category names win over aliases and subcategory names
+        for category in categories:
+            index[normalize_key(category)] = (category, None)
+
+        return index, sub_index
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                if self._mtime is not None:
+                    logger.warning(f"{self.path} removed; category validation disabled")
+                self._mtime = None
+                self.categories, self.index, self.sub_index = {}, {}, {}
+                self.serialized = json.dumps(DEFAULT_CATEGORIES, indent=2)
+                return
+
+            if mtime == self._mtime:
+                return
+
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                categories = json.loads(raw)
+                self.index, self.sub_index = self._build_index(categories)
+                self.categories = categories
+                self.serialized = raw
+                self._mtime = mtime
+                logger.info(f"Loaded {len(categories)} categories from {self.path}")
+            except Exception as e:
+                # Keep serving the last good catalog
+                logger.error(f"Error reading categories: {e}")
+
+    def current(self) -> dict:
+        """{category: [subcategories]} as of the latest file change (empty when the file is missing)."""
+        self._refresh()
+        return self.categories
+
+    def to_json(self) -> str:
+        self._refresh()
+        return self.serialized
+
+    def canonical_category(self, name: str) -> str:
+        """Canonical category for a filter value; unknown names pass through unchanged."""
+        self._refresh()
+        match = self.index.get(normalize_key(name))
+        return match[0] if match else name
+
+    def resolve(self, category: str, subcategory: str = "") -> tuple:
+        """Validate and normalize a category/subcategory pair.
+
+        Raises ValueError for categories not in the catalog. Unknown
+        subcategories are kept as given.
+        """
+        self._refresh()
+        subcategory = (subcategory or "").strip()
+
+        if not self.categories:
+            return category, subcategory
+
+        match = self.index.get(normalize_key(category))
+        if match is None:
+            raise ValueError(f"Unknown category: {category}. Valid categories: {', '.join(self.categories)}")
+
+        canonical, implied_sub = match
+        if not subcategory:
+            return canonical, implied_sub or ""
+
+        sub_key = normalize_key(subcategory)
+        if (canonical, sub_key) in self.sub_index:
+            return canonical, self.sub_index[(canonical, sub_key)]
+
+        alias = self.index.get(sub_key)
+        if alias and alias[0] == canonical and alias[1]:
+            return canonical, alias[1]
+
+        return canonical, subcategory
@@ -0,0 +1,119 @@
+import re
+import datetime
+from functools import lru_cache
+
+# Distinct date strings remembered by convert_date
+DATE_CACHE_SIZE = 4096
+
+ISO_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+# D-M-YY, DD/MM/YYYY, D.M.YYYY ... (day first, like the dateutil fallback)
+DMY_RE = re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})$")
+# YYYY/MM/DD, YYYY-M-D, YYYY.M.D
+YMD_RE = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$")
+# Anything starting with a 4-digit year is read year, month, day by the fallback
+YEAR_FIRST_RE = re.compile(r"^(?:\d{4}\D|\d{8}(?!\d))")
+# Mon D YYYY, Month D, YYYY
+MDY_NAME_RE = re.compile(r"^([A-Za-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$")
+# D Mon YYYY, D-Mon-YYYY
+DMY_NAME_RE = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)?[\s-]+([A-Za-z]+)\.?,?[\s-]+(\d{4})$")
+
+MONTHS = {
+    name: i
+    for i, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december")
+    ], start=1)
+    for name in names
+}
+
+
+def _expand_year(year: str) -> int:
+    """Expand a 2-digit year the way dateutil does: within 50 years of today."""
+    value = int(year)
+    if len(year) > 2:
+        return value
+
+    this_year = datetime.date.today().year
+    century = this_year - this_year % 100
+    value += century
+    if value >= this_year + 50:
+        value -= 100
+    elif value < this_year - 50:
+        value += 100
+    return value
+
+
+def _fast_parse(date_str: str):
+    """Try the precompiled formats; return a date or None if none match."""
+    m = ISO_RE.match(date_str)
+    if m:
+        return datetime.date(int(m[1]), int(m[2]), int(m[3]))
+
+    m = DMY_RE.match(date_str)
+    if m:
+        return datetime.date(_expand_year(m[3]), int(m[2]), int(m[1]))
+
+    m = YMD_RE.match(date_str)
+    if m:
+        return datetime.date(int(m[1]), int(m[2]), int(m[3]))
+
+    m = MDY_NAME_RE.match(date_str)
+    if m and m[1].lower() in MONTHS:
+        return datetime.date(int(m[3]), MONTHS[m[1].lower()], int(m[2]))
+
+    m = DMY_NAME_RE.match(date_str)
+    if m and m[2].lower() in MONTHS:
+        return datetime.date(int(m[3]), MONTHS[m[2].lower()], int(m[1]))
+
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _convert(date_str: str) -> str:
+    try:
+        parsed = _fast_parse(date_str)
+    except ValueError:
+        # Matched a known shape but not as a real date, e.g. 12/31/2025 read
+        # day first; dateutil retries it the other way round
+        parsed = None
+
+    if parsed is None:
+        # Slow path for anything the precompiled formats do not cover
+        from dateutil import parser
+        parsed = None
+        if YEAR_FIRST_RE.match(date_str):
+            # 2025-01-03 10:00, 20250103: year, month, day as written
+            try:
+                parsed = parser.parse(date_str, yearfirst=True)
+            except Exception:
+                pass
+        if parsed is None:
+            try:
+                parsed = parser.parse(date_str, dayfirst=True)
+            except Exception:
+                raise ValueError(f"Invalid date format: {date_str}")
+
+    return parsed.strftime("%Y-%m-%d")
+
+
+def convert_date(date_str: str) -> str:
+    """Convert ANY date format into ISO format YYYY-MM-DD.
+
+    Strict ISO dates and a handful of common formats are parsed with
+    precompiled patterns; anything else falls back to dateutil. Results
+    are memoized in a bounded LRU cache.
+    """
+    if not isinstance(date_str, str):
+        raise ValueError(f"Invalid date format: {date_str}")
+    return _convert(date_str.strip())
+
+
+def to_datetime(iso_date: str) -> datetime.datetime:
+    """Native (BSON datetime, UTC midnight) form of an ISO YYYY-MM-DD date."""
+    return datetime.datetime.strptime(iso_date, "%Y-%m-%d")
+
+
+def from_datetime(value: datetime.datetime) -> str:
+    """ISO YYYY-MM-DD form of a stored native date."""
+    return value.strftime("%Y-%m-%d")
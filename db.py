@@ -18,9 +18,14 @@
 # print(f"Connected to MongoDB database: {DB_NAME}")
 
 import os
+import time
+import asyncio
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
+import threading
 from dotenv import load_dotenv
+from pymongo import monitoring
+
+import profiler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -32,26 +37,211 @@ load_dotenv()
 MONGO_URL = os.getenv("MONGO_DB_URL")
 DB_NAME = os.getenv("DB_NAME", "knowledge_assistant")
 
-if not MONGO_URL:
-    logger.error("ERROR: MONGO_DB_URL is missing in environment variables")
-    logger.info("Please set MONGO_DB_URL environment variable")
-    raise Exception("ERROR: MONGO_DB_URL is missing")
-
-try:
-    # Initialize MongoDB client
-    client = AsyncIOMotorClient(
-        MONGO_URL,
-        serverSelectionTimeoutMS=5000,  # 5 second timeout
-        connectTimeoutMS=5000,
-        socketTimeoutMS=5000
-    )
-    
-    db = client[DB_NAME]
-    expenses_collection = db["expenses"]
-    
-    logger.info(f"MongoDB client initialized for database: {DB_NAME}")
-    logger.info("Connection will be established on first query")
-    
-except Exception as e:
-    logger.error(f"Failed to initialize MongoDB client: {e}")
-    raise
\ No newline at end of file
+# Pool and timeout settings (pymongo defaults where unset)
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+# Connections opened by the warm-up and kept open while idle
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 4))
+MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 5000))
+# Wire compression in order of preference, e.g. "zstd,snappy,zlib"
+COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+# primary, primaryPreferred, secondary, secondaryPreferred or nearest
+READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+# Python package each optional compressor needs
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts open and checked-out connections from CMAP events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.checkout_failures = 0
+
+    def _add(self, field: str, delta: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_checked_out(self, event):
+        self._add("in_use", 1)
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def connection_check_out_failed(self, event):
+        self._add("checkout_failures", 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "max_pool_size": MAX_POOL_SIZE,
+            "min_pool_size": MIN_POOL_SIZE,
+            "utilization": round(self.in_use / MAX_POOL_SIZE, 4) if MAX_POOL_SIZE else None,
+            "checkout_failures": self.checkout_failures
+        }
+
+
+pool_monitor = PoolMonitor()
+_client = None
+
+
+def _compressors() -> list:
+    """Configured compressors whose Python package is installed."""
+    available = []
+    for name in [c.strip().lower() for c in COMPRESSORS.split(",") if c.strip()]:
+        try:
+            __import__(_COMPRESSOR_MODULES[name])
+            available.append(name)
+        except KeyError:
+            logger.warning(f"Unknown MongoDB compressor {name!r} ignored")
+        except ImportError:
+            logger.warning(f"MongoDB compressor {name!r} needs the {_COMPRESSOR_MODULES[name]} package; skipped")
+    return available
+
+
+def get_client():
+    """The process-wide client, created on first use."""
+    global _client
+    if _client is not None:
+        return _client
+
+    if not MONGO_URL:
+        logger.error("ERROR: MONGO_DB_URL is missing in environment variables")
+        logger.info("Please set MONGO_DB_URL environment variable")
+        raise Exception("ERROR: MONGO_DB_URL is missing")
+
+    try:
+        if MONGO_URL.startswith("mongomock://"):
+            # In-process stand-in for benchmarks and local experiments
+            from mongomock_motor import AsyncMongoMockClient
+            _client = AsyncMongoMockClient()
+            logger.info("Using in-process mongomock-motor client")
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            options = {
+                "maxPoolSize": MAX_POOL_SIZE,
+                "minPoolSize": MIN_POOL_SIZE,
+                "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+                "waitQueueTimeoutMS": WAIT_QUEUE_TIMEOUT_MS,
+                "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+                "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+                "socketTimeoutMS": SOCKET_TIMEOUT_MS,
+                "readPreference": READ_PREFERENCE,
+                "event_listeners": [pool_monitor] + ([profiler.command_profiler] if profiler.ENABLED else [])
+            }
+            compressors = _compressors()
+            if compressors:
+                options["compressors"] = ",".join(compressors)
+            _client = AsyncIOMotorClient(MONGO_URL, **options)
+
+            try:
+                profiler.command_profiler.bind(asyncio.get_running_loop(), _client)
+            except RuntimeError:
+                pass  # no loop yet; connect() binds it
+
+        logger.info(f"MongoDB client initialized for database: {DB_NAME}")
+    except Exception as e:
+        logger.error(f"Failed to initialize MongoDB client: {e}")
+        raise
+
+    return _client
+
+
+def get_database():
+    return get_client()[DB_NAME]
+
+
+class LazyCollection:
+    """Collection handle that creates the client on first use.
+
+    Importing this module (and main.py) therefore needs no environment;
+    attribute access is forwarded to the real Motor collection.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self._name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+expenses_collection = LazyCollection("expenses")
+
+# Pre-aggregated (user_id, day|month, category, payment_method) -> sum, count
+daily_rollups_collection = LazyCollection("expense_rollups_daily")
+monthly_rollups_collection = LazyCollection("expense_rollups_monthly")
+
+# Progress checkpoints for resumable schema migrations
+migrations_collection = LazyCollection("migrations")
+
+# Budget definitions and their per-period running totals
+budgets_collection = LazyCollection("budgets")
+budget_counters_collection = LazyCollection("budget_counters")
+
+# Recurring expense rules materialized by the background scheduler
+recurring_rules_collection = LazyCollection("recurring_rules")
+
+
+async def ping() -> float:
+    """Round-trip a ping and return its latency in milliseconds."""
+    t0 = time.perf_counter()
+    await get_client().admin.command("ping")
+    return (time.perf_counter() - t0) * 1000
+
+
+async def connect() -> dict:
+    """Create the client and pre-open MIN_POOL_SIZE pooled connections.
+
+    Concurrent pings each check out their own connection, so the pool is
+    warm before the first tool call instead of connecting on demand.
+    """
+    latency = await ping()
+    profiler.command_profiler.bind(asyncio.get_running_loop(), get_client())
+    if MIN_POOL_SIZE > 1:
+        await asyncio.gather(*(ping() for _ in range(MIN_POOL_SIZE)))
+
+    logger.info(f"MongoDB connected ({latency:.1f} ms ping, {pool_monitor.open} pooled connections)")
+    return {"ping_ms": round(latency, 3), "pool": pool_monitor.stats()}
+
+
+def close():
+    """Close the client and its pool; the next use creates a new one."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("MongoDB client closed")
@@ -0,0 +1,209 @@
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import tempfile
+
+from dates import to_datetime
+from pagination import SORT_KEYS
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson", "parquet")
+FIELDS = ["id", "date", "amount", "category", "subcategory", "note", "payment_method"]
+# Documents pulled per cursor batch and written per flush
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+# Rows per Parquet row group; a few batches are buffered to fill one
+ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "100000"))
+# Where the export_expenses tool is allowed to write, one subdirectory per user
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports"))
+
+
+def build_query(user_id: str, start: str = None, end: str = None, category: str = None) -> dict:
+    """One user's expenses, filtered by date range / category on the indexed fields."""
+    query = {"user_id": user_id}
+    if start or end:
+        query["date_at"] = {}
+        if start:
+            query["date_at"]["$gte"] = to_datetime(start)
+        if end:
+            query["date_at"]["$lte"] = to_datetime(end)
+    if category:
+        query["category"] = category
+    return query
+
+
+def to_row(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "date": doc.get("date"),
+        "amount": doc.get("amount"),
+        "category": doc.get("category"),
+        "subcategory": doc.get("subcategory"),
+        "note": doc.get("note"),
+        "payment_method": doc.get("payment_method")
+    }
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, rows: list):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class NdjsonWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, rows: list):
+        self.f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """Buffers batches until a full row group, then writes it."""
+
+    def __init__(self, f, row_group_size: int = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow: pip install pyarrow")
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.string()),
+            ("date", pa.string()),
+            ("amount", pa.float64()),
+            ("category", pa.string()),
+            ("subcategory", pa.string()),
+            ("note", pa.string()),
+            ("payment_method", pa.string())
+        ])
+        self.writer = pq.ParquetWriter(f, self.schema, compression="snappy")
+        self.row_group_size = row_group_size or ROW_GROUP_SIZE
+        self.buffer = []
+
+    def write(self, rows: list):
+        self.buffer.extend(rows)
+        while len(self.buffer) >= self.row_group_size:
+            self._flush(self.buffer[:self.row_group_size])
+            self.buffer = self.buffer[self.row_group_size:]
+
+    def _flush(self, rows: list):
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        self.writer.write_table(table, row_group_size=len(rows))
+
+    def close(self):
+        if self.buffer:
+            self._flush(self.buffer)
+            self.buffer = []
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "ndjson": NdjsonWriter, "parquet": ParquetWriter}
+
+
+def _open(path: str, fmt: str):
+    """Temp file next to `path` so the final os.replace is an atomic rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    if fmt == "parquet":
+        return os.fdopen(fd, "wb"), tmp_path
+    return os.fdopen(fd, "w", encoding="utf-8", newline=""), tmp_path
+
+
+async def export(collection, user_id: str, path: str, fmt: str = "csv", start: str = None, end: str = None,
+                 category: str = None, batch_size: int = BATCH_SIZE) -> dict:
+    """Stream one user's matching expenses to `path` in `fmt`, batch by batch.
+
+    At most one cursor batch (plus one Parquet row group) is held in
+    memory, and file writes run in a worker thread so the event loop
+    keeps serving other requests during large exports.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}. Use one of {', '.join(FORMATS)}")
+
+    t0 = time.perf_counter()
+    query = build_query(user_id, start, end, category)
+    f, tmp_path = _open(path, fmt)
+    rows = 0
+
+    try:
+        writer = WRITERS[fmt](f)
+        cursor = collection.find(query, {"created_at": 0, "date_at": 0}).sort(SORT_KEYS).batch_size(batch_size)
+
+        batch = []
+        async for doc in cursor:
+            batch.append(to_row(doc))
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(writer.write, batch)
+                rows += len(batch)
+                batch = []
+
+        if batch:
+            await asyncio.to_thread(writer.write, batch)
+            rows += len(batch)
+
+        await asyncio.to_thread(writer.close)
+        f.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        f.close()
+        os.unlink(tmp_path)
+        raise
+
+    seconds = time.perf_counter() - t0
+    logger.info(f"Exported {rows} expenses to {path} in {seconds:.1f}s")
+    return {
+        "path": os.path.abspath(path),
+        "format": fmt,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+        "seconds": round(seconds, 3)
+    }
+
+
+if __name__ == "__main__":
+    # python export.py expenses.parquet [--format parquet] [--start-date ..] [--end-date ..] [--category ..]
+    import argparse
+    from catalog import CategoryCatalog
+    from dates import convert_date
+    from db import expenses_collection
+
+    arg_parser = argparse.ArgumentParser(description="Export expenses to CSV, NDJSON or Parquet")
+    arg_parser.add_argument("path", help="Output file")
+    arg_parser.add_argument("--format", choices=FORMATS, help="Default: taken from the file extension")
+    arg_parser.add_argument("--start-date")
+    arg_parser.add_argument("--end-date")
+    arg_parser.add_argument("--category")
+    arg_parser.add_argument("--user-id", default=DEFAULT_USER_ID)
+    arg_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = arg_parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        arg_parser.error(f"Cannot infer format from {args.path}; pass --format")
+
+    start = convert_date(args.start_date) if args.start_date else None
+    end = convert_date(args.end_date) if args.end_date else None
+    # Same canonical names the export_expenses tool filters on ("dining" -> "food")
+    category = None
+    if args.category:
+        catalog = CategoryCatalog(os.path.join(os.path.dirname(os.path.abspath(__file__)), "category.json"))
+        category = catalog.canonical_category(args.category)
+
+    result = asyncio.run(export(expenses_collection, args.user_id, args.path, fmt, start, end, category, args.batch_size))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,344 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import datetime
+import pandas as pd
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from dates import convert_date
+from search import search_terms
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "10000"))
+# Reject samples kept in the report; the counts are always complete
+MAX_REJECT_SAMPLES = 100
+# Where the import_expenses tool is allowed to read from, one subdirectory per user
+IMPORT_DIR = os.getenv("IMPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "imports"))
+
+FIELDS = ("date", "amount", "category", "subcategory", "note", "payment_method")
+# Statement headers recognised for each field when no explicit mapping is given
+COLUMN_ALIASES = {
+    "date": ["date", "transaction_date", "txn_date", "value_date", "posting_date", "booking_date"],
+    "amount": ["amount", "debit", "debit_amount", "withdrawal", "withdrawal_amount", "withdrawal_amt"],
+    "category": ["category"],
+    "subcategory": ["subcategory", "sub_category"],
+    "note": ["note", "notes", "description", "narration", "details", "memo", "remarks", "particulars"],
+    "payment_method": ["payment_method", "payment_mode", "mode", "method"]
+}
+# Tried in order, each over the rows the previous ones could not parse.
+# Day-first like convert_date; anything left over goes through convert_date.
+DATE_FORMATS = ["ISO8601", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y/%m/%d", "%d %b %Y", "%d-%b-%Y", "%b %d, %Y"]
+
+
+def _header_key(name) -> str:
+    return "_".join(str(name).strip().lower().replace(".", " ").split())
+
+
+def resolve_columns(headers: list, mapping: dict = None) -> dict:
+    """Schema field -> source column, from an explicit mapping or header aliases."""
+    mapping = dict(mapping or {})
+    unknown = [field for field in mapping if field not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields in column mapping: {unknown}. Use any of {', '.join(FIELDS)}")
+
+    by_key = {_header_key(h): h for h in headers}
+    for field in FIELDS:
+        if field in mapping:
+            if mapping[field] not in headers:
+                raise ValueError(f"Column {mapping[field]!r} (mapped to {field}) not found in file")
+            continue
+        for alias in COLUMN_ALIASES[field]:
+            if alias in by_key:
+                mapping[field] = by_key[alias]
+                break
+
+    missing = [field for field in ("date", "amount") if field not in mapping]
+    if missing:
+        raise ValueError(f"Could not find a column for {missing}; pass a column mapping")
+    return mapping
+
+
+def read_chunks(path: str, chunk_size: int, offset: int = 0):
+    """Yield (first row number, DataFrame of strings) chunks, skipping `offset` data rows."""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".csv":
+        reader = pd.read_csv(
+            path, dtype=str, keep_default_na=False, chunksize=chunk_size,
+            skiprows=range(1, offset + 1), skipinitialspace=True
+        )
+        row = offset
+        for chunk in reader:
+            yield row, chunk
+            row += len(chunk)
+
+    elif ext in (".xlsx", ".xls"):
+        # Excel files cannot be streamed; read once and slice
+        frame = pd.read_excel(path, dtype=str, keep_default_na=False)
+        for row in range(offset, len(frame), chunk_size):
+            yield row, frame.iloc[row:row + chunk_size]
+
+    else:
+        raise ValueError(f"Unsupported file type: {ext or path}. Use .csv or .xlsx")
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Vectorized day-first date parsing to ISO strings (missing where unparseable)."""
+    values = values.str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+
+    for fmt in DATE_FORMATS:
+        pending = parsed.isna() & (values != "")
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(values[pending], format=fmt, errors="coerce")
+
+    iso = parsed.dt.strftime("%Y-%m-%d").astype(object).where(parsed.notna(), None)
+
+    # Rare formats: one convert_date call per distinct leftover string
+    leftover = iso.isna() & (values != "")
+    if leftover.any():
+        def convert(value):
+            try:
+                return convert_date(value)
+            except ValueError:
+                return None
+        iso[leftover] = values[leftover].map({v: convert(v) for v in values[leftover].unique()})
+    return iso
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """Vectorized amount parsing: strips currency symbols and thousands separators."""
+    cleaned = values.str.replace(r"[^0-9.\-]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def row_id(job: str, row: int) -> ObjectId:
+    """Deterministic _id per source row, so a re-imported chunk cannot duplicate rows."""
+    return ObjectId(hashlib.sha1(f"{job}:{row}".encode()).digest()[:12])
+
+
+def build_chunk(frame: pd.DataFrame, first_row: int, columns: dict, catalog, job: str, user_id: str,
+                default_category: str = None) -> tuple:
+    """Normalize one chunk into (documents, rejects)."""
+    rows = pd.RangeIndex(first_row, first_row + len(frame))
+    frame = frame.set_axis(rows)
+
+    def column(field, default=""):
+        if field in columns:
+            return frame[columns[field]].astype(str).str.strip()
+        return pd.Series(default, index=rows, dtype=object)
+
+    dates = parse_dates(column("date"))
+    amounts = parse_amounts(column("amount"))
+    categories = column("category").replace("", default_category or "")
+    subcategories = column("subcategory")
+
+    # One catalog lookup per distinct (category, subcategory) pair
+    resolved = {}
+    for pair in set(zip(categories, subcategories)):
+        try:
+            resolved[pair] = catalog.resolve(*pair) if pair[0] else ValueError("Category is required")
+        except ValueError as e:
+            resolved[pair] = e
+
+    notes = column("note")
+    payment_methods = column("payment_method").replace("", "cash")
+    created_at = datetime.datetime.now()
+
+    docs, rejects = [], []
+    for row, date, amount, category, subcategory, note, payment_method in zip(
+            rows, dates, amounts, categories, subcategories, notes, payment_methods):
+        match = resolved[(category, subcategory)]
+        if not isinstance(date, str):
+            rejects.append({"row": row, "message": "Invalid date format"})
+        elif pd.isna(amount):
+            rejects.append({"row": row, "message": "Invalid amount"})
+        elif isinstance(match, Exception):
+            rejects.append({"row": row, "message": str(match)})
+        else:
+            doc = {
+                "_id": row_id(job, row),
+                "user_id": user_id,
+                "date": date,
+                "date_at": datetime.datetime.strptime(date, "%Y-%m-%d"),
+                "amount": float(amount),
+                "category": match[0],
+                "subcategory": match[1],
+                "note": note,
+                "payment_method": payment_method,
+                "created_at": created_at
+            }
+            doc["search_terms"] = search_terms(doc)
+            docs.append(doc)
+    return docs, rejects
+
+
+def job_name(path: str, user_id: str) -> str:
+    """Checkpoint name for a file: same user, name, size and mtime resume the same job."""
+    stat = os.stat(path)
+    return f"import:{user_id}:{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+async def import_file(expenses, migrations, path: str, catalog, user_id: str, columns: dict = None,
+                      default_category: str = None, chunk_size: int = CHUNK_SIZE,
+                      dry_run: bool = False, offset: int = None, on_inserted=None) -> dict:
+    """Import a CSV/XLSX statement for one user, chunk by chunk.
+
+    Each chunk is parsed and validated with vectorized pandas operations,
+    then written with one unordered bulk_write. The number of rows consumed
+    is checkpointed in the migrations collection after every chunk, so an
+    interrupted import resumes at the next chunk; rows get deterministic
+    _ids, so a chunk that was written but not checkpointed is not inserted
+    twice. `offset` overrides the checkpoint.
+
+    `on_inserted(docs)` is awaited for every written chunk. Before a chunk
+    is written its row range is checkpointed as `unapplied` and it is
+    cleared once `on_inserted` has run, so when a run dies in between, the
+    resumed run passes that range's duplicate rows to `on_inserted` too.
+    """
+    job = job_name(path, user_id)
+    state = {} if dry_run else (await migrations.find_one({"_id": job}) or {})
+    if state.get("completed_at") and offset is None:
+        return {"job": job, "status": "already_imported", **{k: state.get(k, 0) for k in ("rows", "inserted", "rejected")}}
+
+    start = offset if offset is not None else state.get("offset", 0)
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0} if offset is not None or dry_run else {
+        "rows": state.get("rows", 0), "inserted": state.get("inserted", 0),
+        "duplicates": state.get("duplicates", 0), "rejected": state.get("rejected", 0)
+    }
+    samples = []
+    chunks = 0
+    # [first, end) rows a previous run wrote but may not have passed to on_inserted
+    unapplied = None if dry_run else state.get("unapplied")
+    unapplied_ids = {row_id(job, row) for row in range(*unapplied)} if unapplied else set()
+    resolved_columns = None
+    position = start
+    t0 = time.perf_counter()
+
+    # CSV parsing and the one-shot Excel load happen inside next(); run them
+    # off the event loop so other sessions are served during a large import
+    reader = read_chunks(path, chunk_size, start)
+    while True:
+        chunk = await asyncio.to_thread(next, reader, None)
+        if chunk is None:
+            break
+        first_row, frame = chunk
+        if resolved_columns is None:
+            resolved_columns = resolve_columns(list(frame.columns), columns)
+
+        docs, rejects = await asyncio.to_thread(
+            build_chunk, frame, first_row, resolved_columns, catalog, job, user_id, default_category
+        )
+        totals["rows"] += len(frame)
+        totals["rejected"] += len(rejects)
+        samples.extend(rejects[:MAX_REJECT_SAMPLES - len(samples)])
+
+        if not dry_run and docs:
+            rows = [first_row, first_row + len(frame)]
+            if unapplied:
+                rows = [min(rows[0], unapplied[0]), max(rows[1], unapplied[1])]
+            await migrations.update_one({"_id": job}, {"$set": {"unapplied": rows}}, upsert=True)
+
+            duplicate_rows = set()
+            try:
+                await expenses.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                duplicate_rows = {err["index"] for err in errors if err.get("code") == 11000}
+                failed = [err for err in errors if err.get("code") != 11000]
+                if failed:
+                    raise ValueError(f"Row {docs[failed[0]['index']]['_id']} failed: {failed[0].get('errmsg')}")
+
+            # Duplicates in the unapplied range were stored by a run that died before on_inserted
+            inserted = [doc for i, doc in enumerate(docs) if i not in duplicate_rows or doc["_id"] in unapplied_ids]
+            totals["inserted"] += len(inserted)
+            totals["duplicates"] += len(docs) - len(inserted)
+            if on_inserted and inserted:
+                await on_inserted(inserted)
+        elif dry_run:
+            totals["inserted"] += len(docs)
+
+        position = first_row + len(frame)
+        chunks += 1
+        if not dry_run:
+            if unapplied and start <= unapplied[0] and position >= unapplied[1]:
+                unapplied, unapplied_ids = None, set()
+            await migrations.update_one(
+                {"_id": job},
+                {"$set": {"offset": position, **totals, "unapplied": unapplied, "updated_at": datetime.datetime.now()}},
+                upsert=True
+            )
+
+    if not dry_run:
+        await migrations.update_one(
+            {"_id": job},
+            {"$set": {"offset": position, **totals, "completed_at": datetime.datetime.now()}},
+            upsert=True
+        )
+
+    seconds = time.perf_counter() - t0
+    logger.info(f"Import {job}: {totals['inserted']} inserted, {totals['rejected']} rejected in {seconds:.1f}s")
+    return {
+        "job": job,
+        "dry_run": dry_run,
+        "started_at_row": start,
+        "offset": position,
+        "chunks": chunks,
+        **({"valid": totals.pop("inserted")} if dry_run else {}),
+        **totals,
+        "columns": resolved_columns,
+        "rejects": samples,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round((position - start) / seconds) if seconds else None
+    }
+
+
+if __name__ == "__main__":
+    # python importer.py statement.csv [--dry-run] [--map date=Txn Date] [--offset N]
+    import json
+    import argparse
+    import budgets
+    import rollups
+    from catalog import CategoryCatalog
+    from db import expenses_collection, daily_rollups_collection, monthly_rollups_collection, migrations_collection
+    from db import budgets_collection, budget_counters_collection
+
+    arg_parser = argparse.ArgumentParser(description="Import expenses from a CSV/XLSX statement")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                            help=f"Source column for a field ({', '.join(FIELDS)}); repeatable")
+    arg_parser.add_argument("--default-category", help="Category for rows without one")
+    arg_parser.add_argument("--user-id", default=DEFAULT_USER_ID, help="Owner of the imported expenses")
+    arg_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    arg_parser.add_argument("--offset", type=int, help="Start at this data row instead of the checkpoint")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Parse and validate only")
+    args = arg_parser.parse_args()
+
+    mapping = {}
+    for item in args.map:
+        field, sep, column = item.partition("=")
+        if not sep:
+            arg_parser.error(f"--map expects FIELD=COLUMN, got {item!r}")
+        mapping[field.strip()] = column.strip()
+
+    catalog = CategoryCatalog(os.path.join(os.path.dirname(os.path.abspath(__file__)), "category.json"))
+
+    budget_book = budgets.BudgetBook(budgets_collection, budget_counters_collection)
+
+    async def on_inserted(docs):
+        # Same derived data the import_expenses tool keeps current
+        await rollups.apply_inserts(daily_rollups_collection, monthly_rollups_collection, docs)
+        await budget_book.apply([(doc, 1) for doc in docs])
+
+    result = asyncio.run(import_file(
+        expenses_collection, migrations_collection, args.path, catalog, args.user_id, mapping,
+        args.default_category, args.chunk_size, args.dry_run, args.offset, on_inserted
+    ))
+    print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import datetime
+
+from search import TEXT_FIELDS, TEXT_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# Only indexes whose name carries this prefix are owned (and reconciled) by us
+MANAGED_PREFIX = "mx_"
+
+# name -> ordered key spec; each one backs a query shape used by a tool.
+# Every tool query is scoped to one user, so user_id leads every key and
+# a query only walks that user's slice of the index.
+INDEX_SPECS = {
+    "mx_user_date_id": [("user_id", 1), ("date_at", 1), ("_id", 1)],
+    "mx_user_category_date": [("user_id", 1), ("category", 1), ("date_at", 1)],
+    "mx_user_payment_method_date": [("user_id", 1), ("payment_method", 1), ("date_at", 1)],
+    "mx_user_amount_date": [("user_id", 1), ("amount", 1), ("date_at", 1)],
+    # search_expenses: prefix matches on stored words, and ranked word search
+    "mx_user_search_terms": [("user_id", 1), ("search_terms", 1)],
+    "mx_user_text": [("user_id", 1)] + [(field, "text") for field in TEXT_FIELDS],
+}
+
+# Extra create_index options, compared against the live index like the keys
+INDEX_OPTIONS = {
+    "mx_user_text": {"weights": TEXT_WEIGHTS},
+}
+
+# tool -> representative query, used to catch plans that fall back to COLLSCAN
+CANONICAL_QUERIES = {
+    "get_all_expenses": {
+        "filter": {"user_id": "default"},
+        "sort": [("date_at", 1), ("_id", 1)]
+    },
+    "list_expenses_by_date": {
+        "pipeline": [
+            {"$match": {"user_id": "default", "date_at": {"$gte": datetime.datetime(2025, 1, 1), "$lte": datetime.datetime(2025, 1, 31)}}},
+            {"$facet": {"totals": [{"$group": {"_id": None, "count": {"$sum": 1}}}]}}
+        ]
+    },
+    "update_expense": {
+        "filter": {"user_id": "default", "date_at": datetime.datetime(2025, 1, 1), "amount": 10.0, "category": "food"}
+    },
+    "delete_expense": {
+        "filter": {"user_id": "default", "amount": 10.0}
+    },
+    "search_expenses": {
+        "filter": {"user_id": "default", "$text": {"$search": "uber"}}
+    },
+    "search_expenses_prefix": {
+        "filter": {"user_id": "default", "$and": [{"search_terms": {"$regex": "^ub"}}]},
+        "sort": [("date_at", -1), ("_id", -1)]
+    },
+}
+
+
+def _stored_key(keys: list) -> list:
+    """Key pattern as index_information() reports it: text fields collapse into _fts/_ftsx."""
+    stored = []
+    for field, kind in keys:
+        if kind != "text":
+            stored.append((field, kind))
+        elif ("_fts", "text") not in stored:
+            stored += [("_fts", "text"), ("_ftsx", 1)]
+    return stored
+
+
+def _matches(current: dict, name: str) -> bool:
+    keys = INDEX_SPECS[name]
+    if list(current["key"]) not in (keys, _stored_key(keys)):
+        return False
+    return all(current.get(option, value) == value for option, value in INDEX_OPTIONS.get(name, {}).items())
+
+
+async def ensure_indexes(collection) -> dict:
+    """Create missing managed indexes and rebuild or drop ones that drifted.
+
+    Returns a report with the names that were created, rebuilt and dropped.
+    """
+    existing = await collection.index_information()
+    report = {"created": [], "rebuilt": [], "dropped": []}
+
+    for name, info in existing.items():
+        if name.startswith(MANAGED_PREFIX) and name not in INDEX_SPECS:
+            await collection.drop_index(name)
+            report["dropped"].append(name)
+
+    for name, keys in INDEX_SPECS.items():
+        current = existing.get(name)
+        if current is not None and _matches(current, name):
+            continue
+
+        if current is not None:
+            await collection.drop_index(name)
+            report["rebuilt"].append(name)
+        else:
+            report["created"].append(name)
+
+        await collection.create_index(keys, name=name, **INDEX_OPTIONS.get(name, {}))
+
+    return report
+
+
+def _plan_stages(node):
+    """Yield every stage name found anywhere in an explain() document."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node["stage"]
+        for value in node.values():
+            yield from _plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _plan_stages(item)
+
+
+async def explain_query(collection, spec: dict) -> dict:
+    """Run explain() on one canonical query and return its winning plan stages."""
+    if "pipeline" in spec:
+        explained = await collection.database.command(
+            "aggregate", collection.name, pipeline=spec["pipeline"], explain=True
+        )
+    else:
+        cursor = collection.find(spec["filter"])
+        if spec.get("sort"):
+            cursor = cursor.sort(spec["sort"])
+        explained = await cursor.explain()
+
+    return {"stages": sorted(set(_plan_stages(explained)))}
+
+
+async def verify_query_plans(collection) -> dict:
+    """Explain every tool's canonical query and flag the ones doing a COLLSCAN."""
+    plans = {}
+    for tool, spec in CANONICAL_QUERIES.items():
+        try:
+            result = await explain_query(collection, spec)
+            result["collscan"] = "COLLSCAN" in result["stages"]
+        except Exception as e:
+            result = {"stages": [], "collscan": None, "error": str(e)}
+        plans[tool] = result
+
+    return {
+        "plans": plans,
+        "collscan_tools": [tool for tool, p in plans.items() if p["collscan"]],
+        "unverified_tools": [tool for tool, p in plans.items() if p["collscan"] is None]
+    }
+
+
+async def provision(collection) -> dict:
+    """Reconcile indexes, then verify the query plans that depend on them."""
+    indexes = await ensure_indexes(collection)
+    logger.info(f"Indexes reconciled: {indexes}")
+
+    verification = await verify_query_plans(collection)
+    if verification["collscan_tools"]:
+        logger.warning(f"Queries still doing COLLSCAN: {verification['collscan_tools']}")
+    if verification["unverified_tools"]:
+        logger.warning(f"Could not explain queries for: {verification['unverified_tools']}")
+    if not verification["collscan_tools"] and not verification["unverified_tools"]:
+        logger.info("All canonical queries are index-backed")
+
+    return {"indexes": indexes, **verification}
+
+
+if __name__ == "__main__":
+    # Exits non-zero when any canonical query still scans the whole collection
+    import json
+    import sys
+    from db import expenses_collection
+
+    report = asyncio.run(provision(expenses_collection))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["collscan_tools"] else 0)
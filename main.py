@@ -352,10 +352,15 @@
 
 import os
 import json
+import asyncio
 import datetime
+from contextlib import asynccontextmanager
 from typing import Optional
-from dateutil import parser
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from starlette.responses import PlainTextResponse
 
 # Set up logging
 import logging
@@ -372,42 +377,288 @@ except ImportError as e:
 # Get port from environment (Render sets this automatically)
 PORT = int(os.getenv("PORT", 8080))
 
+# One-time startup work; the lifespan runs per session, so guard it
+_startup_lock = asyncio.Lock()
+_startup_done = False
+startup_report = {}
+startup_tasks = []
+
+async def run_migrations():
+    try:
+        report = startup_report["migrations"] = await migrations.run_all(expenses_collection, migrations_collection)
+        if migrations.rollups_stale(report):
+            # e.g. categories were made canonical; rollups are keyed by category
+            await rollups.rebuild(expenses_collection, daily_rollups_collection, monthly_rollups_collection)
+            await budget_book.reseed(expenses_collection)
+        if any(r.get("migrated_this_run") for r in report):
+            # Results cached while a migration ran were read before it rewrote date_at, user_id or category
+            result_cache.clear()
+            if _snapshot_store is not None:
+                _snapshot_store.cache.clear()
+    except Exception as e:
+        logger.error(f"Migrations failed: {e}")
+        startup_report["migrations"] = {"status": "error", "message": str(e)}
+
+async def run_startup_tasks():
+    """Connect, provision indexes and verify query plans once per process."""
+    global _startup_done
+
+    async with _startup_lock:
+        if _startup_done or expenses_collection is None:
+            return
+
+        # Warm the connection pool; on failure the next session retries
+        try:
+            startup_report["database"] = await db.connect()
+        except Exception as e:
+            logger.error(f"Database connection failed: {e}")
+            startup_report["database"] = {"status": "error", "message": str(e)}
+            return
+
+        try:
+            startup_report["indexes"] = await indexes.provision(expenses_collection)
+        except Exception as e:
+            logger.error(f"Index provisioning failed: {e}")
+            startup_report["indexes"] = {"status": "error", "message": str(e)}
+
+        # Online and resumable, so it runs in the background while serving
+        startup_tasks.append(asyncio.create_task(run_migrations()))
+
+        try:
+            await rollups.ensure_built(expenses_collection, daily_rollups_collection, monthly_rollups_collection)
+        except Exception as e:
+            logger.error(f"Rollup initialization failed: {e}")
+
+        try:
+            await budget_book.ensure_indexes()
+        except Exception as e:
+            logger.error(f"Budget index creation failed: {e}")
+
+        if recurring.ENABLED:
+            try:
+                await recurring_scheduler.ensure_indexes()
+            except Exception as e:
+                logger.error(f"Recurring rule index creation failed: {e}")
+            # Catches up missed occurrences on its first pass, then runs every RECURRING_INTERVAL
+            startup_tasks.append(asyncio.create_task(recurring_scheduler.run()))
+
+        _startup_done = True
+
+@asynccontextmanager
+async def server_lifespan(server):
+    await run_startup_tasks()
+    yield {}
+
 # Initialize FastMCP with Render configuration
 mcp = FastMCP(
     "Expenses-tracker-mcp-server",
     host="0.0.0.0",
-    port=PORT
+    port=PORT,
+    lifespan=server_lifespan
 )
 logger.info(f"FastMCP initialized on port {PORT}")
 
 # Import database connection
 try:
-    from db import expenses_collection
+    import db
+    from db import expenses_collection, daily_rollups_collection, monthly_rollups_collection, migrations_collection
+    from db import budgets_collection, budget_counters_collection, recurring_rules_collection
     logger.info("Database connection imported successfully")
 except ImportError as e:
     logger.error(f"Failed to import database: {e}")
+    db = None
     expenses_collection = None
+    daily_rollups_collection = None
+    monthly_rollups_collection = None
+    migrations_collection = None
+    budgets_collection = None
+    budget_counters_collection = None
+    recurring_rules_collection = None
+
+import budgets
+import export
+import indexes
+import metrics
+import rollups
+import migrations
+import profiler
+import recurring
+import search
+import write_batcher
+from catalog import CategoryCatalog
+from dates import convert_date, to_datetime
+from pagination import (
+    DEFAULT_PAGE_SIZE, LIST_PROJECTION, RESPONSE_FORMATS, build_page, clamp_page_size, compact_json, fetch_page,
+    format_page, page_stages, parse_fields, serialize_expense
+)
+from result_cache import ResultCache
+from tenancy import current_user_id, user_dir
 
 CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), "category.json")
+category_catalog = CategoryCatalog(CATEGORIES_PATH)
+
+# Read tool results, evicted by date range on every write
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256)),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+)
+
+# Budget definitions, and running totals adjusted on every expense write
+budget_book = budgets.BudgetBook(budgets_collection, budget_counters_collection)
+
+# Columnar snapshots reused by the analytics tools. Created on first use so
+# numpy/pandas are only imported once an analytics tool actually runs.
+_snapshot_store = None
+
+def get_snapshot_store():
+    global _snapshot_store
+    if _snapshot_store is None:
+        from analytics import SnapshotStore
+        _snapshot_store = SnapshotStore(
+            max_entries=int(os.getenv("ANALYTICS_MAX_SNAPSHOTS", 4)),
+            max_bytes=int(os.getenv("ANALYTICS_MAX_SNAPSHOT_BYTES", 256 * 1024 * 1024))
+        )
+    return _snapshot_store
+
+async def on_expense_written(before: Optional[dict] = None, after: Optional[dict] = None) -> list:
+    """Propagate an expense insert (after), delete (before) or update (both) to derived data.
+
+    Returns the new state of every budget the write touched.
+    """
+    dates = [e["date"] for e in (before, after) if e]
+    result_cache.invalidate_dates(dates)
+    if _snapshot_store is not None:
+        _snapshot_store.invalidate_dates(dates)
+
+    try:
+        await rollups.apply_change(daily_rollups_collection, monthly_rollups_collection, before, after)
+    except Exception as e:
+        logger.error(f"Error updating rollups: {e}")
+
+    changes = []
+    if before:
+        changes.append((before, -1))
+    if after:
+        changes.append((after, 1))
+
+    try:
+        return await budget_book.apply(changes)
+    except Exception as e:
+        logger.error(f"Error updating budgets: {e}")
+        return []
+
+async def on_expenses_inserted(expenses: list) -> list:
+    """Propagate a batch of inserted expenses to derived data in one pass.
+
+    Returns the new state of every budget the batch touched.
+    """
+    dates = {e["date"] for e in expenses}
+    result_cache.invalidate_dates(dates)
+    if _snapshot_store is not None:
+        _snapshot_store.invalidate_dates(dates)
 
-def convert_date(date_str: str):
-    """Convert ANY date format into ISO format YYYY-MM-DD."""
     try:
-        dt = parser.parse(date_str, dayfirst=True)  
-        return dt.strftime("%Y-%m-%d")
-    except Exception:
-        raise ValueError(f"Invalid date format: {date_str}")
+        await rollups.apply_inserts(daily_rollups_collection, monthly_rollups_collection, expenses)
+    except Exception as e:
+        logger.error(f"Error updating rollups: {e}")
+
+    try:
+        return await budget_book.apply([(expense, 1) for expense in expenses])
+    except Exception as e:
+        logger.error(f"Error updating budgets: {e}")
+        return []
+
+def with_budgets(response: dict, statuses: list) -> dict:
+    """Attach the budgets a write touched, and any thresholds it crossed, to a tool response."""
+    if statuses:
+        response["budgets"] = statuses
+        alerts = budgets.alerts(statuses)
+        if alerts:
+            response["budget_alerts"] = alerts
+    return response
+
+def build_expense(date, amount, category, subcategory="", note="", payment_method="cash") -> dict:
+    """Validate and normalize one expense into the stored document shape."""
+    if not category:
+        raise ValueError("Category is required")
+
+    category, subcategory = category_catalog.resolve(category, subcategory)
+
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {amount}")
+
+    iso_date = convert_date(date)
+
+    expense = {
+        "user_id": current_user_id(),
+        "date": iso_date,
+        "date_at": to_datetime(iso_date),
+        "amount": amount,
+        "category": category,
+        "subcategory": subcategory,
+        "note": note or "",
+        "payment_method": payment_method or "cash",
+        "created_at": datetime.datetime.now()
+    }
+    expense["search_terms"] = search.search_terms(expense)
+    return expense
+
+# Recurring rules, materialized into expenses by a background task
+recurring_scheduler = recurring.RecurringScheduler(
+    recurring_rules_collection, expenses_collection, build_expense, on_inserted=on_expenses_inserted
+)
+
+async def on_batch_inserted(expenses: list) -> list:
+    """Derived data for one write batcher flush; returns the budgets each expense touched."""
+    by_user = {}
+    for expense in expenses:
+        by_user.setdefault(expense["user_id"], []).append(expense)
+    results = await asyncio.gather(*(on_expenses_inserted(group) for group in by_user.values()))
+
+    own = {}
+    for group, statuses in zip(by_user.values(), results):
+        own.update(zip((expense["_id"] for expense in group), budgets.per_expense(statuses, group)))
+    return [own[expense["_id"]] for expense in expenses]
+
+# Coalesces concurrent add_expense inserts when WRITE_BATCH_WINDOW_MS is set
+expense_writer = write_batcher.WriteBatcher(expenses_collection, after_insert=on_batch_inserted)
 
 # ------------------------- HEALTH CHECK -------------------------
 @mcp.resource("health:///status")
-def health_check():
-    """Health check endpoint for Render"""
+async def health_check():
+    """Health check endpoint for Render: database ping latency and connection pool usage"""
+    if db is None:
+        return json.dumps({"status": "unhealthy", "service": "expenses-tracker-mcp", "database": "disconnected"})
+
+    try:
+        latency = await db.ping()
+        database = {"status": "connected", "ping_ms": round(latency, 3)}
+    except Exception as e:
+        logger.error(f"Database ping failed: {e}")
+        database = {"status": "unreachable", "message": str(e)}
+
     return json.dumps({
-        "status": "healthy",
+        "status": "healthy" if database["status"] == "connected" else "unhealthy",
         "service": "expenses-tracker-mcp",
-        "database": "connected" if expenses_collection is not None else "disconnected"
+        "database": database,
+        "pool": db.pool_monitor.stats()
     })
 
+@mcp.resource("cache:///stats")
+def cache_stats():
+    """Hit/miss counters and size of the read tool result and analytics snapshot caches"""
+    return json.dumps({
+        "results": result_cache.stats(),
+        "analytics_snapshots": _snapshot_store.stats() if _snapshot_store is not None else None
+    }, indent=2)
+
+@mcp.resource("health:///indexes")
+def index_report():
+    """Index reconciliation and query-plan verification from the last startup"""
+    return json.dumps(startup_report.get("indexes", {"status": "pending"}), indent=2)
+
 # ------------------------- ADD EXPENSE -------------------------
 @mcp.tool()
 async def add_expense(
@@ -423,7 +674,8 @@ async def add_expense(
     Args:
         date: Expense date in any common format (e.g., 2025-01-03, 3/1/25, Jan 3 2025)
         amount: Amount spent (e.g., 15.50)
-        category: Expense category (e.g., Food & Dining, Transportation)
+        category: Expense category from expense:///categories (common names such as
+            "Food & Dining" or "groceries" are mapped to the canonical category)
         subcategory: Optional subcategory for more detail
         note: Optional note about the expense
         payment_method: Payment method used (cash, credit card, gpay, etc.)
@@ -432,50 +684,178 @@ async def add_expense(
         return {"status": "error", "message": "Database not connected"}
     
     try:
-        expense = {
-            "date": convert_date(date),
-            "amount": float(amount),
-            "category": category,
-            "subcategory": subcategory,
-            "note": note,
-            "payment_method": payment_method,
-            "created_at": datetime.datetime.now()
-        }
+        expense = build_expense(date, amount, category, subcategory, note, payment_method)
 
-        result = await expenses_collection.insert_one(expense)
+        if expense_writer.enabled:
+            inserted_id, budget_statuses = await expense_writer.insert(expense)
+        else:
+            inserted_id = (await expenses_collection.insert_one(expense)).inserted_id
+            budget_statuses = await on_expense_written(after=expense)
 
-        return {
+        return with_budgets({
             "status": "success",
-            "id": str(result.inserted_id),
-            "message": f"Expense added successfully: ₹{amount} for {category}"
-        }
+            "id": str(inserted_id),
+            "message": f"Expense added successfully: ₹{amount} for {expense['category']}"
+        }, budget_statuses)
 
     except Exception as e:
         logger.error(f"Error adding expense: {e}")
         return {"status": "error", "message": str(e)}
 
+# ------------------------- BULK ADD -------------------------
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+MAX_BULK_CHUNK_SIZE = 10000
+
+@mcp.tool()
+async def add_expenses(expenses: list[dict], chunk_size: int = BULK_CHUNK_SIZE):
+    """Add many expenses at once with unordered bulk inserts.
+    
+    Args:
+        expenses: List of expenses, each with date, amount, category and optional
+            subcategory, note and payment_method (same fields as add_expense)
+        chunk_size: Number of rows written per insert_many batch (max 10000)
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    chunk_size = max(1, min(int(chunk_size), MAX_BULK_CHUNK_SIZE))
+    results = [None] * len(expenses)
+    valid = []
+    # Latest state per budget counter across all chunks, with every threshold crossed
+    budget_statuses = {}
+
+    # Validate and normalize every row before touching the database
+    for i, row in enumerate(expenses):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Expense must be an object")
+            doc = build_expense(
+                row.get("date"),
+                row.get("amount"),
+                row.get("category"),
+                row.get("subcategory", ""),
+                row.get("note", ""),
+                row.get("payment_method", "cash")
+            )
+            valid.append((i, doc))
+        except Exception as e:
+            results[i] = {"index": i, "status": "error", "message": str(e)}
+
+    try:
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            failed = {}
+
+            try:
+                await expenses_collection.insert_many([doc for _, doc in chunk], ordered=False)
+            except BulkWriteError as e:
+                failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+
+            inserted = []
+            for pos, (i, doc) in enumerate(chunk):
+                if pos in failed:
+                    results[i] = {"index": i, "status": "error", "message": failed[pos]}
+                else:
+                    results[i] = {"index": i, "status": "success", "id": str(doc["_id"])}
+                    inserted.append(doc)
+
+            for status in await on_expenses_inserted(inserted):
+                key = (status["category"], status["period"], status["key"])
+                crossed = budget_statuses[key]["crossed"] if key in budget_statuses else []
+                budget_statuses[key] = {**status, "crossed": crossed + status["crossed"]}
+
+    except Exception as e:
+        logger.error(f"Error bulk adding expenses: {e}")
+        for i, _ in valid:
+            if results[i] is None:
+                results[i] = {"index": i, "status": "error", "message": str(e)}
+
+    inserted_count = sum(1 for r in results if r["status"] == "success")
+    failed_count = len(results) - inserted_count
+
+    return with_budgets({
+        "status": "success" if failed_count == 0 else ("partial" if inserted_count else "error"),
+        "inserted": inserted_count,
+        "failed": failed_count,
+        "results": results
+    }, list(budget_statuses.values()))
+
+@mcp.tool()
+async def import_expenses(
+    filename: str,
+    columns: Optional[dict] = None,
+    default_category: Optional[str] = None,
+    dry_run: bool = False,
+    offset: Optional[int] = None,
+    chunk_size: Optional[int] = None
+):
+    """Import expenses from a CSV or XLSX statement in your import directory.
+    
+    Interrupted imports resume from the last completed chunk when run again.
+    
+    Args:
+        filename: File name inside your import directory (.csv or .xlsx)
+        columns: Optional mapping of expense field to file column, e.g. {"date": "Txn Date", "note": "Narration"}
+        default_category: Category for rows without one
+        dry_run: Only parse and validate; report row counts, rejects and throughput
+        offset: Start at this data row instead of the saved checkpoint
+        chunk_size: Rows read and written per chunk (default IMPORT_CHUNK_SIZE)
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            return {"status": "error", "message": "filename must be a plain file name"}
+
+        # pandas is only loaded once an import actually runs
+        import importer
+        chunk_size = max(1, int(chunk_size or importer.CHUNK_SIZE))
+
+        result = await importer.import_file(
+            expenses_collection, migrations_collection, os.path.join(user_dir(importer.IMPORT_DIR, current_user_id()), filename),
+            category_catalog, current_user_id(), columns, default_category, chunk_size, dry_run, offset,
+            on_inserted=on_expenses_inserted
+        )
+        return {"status": "success", **result}
+
+    except Exception as e:
+        logger.error(f"Error importing expenses: {e}")
+        return {"status": "error", "message": str(e)}
+
 # ------------------------- GET ALL -------------------------
 @mcp.tool()
-async def get_all_expenses():
-    """Retrieve all expenses from the database, sorted by date."""
+async def get_all_expenses(
+    page_size: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "rows"
+):
+    """Retrieve expenses from the database one page at a time, sorted by date.
+    
+    Args:
+        page_size: Number of expenses per page (max 1000)
+        cursor: Continuation token from a previous page's next_cursor
+        fields: Comma separated fields to return (id, date, amount, category, subcategory, note, payment_method); default all
+        format: rows (one object per expense) or compact (minified JSON, one array per field; category and payment_method as indexes into "dictionaries")
+    """
     if expenses_collection is None:
         return {"status": "error", "message": "Database not connected"}
     
     try:
-        cursor = expenses_collection.find().sort("date", 1)
-        data = await cursor.to_list(None)
+        format = format.strip().lower()
+        if format not in RESPONSE_FORMATS:
+            return {"status": "error", "message": f"format must be one of: {', '.join(RESPONSE_FORMATS)}"}
+        fields = parse_fields(fields)
 
-        for d in data:
-            d["id"] = str(d["_id"])
-            del d["_id"]
-            if "created_at" in d:
-                del d["created_at"]
+        page = await fetch_page(expenses_collection, {"user_id": current_user_id()}, page_size, cursor, fields=fields)
 
-        return {
+        response = {
             "status": "success",
-            "count": len(data),
-            "expenses": data
+            "count": len(page["expenses"]),
+            **format_page(page, format, fields)
         }
+        return compact_json(response) if format == "compact" else response
 
     except Exception as e:
         logger.error(f"Error getting expenses: {e}")
@@ -483,12 +863,25 @@ async def get_all_expenses():
 
 # ------------------------- DATE RANGE -------------------------
 @mcp.tool()
-async def list_expenses_by_date(start_date: str, end_date: str):
-    """List all expenses between two dates.
+async def list_expenses_by_date(
+    start_date: str,
+    end_date: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    totals_only: bool = False,
+    fields: Optional[str] = None,
+    format: str = "rows"
+):
+    """List expenses between two dates one page at a time, with range totals.
     
     Args:
         start_date: Start date in any format (e.g., 2025-01-01)
         end_date: End date in any format (e.g., 2025-01-31)
+        page_size: Number of expenses per page (max 1000)
+        cursor: Continuation token from a previous page's next_cursor
+        totals_only: Return only count, total and per-category subtotals, no rows
+        fields: Comma separated fields to return (id, date, amount, category, subcategory, note, payment_method); default all
+        format: rows (one object per expense) or compact (minified JSON, one array per field; category and payment_method as indexes into "dictionaries")
     """
     if expenses_collection is None:
         return {"status": "error", "message": "Database not connected"}
@@ -496,31 +889,113 @@ async def list_expenses_by_date(start_date: str, end_date: str):
     try:
         start = convert_date(start_date)
         end = convert_date(end_date)
+        format = format.strip().lower()
+        if format not in RESPONSE_FORMATS:
+            return {"status": "error", "message": f"format must be one of: {', '.join(RESPONSE_FORMATS)}"}
+        fields = parse_fields(fields)
+
+        user_id = current_user_id()
+        cache_key = (
+            "list_expenses_by_date", user_id, start, end, clamp_page_size(page_size), cursor, bool(totals_only),
+            tuple(fields) if fields else None, format
+        )
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = result_cache.generation
+
+        query = {"user_id": user_id, "date_at": {"$gte": to_datetime(start), "$lte": to_datetime(end)}}
+
+        # Totals, subtotals and the requested page in one round trip
+        facets = {
+            "totals": [
+                {"$group": {"_id": None, "count": {"$sum": 1}, "total": {"$sum": "$amount"}}}
+            ],
+            "by_category": [
+                {"$group": {"_id": "$category", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"total": -1}}
+            ]
+        }
+        if not totals_only:
+            facets["page"] = page_stages(page_size, cursor, fields)
 
-        cursor = expenses_collection.find({
-            "date": {"$gte": start, "$lte": end}
-        }).sort("date", 1)
+        result = await expenses_collection.aggregate([
+            {"$match": query},
+            {"$facet": facets}
+        ]).to_list(1)
+        result = result[0] if result else {}
+        totals = result.get("totals") or [{"count": 0, "total": 0}]
 
-        data = await cursor.to_list(None)
+        response = {
+            "status": "success",
+            "period": f"{start} to {end}",
+            "count": totals[0]["count"],
+            "total_amount": totals[0]["total"],
+            "by_category": [
+                {"category": r["_id"], "total_amount": r["total"], "count": r["count"]}
+                for r in result.get("by_category", [])
+            ]
+        }
 
-        for d in data:
-            d["id"] = str(d["_id"])
-            del d["_id"]
-            if "created_at" in d:
-                del d["created_at"]
+        if not totals_only:
+            page = build_page(result.get("page", []), page_size, fields)
+            response["returned"] = len(page["expenses"])
+            response.update(format_page(page, format, fields))
+            if format == "compact":
+                response = compact_json(response)
 
-        total = sum(d["amount"] for d in data)
+        result_cache.put(cache_key, response, start, end, generation)
+        return response
+
+    except Exception as e:
+        logger.error(f"Error listing expenses: {e}")
+        return {"status": "error", "message": str(e)}
+
+# ------------------------- SEARCH -------------------------
+@mcp.tool()
+async def search_expenses(
+    text: str,
+    prefix: bool = False,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = search.DEFAULT_LIMIT
+):
+    """Find expenses by words in their note, category or subcategory, best matches first.
+    
+    Args:
+        text: Words to look for (e.g. "uber ride")
+        prefix: Match words starting with each search word ("ub" finds "Uber"); newest first instead of by relevance
+        start_date: Optional start date
+        end_date: Optional end date
+        min_amount: Optional minimum amount
+        max_amount: Optional maximum amount
+        limit: Maximum number of results (max 100)
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        start = convert_date(start_date) if start_date not in (None, "", "null") else None
+        end = convert_date(end_date) if end_date not in (None, "", "null") else None
+        limit = max(1, min(int(limit), search.MAX_LIMIT))
+
+        # Text match, date range and amount range all run as one indexed query
+        query, projection, sort = search.build_query(
+            current_user_id(), text, prefix, start, end, min_amount, max_amount
+        )
+        docs = await expenses_collection.find(query, {**LIST_PROJECTION, **projection}).sort(sort).limit(limit).to_list(limit)
 
         return {
             "status": "success",
-            "period": f"{start} to {end}",
-            "count": len(data),
-            "total_amount": total,
-            "expenses": data
+            "mode": "prefix" if prefix else "text",
+            "count": len(docs),
+            "expenses": [serialize_expense(doc) for doc in docs]
         }
 
     except Exception as e:
-        logger.error(f"Error listing expenses: {e}")
+        logger.error(f"Error searching expenses: {e}")
         return {"status": "error", "message": str(e)}
 
 # ------------------------- SUMMARY -------------------------
@@ -540,20 +1015,22 @@ async def summarize(start_date: str, end_date: str, category: Optional[str] = No
         start = convert_date(start_date)
         end = convert_date(end_date)
 
-        match_stage = {
-            "date": {"$gte": start, "$lte": end}
-        }
-
-        if category and category not in (None, "", "null"):
-            match_stage["category"] = category
-
-        pipeline = [
-            {"$match": match_stage},
-            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-            {"$sort": {"total": -1}}
-        ]
-
-        results = await expenses_collection.aggregate(pipeline).to_list(None)
+        if category in (None, "", "null"):
+            category = None
+        else:
+            category = category_catalog.canonical_category(category)
+
+        user_id = current_user_id()
+        cache_key = ("summarize", user_id, start, end, category)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = result_cache.generation
+
+        # Answered from the rollups: whole months plus the days at either edge
+        results = await rollups.summarize_range(
+            daily_rollups_collection, monthly_rollups_collection, user_id, start, end, category
+        )
 
         summary_data = [
             {"category": r["_id"], "total_amount": r["total"]}
@@ -562,18 +1039,212 @@ async def summarize(start_date: str, end_date: str, category: Optional[str] = No
 
         grand_total = sum(r["total_amount"] for r in summary_data)
 
-        return {
+        response = {
             "status": "success",
             "period": f"{start} to {end}",
             "grand_total": grand_total,
             "by_category": summary_data
         }
+        result_cache.put(cache_key, response, start, end, generation)
+        return response
 
     except Exception as e:
         logger.error(f"Error summarizing expenses: {e}")
         return {"status": "error", "message": str(e)}
 
+# ------------------------- ANALYTICS -------------------------
+@mcp.tool()
+async def analyze_expenses(
+    start_date: str,
+    end_date: str,
+    group_by: str = "month,category",
+    category: Optional[str] = None,
+    percentiles: str = "50,90,99",
+    top_n: int = 5,
+    max_groups: int = 100
+):
+    """Multi-dimensional spending report: group-bys, percentiles and largest expenses.
+    
+    Args:
+        start_date: Start date
+        end_date: End date
+        group_by: Comma separated dimensions from year, month, weekday, category,
+            payment_method (e.g. "month,category,payment_method")
+        category: Optional category to restrict the report to
+        percentiles: Comma separated amount percentiles to compute (e.g. "50,90,99")
+        top_n: Number of largest individual expenses to return
+        max_groups: Maximum number of groups returned (largest totals first)
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        start = convert_date(start_date)
+        end = convert_date(end_date)
+
+        if category in (None, "", "null"):
+            category = None
+        else:
+            category = category_catalog.canonical_category(category)
+
+        import analytics
+
+        dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+        points = [float(p) for p in percentiles.split(",") if p.strip()]
+        max_groups = max(1, min(int(max_groups), analytics.MAX_GROUPS))
+
+        user_id = current_user_id()
+        snapshot, cached = await get_snapshot_store().get(
+            expenses_collection, start, end, scope=user_id, extra_filter={"user_id": user_id}
+        )
+        mask = snapshot.mask(start, end, category)
+
+        grouped = analytics.group_by(snapshot, mask, dimensions, max_groups)
+
+        return {
+            "status": "success",
+            "period": f"{start} to {end}",
+            "count": int(mask.sum()),
+            "total_amount": float(snapshot.amounts[mask].sum()),
+            "percentiles": analytics.percentiles(snapshot, mask, points),
+            "group_by": dimensions,
+            "groups": grouped["groups"],
+            "groups_truncated": grouped["truncated"],
+            "top_expenses": analytics.top_expenses(snapshot, mask, int(top_n)),
+            "snapshot": {"cached": cached, "rows": snapshot.rows, "bytes": snapshot.nbytes}
+        }
+
+    except Exception as e:
+        logger.error(f"Error analyzing expenses: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def spending_trends(
+    start_date: str,
+    end_date: str,
+    category: Optional[str] = None,
+    granularity: str = "auto",
+    max_points: int = 120
+):
+    """Spending trends: daily/weekly/monthly series, rolling 7/30-day averages,
+    month-over-month and year-over-year deltas, and per-category run rates.
+    
+    Args:
+        start_date: Start date
+        end_date: End date
+        category: Optional category to restrict the trends to
+        granularity: auto, daily, weekly or monthly (auto picks the finest that fits max_points)
+        max_points: Maximum points per series; the most recent points are kept
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        start = convert_date(start_date)
+        end = convert_date(end_date)
+        if start > end:
+            return {"status": "error", "message": "start_date must not be after end_date"}
+
+        if category in (None, "", "null"):
+            category = None
+        else:
+            category = category_catalog.canonical_category(category)
+
+        import analytics
+
+        user_id = current_user_id()
+        snapshot, cached = await get_snapshot_store().get(
+            expenses_collection, start, end, scope=user_id, extra_filter={"user_id": user_id}
+        )
+        mask = snapshot.mask(start, end, category)
+
+        return {
+            "status": "success",
+            "period": f"{start} to {end}",
+            "count": int(mask.sum()),
+            "total_amount": float(snapshot.amounts[mask].sum()),
+            **analytics.spending_trends(snapshot, mask, start, end, granularity, max_points),
+            "snapshot": {"cached": cached, "rows": snapshot.rows, "bytes": snapshot.nbytes}
+        }
+
+    except Exception as e:
+        logger.error(f"Error computing spending trends: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def export_expenses(
+    format: str = "csv",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    filename: Optional[str] = None
+):
+    """Export expenses to a CSV, NDJSON or Parquet file on the server.
+    
+    Rows are streamed from the database in batches, so memory use does not
+    grow with the size of the export.
+    
+    Args:
+        format: csv, ndjson or parquet
+        start_date: Optional start date
+        end_date: Optional end date
+        category: Optional category filter
+        filename: Optional file name inside your export directory (default: timestamped)
+    """
+    if expenses_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        format = format.strip().lower()
+        start = convert_date(start_date) if start_date not in (None, "", "null") else None
+        end = convert_date(end_date) if end_date not in (None, "", "null") else None
+        if category in (None, "", "null"):
+            category = None
+        else:
+            category = category_catalog.canonical_category(category)
+
+        filename = filename or f"expenses-{datetime.datetime.now():%Y%m%d-%H%M%S}.{format}"
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            return {"status": "error", "message": "filename must be a plain file name"}
+
+        result = await export.export(
+            expenses_collection, current_user_id(), os.path.join(user_dir(export.EXPORT_DIR, current_user_id()), filename),
+            format, start, end, category
+        )
+        return {"status": "success", **result}
+
+    except Exception as e:
+        logger.error(f"Error exporting expenses: {e}")
+        return {"status": "error", "message": str(e)}
+
 # ------------------------- UPDATE -------------------------
+# Caps on the "multiple" response so an ambiguous filter never lists every match
+OPTIONS_PAGE_SIZE = 10
+MAX_OPTIONS_PAGE_SIZE = 50
+MATCH_COUNT_LIMIT = 1000
+
+def normalize(v):
+    """Treat the empty and null-like strings some clients send for omitted arguments as None."""
+    return None if v in (None, "", "null", "None") else v
+
+async def probe_matches(filter_query: dict) -> list:
+    """Fetch at most two matches (_id and text fields): enough to tell 0, 1 and many apart."""
+    projection = {"_id": 1, **{field: 1 for field in search.TEXT_FIELDS}}
+    return await expenses_collection.find(filter_query, projection).limit(2).to_list(2)
+
+async def match_options(filter_query: dict, page_size: int, cursor: Optional[str]) -> dict:
+    """One capped keyset page of the expenses matching an ambiguous filter."""
+    count = await expenses_collection.count_documents(filter_query, limit=MATCH_COUNT_LIMIT)
+    page = await fetch_page(expenses_collection, filter_query, page_size, cursor, MAX_OPTIONS_PAGE_SIZE)
+
+    return {
+        "count": count,
+        "count_is_lower_bound": count >= MATCH_COUNT_LIMIT,
+        "options": page["expenses"],
+        "has_more": page["has_more"],
+        "next_cursor": page["next_cursor"]
+    }
+
 @mcp.tool()
 async def update_expense(
     date: Optional[str] = None,
@@ -587,14 +1258,18 @@ async def update_expense(
     new_category: Optional[str] = None,
     new_subcategory: Optional[str] = None,
     new_note: Optional[str] = None,
-    new_payment_method: Optional[str] = None
+    new_payment_method: Optional[str] = None,
+    expense_id: Optional[str] = None,
+    options_page_size: int = OPTIONS_PAGE_SIZE,
+    options_cursor: Optional[str] = None
 ):
-    """Update an expense by finding it with current values and updating to new values."""
+    """Update an expense by finding it with current values and updating to new values.
+
+    When several expenses match, a capped page of options is returned; pass
+    one option's id as expense_id, or options_cursor for the next page.
+    """
     if expenses_collection is None:
         return {"status": "error", "message": "Database not connected"}
-    
-    def normalize(v):
-        return None if v in (None, "", "null", "None") else v
 
     date = normalize(date)
     category = normalize(category)
@@ -608,51 +1283,29 @@ async def update_expense(
     new_note = normalize(new_note)
     new_payment_method = normalize(new_payment_method)
 
-    filter_query = {}
-
-    if date:
-        filter_query["date"] = convert_date(date)
-    if amount is not None:
-        filter_query["amount"] = amount
-    if category:
-        filter_query["category"] = category
-    if subcategory:
-        filter_query["subcategory"] = subcategory
-    if note:
-        filter_query["note"] = note
-    if payment_method:
-        filter_query["payment_method"] = payment_method
-
-    if not filter_query:
-        return {"status": "error", "message": "No fields provided to identify the expense."}
+    expense_id = normalize(expense_id)
 
     try:
-        matches = await expenses_collection.find(filter_query).to_list(None)
-
-        if len(matches) == 0:
-            return {"status": "error", "message": "No matching expenses found."}
-
-        if len(matches) > 1:
-            return {
-                "status": "multiple",
-                "message": "Multiple expenses match your filters. Please be more specific.",
-                "count": len(matches),
-                "options": [
-                    {
-                        "index": i,
-                        "id": str(m["_id"]),
-                        "date": m["date"],
-                        "amount": m["amount"],
-                        "category": m["category"],
-                        "subcategory": m.get("subcategory", ""),
-                        "note": m.get("note", ""),
-                        "payment_method": m.get("payment_method", "")
-                    }
-                    for i, m in enumerate(matches)
-                ]
-            }
-
-        target_id = matches[0]["_id"]
+        filter_query = {}
+
+        if expense_id:
+            filter_query["_id"] = ObjectId(expense_id)
+        if date:
+            filter_query["date_at"] = to_datetime(convert_date(date))
+        if amount is not None:
+            filter_query["amount"] = amount
+        if category:
+            filter_query["category"] = category_catalog.canonical_category(category)
+        if subcategory:
+            filter_query["subcategory"] = subcategory
+        if note:
+            filter_query["note"] = note
+        if payment_method:
+            filter_query["payment_method"] = payment_method
+
+        if not filter_query:
+            return {"status": "error", "message": "No fields provided to identify the expense."}
+        filter_query["user_id"] = current_user_id()
 
         update_fields = {}
 
@@ -661,8 +1314,10 @@ async def update_expense(
         if new_amount is not None:
             update_fields["amount"] = new_amount
         if new_category:
-            update_fields["category"] = new_category
-        if new_subcategory:
+            update_fields["category"], resolved_subcategory = category_catalog.resolve(new_category, new_subcategory)
+            if new_subcategory or resolved_subcategory:
+                update_fields["subcategory"] = resolved_subcategory
+        elif new_subcategory:
             update_fields["subcategory"] = new_subcategory
         if new_note:
             update_fields["note"] = new_note
@@ -672,17 +1327,50 @@ async def update_expense(
         if not update_fields:
             return {"status": "error", "message": "No update fields provided."}
 
-        await expenses_collection.update_one(
-            {"_id": target_id},
-            {"$set": update_fields}
+        set_fields = dict(update_fields)
+        if "date" in set_fields:
+            set_fields["date_at"] = to_datetime(set_fields["date"])
+
+        matches = await probe_matches(filter_query)
+
+        if len(matches) == 0:
+            return {"status": "error", "message": "No matching expenses found."}
+
+        if len(matches) > 1:
+            return {
+                "status": "multiple",
+                "message": "Multiple expenses match your filters. Please be more specific or pass expense_id.",
+                **await match_options(filter_query, options_page_size, options_cursor)
+            }
+
+        guard = {**filter_query, "_id": matches[0]["_id"]}
+        if set(search.TEXT_FIELDS) & update_fields.keys():
+            # Search words are rebuilt from the probed text, so that text must not change underneath
+            set_fields["search_terms"] = search.search_terms({**matches[0], **set_fields})
+            guard.update({field: matches[0].get(field) for field in search.TEXT_FIELDS})
+
+        # Guarded by the matched _id and the original filter, so a concurrent
+        # change between the probe and this write cannot be overwritten
+        before = await expenses_collection.find_one_and_update(
+            guard,
+            {"$set": set_fields},
+            return_document=ReturnDocument.BEFORE
         )
 
-        return {
+        if before is None:
+            return {"status": "error", "message": "Expense changed or was removed concurrently. Please retry."}
+
+        budget_statuses = await on_expense_written(before=before, after={**before, **set_fields})
+
+        return with_budgets({
             "status": "success",
             "message": "Expense updated successfully",
             "updated_fields": list(update_fields.keys())
-        }
+        }, budget_statuses)
     
+    except (InvalidId, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+
     except Exception as e:
         logger.error(f"Error updating expense: {e}")
         return {"status": "error", "message": str(e)}
@@ -693,63 +1381,259 @@ async def delete_expense(
     date: Optional[str] = None,
     amount: Optional[float] = None,
     category: Optional[str] = None,
-    note: Optional[str] = None
+    note: Optional[str] = None,
+    expense_id: Optional[str] = None,
+    options_page_size: int = OPTIONS_PAGE_SIZE,
+    options_cursor: Optional[str] = None
 ):
-    """Delete an expense by finding it with the provided criteria."""
+    """Delete an expense by finding it with the provided criteria.
+
+    When several expenses match, a capped page of options is returned; pass
+    one option's id as expense_id, or options_cursor for the next page.
+    """
     if expenses_collection is None:
         return {"status": "error", "message": "Database not connected"}
+
+    expense_id = normalize(expense_id)
     
-    filter_query = {}
+    try:
+        filter_query = {}
     
-    if date:
-        filter_query["date"] = convert_date(date)
-    if amount is not None:
-        filter_query["amount"] = amount
-    if category:
-        filter_query["category"] = category
-    if note:
-        filter_query["note"] = note
+        if expense_id:
+            filter_query["_id"] = ObjectId(expense_id)
+        if date:
+            filter_query["date_at"] = to_datetime(convert_date(date))
+        if amount is not None:
+            filter_query["amount"] = amount
+        if category:
+            filter_query["category"] = category_catalog.canonical_category(category)
+        if note:
+            filter_query["note"] = note
     
-    if not filter_query:
-        return {"status": "error", "message": "Please provide at least one field to identify the expense"}
+        if not filter_query:
+            return {"status": "error", "message": "Please provide at least one field to identify the expense"}
+        filter_query["user_id"] = current_user_id()
     
-    try:
-        matches = await expenses_collection.find(filter_query).to_list(None)
+        matches = await probe_matches(filter_query)
         
         if len(matches) == 0:
             return {"status": "error", "message": "No matching expense found"}
         
         if len(matches) > 1:
+            options = await match_options(filter_query, options_page_size, options_cursor)
+            count = f"{options['count']}+" if options["count_is_lower_bound"] else options["count"]
             return {
                 "status": "multiple",
-                "message": f"Found {len(matches)} matching expenses. Please be more specific.",
-                "matches": [
-                    {
-                        "date": m["date"],
-                        "amount": m["amount"],
-                        "category": m["category"],
-                        "note": m.get("note", "")
-                    }
-                    for m in matches
-                ]
+                "message": f"Found {count} matching expenses. Please be more specific or pass expense_id.",
+                "matches": options.pop("options"),
+                **options
             }
         
-        result = await expenses_collection.delete_one({"_id": matches[0]["_id"]})
+        deleted = await expenses_collection.find_one_and_delete({**filter_query, "_id": matches[0]["_id"]})
+
+        if deleted is None:
+            return {"status": "error", "message": "Expense changed or was removed concurrently. Please retry."}
+
+        budget_statuses = await on_expense_written(before=deleted)
         
-        return {
+        return with_budgets({
             "status": "success",
             "message": "Expense deleted successfully",
             "deleted": {
-                "date": matches[0]["date"],
-                "amount": matches[0]["amount"],
-                "category": matches[0]["category"]
+                "date": deleted["date"],
+                "amount": deleted["amount"],
+                "category": deleted["category"]
             }
-        }
+        }, budget_statuses)
     
+    except (InvalidId, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+
     except Exception as e:
         logger.error(f"Error deleting expense: {e}")
         return {"status": "error", "message": str(e)}
 
+# ------------------------- BUDGETS -------------------------
+def budget_category(category: Optional[str]) -> str:
+    """Canonical budget category; empty, "all" or "*" means every expense."""
+    if category in (None, "", "null", "all", "*"):
+        return budgets.ALL_CATEGORIES
+    return category_catalog.resolve(category)[0]
+
+@mcp.tool()
+async def set_budget(
+    category: str,
+    limit: float,
+    period: str = "monthly",
+    thresholds: str = "80,100"
+):
+    """Create or replace a spending budget for a category (or "all") per week, month or year.
+    
+    Args:
+        category: Category from expense:///categories, or "all" for total spending
+        limit: Maximum amount to spend per period
+        period: weekly, monthly or yearly
+        thresholds: Comma separated percentages of the limit that trigger an alert when a new expense crosses them
+    """
+    if budgets_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        if float(limit) <= 0:
+            return {"status": "error", "message": "limit must be greater than 0"}
+        points = [float(t) / 100 for t in thresholds.split(",") if t.strip()]
+
+        budget = await budget_book.set_budget(
+            expenses_collection, current_user_id(), budget_category(category), period.strip().lower(), limit, points
+        )
+        budget.pop("user_id")
+        return {"status": "success", "budget": budget}
+
+    except Exception as e:
+        logger.error(f"Error setting budget: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def delete_budget(category: str, period: str = "monthly"):
+    """Remove a budget and its running totals.
+    
+    Args:
+        category: Budget category, or "all"
+        period: weekly, monthly or yearly
+    """
+    if budgets_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        deleted = await budget_book.delete_budget(current_user_id(), budget_category(category), period.strip().lower())
+        if not deleted:
+            return {"status": "error", "message": "No matching budget found"}
+        return {"status": "success", "message": "Budget deleted"}
+
+    except Exception as e:
+        logger.error(f"Error deleting budget: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def budget_status(date: Optional[str] = None, category: Optional[str] = None):
+    """Spent, remaining and percentage used for every budget, read from running totals.
+    
+    Args:
+        date: Any date inside the periods to report (default today)
+        category: Optional budget category (or "all") to report on
+    """
+    if budgets_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        iso_date = convert_date(date) if date not in (None, "", "null") else datetime.date.today().isoformat()
+        category = budget_category(category) if category not in (None, "", "null") else None
+
+        statuses = await budget_book.status(current_user_id(), iso_date, category)
+        return {
+            "status": "success",
+            "date": iso_date,
+            "budgets": statuses
+        }
+
+    except Exception as e:
+        logger.error(f"Error reading budget status: {e}")
+        return {"status": "error", "message": str(e)}
+
+# ------------------------- RECURRING -------------------------
+@mcp.tool()
+async def add_recurring_expense(
+    amount: float,
+    category: str,
+    start_date: str,
+    day_of_month: Optional[int] = None,
+    cron: Optional[str] = None,
+    end_date: Optional[str] = None,
+    subcategory: str = "",
+    note: str = "",
+    payment_method: str = "cash"
+):
+    """Add an expense that repeats automatically (rent, subscriptions, EMIs).
+    
+    Occurrences from start_date up to today are added right away; later ones
+    are added by the background scheduler as they fall due.
+    
+    Args:
+        amount: Amount per occurrence
+        category: Expense category from expense:///categories
+        start_date: First date the rule applies from
+        day_of_month: Monthly on this day (1-31; short months use their last day). Default: start_date's day
+        cron: Instead of day_of_month, a day-level cron "day month weekday" (e.g. "1 * *", "* * 1" for Mondays, "15 1,7 *")
+        end_date: Optional last date the rule applies to
+        subcategory: Optional subcategory
+        note: Optional note (e.g. "Rent")
+        payment_method: Payment method used
+    """
+    if recurring_rules_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        start = convert_date(start_date)
+        end = convert_date(end_date) if end_date not in (None, "", "null") else None
+        if end and end < start:
+            return {"status": "error", "message": "end_date must not be before start_date"}
+
+        # Validates and canonicalizes the fields every occurrence will carry
+        expense = build_expense(start, amount, category, subcategory, note, payment_method)
+        cron = None if cron in (None, "", "null") else cron
+        schedule = recurring.build_schedule(day_of_month or (None if cron else int(start[8:])), cron)
+
+        rule = await recurring_scheduler.add_rule(current_user_id(), expense, schedule, start, end)
+        run = await recurring_scheduler.materialize(query={"_id": rule["_id"]})
+
+        return {
+            "status": "success",
+            "rule": recurring.serialize_rule(await recurring_rules_collection.find_one({"_id": rule["_id"]}) or rule),
+            "added": run["inserted"]
+        }
+
+    except Exception as e:
+        logger.error(f"Error adding recurring expense: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def list_recurring_expenses():
+    """List your recurring expense rules with their next due dates."""
+    if recurring_rules_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        rules = await recurring_scheduler.list_rules(current_user_id())
+        return {
+            "status": "success",
+            "count": len(rules),
+            "rules": [recurring.serialize_rule(rule) for rule in rules],
+            "last_run": recurring_scheduler.last_run_for(current_user_id())
+        }
+
+    except Exception as e:
+        logger.error(f"Error listing recurring expenses: {e}")
+        return {"status": "error", "message": str(e)}
+
+@mcp.tool()
+async def delete_recurring_expense(rule_id: str):
+    """Stop a recurring expense; expenses it already added are kept.
+    
+    Args:
+        rule_id: Rule id from list_recurring_expenses
+    """
+    if recurring_rules_collection is None:
+        return {"status": "error", "message": "Database not connected"}
+
+    try:
+        if not await recurring_scheduler.delete_rule(current_user_id(), ObjectId(rule_id)):
+            return {"status": "error", "message": "No matching recurring expense found"}
+        return {"status": "success", "message": "Recurring expense stopped"}
+
+    except Exception as e:
+        logger.error(f"Error deleting recurring expense: {e}")
+        return {"status": "error", "message": str(e)}
+
 # ------------------------- PROMPTS -------------------------
 @mcp.prompt()
 def welcome():
@@ -774,35 +1658,67 @@ def add_expense_prompt() -> str:
 @mcp.resource("expense:///categories")
 def categories():
     """List of available expense categories"""
-    default_categories = {
-        "categories": [
-            "Food & Dining",
-            "Transportation",
-            "Shopping",
-            "Entertainment",
-            "Bills & Utilities",
-            "Healthcare",
-            "Travel",
-            "Education",
-            "Business",
-            "Other"
-        ]
-    }
-    
-    try:
-        with open(CATEGORIES_PATH, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return json.dumps(default_categories, indent=2)
-    except Exception as e:
-        logger.error(f"Error reading categories: {e}")
-        return json.dumps(default_categories, indent=2)
+    return category_catalog.to_json()
+
+# ------------------------- METRICS -------------------------
+@mcp.resource("metrics:///tools")
+def tool_metrics():
+    """Calls, errors, latency percentiles and response sizes per tool, prompt and resource"""
+    return json.dumps(metrics.registry.snapshot(), indent=2)
+
+@mcp.resource("metrics:///write-batcher")
+def write_batcher_metrics():
+    """Flush count, batch sizes and flush latency of the add_expense write batcher"""
+    return json.dumps(expense_writer.stats(), indent=2)
+
+@mcp.resource("profiler:///slow-queries")
+def slow_queries():
+    """Database time, documents and bytes per MCP call, plus your recent slow commands with their query plans"""
+    return json.dumps(profiler.command_profiler.report(current_user_id()), indent=2, default=str)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request):
+    """Prometheus scrape endpoint served next to the MCP transport"""
+    return PlainTextResponse(metrics.registry.render_prometheus() + expense_writer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# Must stay after the last tool/prompt/resource registration
+metrics.instrument(mcp)
+
+# ------------------------- ASGI APP -------------------------
+def create_app():
+    """Streamable HTTP ASGI app, importable as `app:app` by any ASGI server.
+
+    Startup work (pool warm-up, indexes, rollups) starts in the background
+    as soon as the server boots rather than inside the first MCP session,
+    and the database client is closed on shutdown.
+    """
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with session_lifespan(app):
+            warmup = asyncio.create_task(run_startup_tasks())
+            try:
+                yield
+            finally:
+                # Queued add_expense inserts are written before the client closes
+                await expense_writer.drain()
+                for task in [warmup, *startup_tasks]:
+                    task.cancel()
+                if db is not None:
+                    db.close()
+
+    app.router.lifespan_context = lifespan
+    return app
 
 # ------------------------- RUN SERVER -------------------------
 if __name__ == "__main__":
+    import uvicorn
+
     logger.info(f"Starting MCP server on port {PORT}...")
     try:
-        mcp.run(transport="streamable-http")
+        uvicorn.run(create_app(), host=mcp.settings.host, port=mcp.settings.port, log_level=mcp.settings.log_level.lower())
     except Exception as e:
         logger.error(f"Failed to start server: {e}")
-        raise
\ No newline at end of file
+        raise
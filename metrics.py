@@ -0,0 +1,213 @@
+import json
+import time
+import bisect
+import inspect
+import logging
+import functools
+import threading
+
+import profiler
+
+logger = logging.getLogger(__name__)
+
+# Histogram upper bounds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list:
+        """[(le, cumulative count)] including +Inf."""
+        total = 0
+        result = []
+        for le, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += count
+            result.append((le, total))
+        return result
+
+    def quantile(self, q: float):
+        """Estimate a quantile by linear interpolation inside its bucket (capped at the max seen)."""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        lower, previous = 0.0, 0
+        for le, total in self.cumulative():
+            if total >= rank:
+                if le == float("inf"):
+                    return self.max
+                in_bucket = total - previous
+                return min(self.max, lower + (le - lower) * ((rank - previous) / in_bucket if in_bucket else 0))
+            lower, previous = le, total
+        return self.max
+
+
+class Series:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class Registry:
+    """Call, error, latency and response-size metrics per (kind, name)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self.started_at = time.time()
+
+    def observe(self, kind: str, name: str, seconds: float, size: int = None, error: bool = False):
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = Series()
+            series.calls += 1
+            series.errors += int(error)
+            series.latency.observe(seconds)
+            if size is not None:
+                series.size.observe(size)
+
+    def snapshot(self) -> dict:
+        """JSON-friendly summary with estimated latency percentiles."""
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        with self._lock:
+            endpoints = [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "error_rate": round(s.errors / s.calls, 4) if s.calls else 0.0,
+                    "mean_ms": ms(s.latency.sum / s.latency.count) if s.latency.count else None,
+                    "p50_ms": ms(s.latency.quantile(0.5)),
+                    "p95_ms": ms(s.latency.quantile(0.95)),
+                    "p99_ms": ms(s.latency.quantile(0.99)),
+                    "mean_response_bytes": round(s.size.sum / s.size.count) if s.size.count else None
+                }
+                for (kind, name), s in sorted(self._series.items())
+            ]
+        return {"uptime_seconds": round(time.time() - self.started_at, 1), "endpoints": endpoints}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            "# HELP mcp_requests_total MCP tool, prompt and resource calls.",
+            "# TYPE mcp_requests_total counter",
+        ]
+        with self._lock:
+            items = sorted(self._series.items())
+            for (kind, name), s in items:
+                lines.append(f'mcp_requests_total{{kind="{kind}",name="{name}"}} {s.calls}')
+
+            lines += [
+                "# HELP mcp_request_errors_total Calls that raised or returned status error.",
+                "# TYPE mcp_request_errors_total counter",
+            ]
+            for (kind, name), s in items:
+                lines.append(f'mcp_request_errors_total{{kind="{kind}",name="{name}"}} {s.errors}')
+
+            for metric, help_text, attr in (
+                ("mcp_request_duration_seconds", "Call latency in seconds.", "latency"),
+                ("mcp_response_size_bytes", "Serialized response size in bytes.", "size"),
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for (kind, name), s in items:
+                    histogram = getattr(s, attr)
+                    labels = f'kind="{kind}",name="{name}"'
+                    for le, total in histogram.cumulative():
+                        le_label = "+Inf" if le == float("inf") else f"{le:g}"
+                        lines.append(f'{metric}_bucket{{{labels},le="{le_label}"}} {total}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum:g}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def response_size(result) -> int:
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(str(result))
+
+
+def is_error(result) -> bool:
+    return isinstance(result, dict) and result.get("status") == "error"
+
+
+def timed(kind: str, name: str, fn):
+    """Wrap a sync or async handler so every call is recorded in the registry."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            # Lets the database profiler attribute commands to this call
+            call = profiler.current_call.set(f"{kind}:{name}")
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                registry.observe(kind, name, time.perf_counter() - t0, error=True)
+                raise
+            finally:
+                profiler.current_call.reset(call)
+            registry.observe(kind, name, time.perf_counter() - t0, response_size(result), is_error(result))
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            call = profiler.current_call.set(f"{kind}:{name}")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                registry.observe(kind, name, time.perf_counter() - t0, error=True)
+                raise
+            finally:
+                profiler.current_call.reset(call)
+            registry.observe(kind, name, time.perf_counter() - t0, response_size(result), is_error(result))
+            return result
+
+    return wrapper
+
+
+def instrument(mcp) -> int:
+    """Wrap every tool, prompt and resource registered on `mcp` so far.
+
+    Returns the number of handlers wrapped. Call it once, after the last
+    registration.
+    """
+    handlers = (
+        [("tool", t.name, t) for t in mcp._tool_manager.list_tools()]
+        + [("prompt", p.name, p) for p in mcp._prompt_manager.list_prompts()]
+        + [("resource", str(r.uri), r) for r in mcp._resource_manager.list_resources() if hasattr(r, "fn")]
+        + [("resource", t.uri_template, t) for t in mcp._resource_manager.list_templates()]
+    )
+
+    for kind, name, handler in handlers:
+        handler.fn = timed(kind, name, handler.fn)
+
+    logger.info(f"Instrumented {len(handlers)} MCP handlers")
+    return len(handlers)
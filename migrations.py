@@ -0,0 +1,198 @@
+import os
+import asyncio
+import logging
+import datetime
+from pymongo import UpdateOne
+
+from catalog import CategoryCatalog
+from dates import convert_date, to_datetime
+from search import TEXT_FIELDS, search_terms
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+CATEGORIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category.json")
+# Migrations that change the fields rollups and budget counters are keyed by; both are rebuilt after they write
+ROLLUP_MIGRATIONS = ("categories",)
+
+
+async def backfill(expenses, migrations, name: str, query: dict, projection: dict, build_update,
+                   chunk_size: int = CHUNK_SIZE) -> dict:
+    """Run one online, resumable backfill over the expenses collection.
+
+    Documents matching `query` are visited in _id order, `chunk_size` at a
+    time. `build_update(doc)` returns the $set fields for a document (or
+    raises to skip it) and each chunk is written with one unordered
+    bulk_write. Progress is checkpointed in the migrations collection after
+    every chunk, so an interrupted run resumes where it stopped.
+    """
+    state = await migrations.find_one({"_id": name}) or {}
+    last_id = state.get("last_id")
+    migrated = resumed = state.get("migrated", 0)
+    skipped = state.get("skipped", 0)
+
+    while True:
+        chunk_query = dict(query)
+        if last_id is not None:
+            chunk_query["_id"] = {"$gt": last_id}
+
+        batch = await expenses.find(chunk_query, projection).sort("_id", 1).limit(chunk_size).to_list(chunk_size)
+        if not batch:
+            break
+
+        ops = []
+        for doc in batch:
+            try:
+                # Re-check the query so a concurrent writer's fresh value is never overwritten
+                ops.append(UpdateOne({"_id": doc["_id"], **query}, {"$set": build_update(doc)}))
+            except Exception as e:
+                logger.warning(f"{name}: skipping {doc['_id']}: {e}")
+                skipped += 1
+
+        if ops:
+            result = await expenses.bulk_write(ops, ordered=False)
+            migrated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await migrations.update_one(
+            {"_id": name},
+            {"$set": {
+                "last_id": last_id,
+                "migrated": migrated,
+                "skipped": skipped,
+                "updated_at": datetime.datetime.now()
+            }},
+            upsert=True
+        )
+
+    await migrations.update_one(
+        {"_id": name},
+        {"$set": {"migrated": migrated, "skipped": skipped, "completed_at": datetime.datetime.now()}},
+        upsert=True
+    )
+
+    logger.info(f"Migration {name}: {migrated} migrated, {skipped} skipped")
+    return {"migration": name, "migrated": migrated, "skipped": skipped, "migrated_this_run": migrated - resumed}
+
+
+async def migrate_native_dates(expenses, migrations, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Add the native date_at field to expenses stored with only a date string."""
+    return await backfill(
+        expenses, migrations, "native_dates",
+        query={"date_at": {"$exists": False}},
+        projection={"date": 1},
+        build_update=lambda doc: {"date_at": to_datetime(convert_date(doc["date"]))},
+        chunk_size=chunk_size
+    )
+
+
+async def assign_default_user(expenses, migrations, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Give expenses stored before per-user partitioning to the default user."""
+    return await backfill(
+        expenses, migrations, "default_user",
+        query={"user_id": {"$exists": False}},
+        projection={"_id": 1},
+        build_update=lambda doc: {"user_id": DEFAULT_USER_ID},
+        chunk_size=chunk_size
+    )
+
+
+async def add_search_terms(expenses, migrations, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Store the prefix-searchable words of expenses written before search existed."""
+    return await backfill(
+        expenses, migrations, "search_terms",
+        query={"search_terms": {"$exists": False}},
+        projection={field: 1 for field in TEXT_FIELDS},
+        build_update=lambda doc: {"search_terms": search_terms(doc)},
+        chunk_size=chunk_size
+    )
+
+
+async def canonical_categories(expenses, migrations, chunk_size: int = CHUNK_SIZE,
+                               catalog: CategoryCatalog = None) -> dict:
+    """Rewrite free-form categories written before the catalog was enforced ("Food & Dining" -> "food").
+
+    Category and subcategory go through catalog.resolve, and search_terms
+    are rebuilt from the new names. Expenses whose category the catalog
+    does not know are skipped and keep their values.
+    """
+    catalog = catalog or CategoryCatalog(CATEGORIES_PATH)
+    categories = catalog.current()
+    if not categories:
+        logger.warning("canonical_categories: category.json not found; skipped")
+        return {"migration": "categories", "migrated": 0, "skipped": 0, "migrated_this_run": 0}
+
+    subcategories = sorted({sub for subs in categories.values() for sub in subs} | {""})
+
+    def build_update(doc):
+        category, subcategory = catalog.resolve(doc.get("category") or "", doc.get("subcategory") or "")
+        return {
+            "category": category,
+            "subcategory": subcategory,
+            "search_terms": search_terms({**doc, "category": category, "subcategory": subcategory})
+        }
+
+    return await backfill(
+        expenses, migrations, "categories",
+        query={"$or": [
+            {"category": {"$nin": list(categories)}},
+            {"subcategory": {"$nin": subcategories}}
+        ]},
+        projection={field: 1 for field in TEXT_FIELDS},
+        build_update=build_update,
+        chunk_size=chunk_size
+    )
+
+
+def rollups_stale(report: list) -> bool:
+    """Whether a run_all report rewrote fields the rollups and budget counters are keyed by."""
+    return any(r["migration"] in ROLLUP_MIGRATIONS and r.get("migrated_this_run") for r in report)
+
+
+# Applied in order by run_all
+MIGRATIONS = {
+    "native_dates": migrate_native_dates,
+    "default_user": assign_default_user,
+    "search_terms": add_search_terms,
+    "categories": canonical_categories,
+}
+
+
+async def run_all(expenses, migrations, chunk_size: int = CHUNK_SIZE) -> list:
+    """Run every migration; each one is a cheap no-op once it has completed."""
+    return [await migrate(expenses, migrations, chunk_size) for migrate in MIGRATIONS.values()]
+
+
+if __name__ == "__main__":
+    # python migrations.py [name ...] [--chunk-size N]
+    import json
+    import argparse
+    import budgets
+    import rollups
+    from db import expenses_collection, migrations_collection, daily_rollups_collection, monthly_rollups_collection
+    from db import budgets_collection, budget_counters_collection
+
+    arg_parser = argparse.ArgumentParser(description="Run expense schema migrations")
+    arg_parser.add_argument("names", nargs="*", help=f"Migrations to run (default: all of {list(MIGRATIONS)})")
+    arg_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = arg_parser.parse_args()
+
+    unknown = [name for name in args.names if name not in MIGRATIONS]
+    if unknown:
+        arg_parser.error(f"Unknown migrations: {unknown}")
+
+    async def main():
+        if not args.names:
+            report = await run_all(expenses_collection, migrations_collection, args.chunk_size)
+        else:
+            report = [
+                await MIGRATIONS[name](expenses_collection, migrations_collection, args.chunk_size)
+                for name in args.names
+            ]
+        if rollups_stale(report):
+            await rollups.rebuild(expenses_collection, daily_rollups_collection, monthly_rollups_collection)
+            await budgets.BudgetBook(budgets_collection, budget_counters_collection).reseed(expenses_collection)
+        return report
+
+    print(json.dumps(asyncio.run(main()), indent=2))
@@ -0,0 +1,200 @@
+import json
+import base64
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+import pydantic_core
+
+from dates import to_datetime, from_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fields never sent back to clients; excluded server-side so they are not fetched
+# (date_at is kept for the keyset and dropped during serialization)
+LIST_PROJECTION = {"created_at": 0, "user_id": 0, "search_terms": 0}
+
+# Fields a caller can project a listing onto ("id" is the string _id)
+EXPENSE_FIELDS = ("id", "date", "amount", "category", "subcategory", "note", "payment_method")
+# Low-cardinality columns sent as small integer codes into a value table
+DICTIONARY_FIELDS = ("category", "payment_method")
+RESPONSE_FORMATS = ("rows", "compact")
+
+# Keyset order: native date first, _id breaks ties between expenses on the same day
+SORT_KEYS = [("date_at", 1), ("_id", 1)]
+
+
+def clamp_page_size(page_size) -> int:
+    """Clamp a caller supplied page size into [1, MAX_PAGE_SIZE]."""
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def parse_fields(fields) -> Optional[list]:
+    """Validate a comma separated (or list) field projection; None means every field."""
+    if fields in (None, "", []):
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    selected = []
+    for field in (f.strip() for f in fields):
+        if not field or field in selected:
+            continue
+        if field not in EXPENSE_FIELDS:
+            raise ValueError(f"Unknown field {field!r}; expected some of {', '.join(EXPENSE_FIELDS)}")
+        selected.append(field)
+    return selected or None
+
+
+def list_projection(fields: Optional[list] = None) -> dict:
+    """MongoDB projection for a listing, so unrequested fields never leave the server."""
+    if fields is None:
+        return dict(LIST_PROJECTION)
+    # _id and date_at are always fetched: the keyset cursor is built from them
+    projection = {field: 1 for field in fields if field != "id"}
+    projection["date_at"] = 1
+    return projection
+
+
+def to_columns(rows: list, fields: Optional[list] = None) -> dict:
+    """Compact columnar form of serialized rows.
+
+    One array per field instead of one dict per row, with DICTIONARY_FIELDS
+    replaced by indexes into a per-page table of their distinct values.
+    """
+    fields = fields or list(EXPENSE_FIELDS)
+    columns = {field: [row.get(field) for row in rows] for field in fields}
+
+    dictionaries = {}
+    for field in DICTIONARY_FIELDS:
+        if field not in columns:
+            continue
+        table = {}
+        columns[field] = [table.setdefault(value, len(table)) for value in columns[field]]
+        dictionaries[field] = list(table)
+
+    return {"fields": fields, "columns": columns, "dictionaries": dictionaries}
+
+
+def format_page(page: dict, response_format: str = "rows", fields: Optional[list] = None) -> dict:
+    """Put a page's expenses into the requested response format ("rows" or "compact")."""
+    if response_format == "compact":
+        page["expenses"] = to_columns(page["expenses"], fields)
+    page["format"] = response_format
+    return page
+
+
+def compact_json(response: dict) -> str:
+    """Minified JSON text for a compact response.
+
+    FastMCP pretty-prints dict results with indent=2, which puts every
+    column value on its own line; a str result is sent as is.
+    """
+    return pydantic_core.to_json(response, fallback=str).decode()
+
+
+def encode_cursor(doc: dict) -> str:
+    """Build an opaque continuation token from the last document of a page."""
+    raw = json.dumps({"d": from_datetime(doc["date_at"]), "i": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    """Decode a continuation token back into its (date_at, _id) key."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return to_datetime(payload["d"]), ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError(f"Invalid cursor: {token}")
+
+
+def apply_cursor(query: dict, cursor: Optional[str]) -> dict:
+    """Restrict a query to documents strictly after the cursor's (date_at, _id) key."""
+    if not cursor:
+        return query
+
+    last_date, last_id = decode_cursor(cursor)
+    keyset = {
+        "$or": [
+            {"date_at": {"$gt": last_date}},
+            {"date_at": last_date, "_id": {"$gt": last_id}}
+        ]
+    }
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def serialize_expense(doc: dict, fields: Optional[list] = None) -> dict:
+    """Turn a raw expense document into its client representation."""
+    _id = doc.pop("_id")
+    doc.pop("date_at", None)
+    if fields is None or "id" in fields:
+        doc["id"] = str(_id)
+    return doc
+
+
+async def fetch_page(collection, query: dict, page_size: int, cursor: Optional[str] = None,
+                     max_page_size: int = MAX_PAGE_SIZE, fields: Optional[list] = None) -> dict:
+    """Fetch one keyset page of expenses.
+
+    Documents are converted as each batch arrives from the server, so memory
+    is bounded by the page size rather than by the number of matches.
+    """
+    page_size = min(clamp_page_size(page_size), max_page_size)
+
+    db_cursor = (
+        collection.find(apply_cursor(query, cursor), list_projection(fields))
+        .sort(SORT_KEYS)
+        .limit(page_size + 1)
+        .batch_size(min(page_size + 1, 500))
+    )
+
+    expenses = []
+    last_doc = None
+    has_more = False
+
+    async for doc in db_cursor:
+        if len(expenses) == page_size:
+            has_more = True
+            break
+        last_doc = {"date_at": doc["date_at"], "_id": doc["_id"]}
+        expenses.append(serialize_expense(doc, fields))
+
+    return {
+        "expenses": expenses,
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(last_doc) if has_more else None
+    }
+
+
+def page_stages(page_size: int, cursor: Optional[str] = None, fields: Optional[list] = None) -> list:
+    """Aggregation stages selecting one keyset page (plus one look-ahead row)."""
+    stages = []
+    if cursor:
+        stages.append({"$match": apply_cursor({}, cursor)})
+    stages += [
+        {"$sort": dict(SORT_KEYS)},
+        {"$limit": clamp_page_size(page_size) + 1},
+        {"$project": list_projection(fields)}
+    ]
+    return stages
+
+
+def build_page(docs: list, page_size: int, fields: Optional[list] = None) -> dict:
+    """Shape the rows produced by page_stages like fetch_page's result."""
+    page_size = clamp_page_size(page_size)
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+    next_cursor = encode_cursor(docs[-1]) if has_more else None
+
+    return {
+        "expenses": [serialize_expense(doc, fields) for doc in docs],
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,249 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+
+import bson
+from pymongo import monitoring
+
+from tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("DB_PROFILER", "on").lower() not in ("0", "off", "false", "no")
+# Commands at least this slow go to the ring buffer (and get explained)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", 200))
+# queryPlanner only plans; executionStats re-runs the query
+EXPLAIN_VERBOSITY = os.getenv("SLOW_QUERY_EXPLAIN", "queryPlanner")
+# Explains in flight at once; further slow commands are recorded unexplained
+MAX_PENDING_EXPLAINS = 4
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Session/cluster bookkeeping that explain rejects or that is noise in the buffer
+_DRIVER_FIELDS = {"lsid", "$clusterTime", "$db", "$readPreference", "txnNumber", "signature", "$audit"}
+# Bulk payloads summarised by their length in the buffer
+_PAYLOAD_FIELDS = {"documents", "updates", "deletes"}
+
+# "tool:add_expense" etc. for the MCP call currently running (set by metrics.timed)
+current_call = contextvars.ContextVar("current_call", default=None)
+# Set inside the profiler's own explain tasks so they are not profiled
+_explaining = contextvars.ContextVar("explaining", default=False)
+
+
+def _reply_docs(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+def _size(doc) -> int:
+    try:
+        return len(bson.encode(doc))
+    except Exception:
+        return 0
+
+
+def _request_size(command: dict) -> tuple:
+    """(bytes without bulk payloads, bulk payload items): cheap enough for every command."""
+    shell, items = {}, 0
+    for key, value in command.items():
+        if key in _PAYLOAD_FIELDS and isinstance(value, list):
+            items += len(value)
+        else:
+            shell[key] = value
+    return _size(shell), items
+
+
+def _redact(value):
+    """Shape of a filter, pipeline or update: field names and operators kept, every literal replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return "?"
+
+
+def _summary(command: dict) -> dict:
+    """The command as shown in the buffer.
+
+    Driver fields are dropped, bulk payloads counted and the literals in
+    filters, pipelines and updates redacted, so the buffer never holds
+    another user's ids, notes or amounts. Top-level options such as the
+    collection name or limit are kept.
+    """
+    summary = {}
+    for key, value in command.items():
+        if key in _DRIVER_FIELDS:
+            continue
+        if key in _PAYLOAD_FIELDS and isinstance(value, list):
+            summary[key] = f"<{len(value)} items>"
+        else:
+            summary[key] = _redact(value) if isinstance(value, (dict, list)) else value
+    return summary
+
+
+def _plan(explained: dict) -> dict:
+    """Stages and indexes used anywhere in an explain() document."""
+    stages, index_names = set(), set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+            if "indexName" in node:
+                index_names.add(node["indexName"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explained)
+    return {"stages": sorted(stages), "indexes": sorted(index_names), "collscan": "COLLSCAN" in stages}
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """Attributes every database command to the MCP call that issued it.
+
+    Per call it sums command count, duration, documents returned, reply
+    bytes, and request bytes with bulk payloads (insert documents, update and
+    delete statements) counted as items rather than encoded. Commands slower
+    than SLOW_QUERY_MS are kept in a ring buffer, with their full request
+    size, and explained in the background.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, buffer_size: int = SLOW_QUERY_BUFFER):
+        self.slow_ms = slow_ms
+        self.slow_queries = deque(maxlen=buffer_size)
+        self.by_call = {}
+        self._started = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._pending_explains = 0
+
+    def bind(self, loop, client):
+        """Event loop and client used to run explain() for slow commands."""
+        self._loop = loop
+        self._client = client
+
+    def started(self, event):
+        if _explaining.get():
+            return
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                current_call.get(), current_user_id(), event.command
+            )
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+
+        call, user_id, command = started
+        request_bytes, payload_items = _request_size(command)
+        duration_ms = event.duration_micros / 1000
+        docs = _reply_docs(reply) if reply else 0
+        reply_bytes = _size(reply) if reply else 0
+        call = call or "other"
+
+        with self._lock:
+            totals = self.by_call.setdefault(call, {
+                "commands": 0, "failed": 0, "db_ms": 0.0, "docs_returned": 0,
+                "request_bytes": 0, "payload_items": 0, "reply_bytes": 0, "slow": 0
+            })
+            totals["commands"] += 1
+            totals["failed"] += int(reply is None)
+            totals["db_ms"] += duration_ms
+            totals["docs_returned"] += docs
+            totals["request_bytes"] += request_bytes
+            totals["payload_items"] += payload_items
+            totals["reply_bytes"] += reply_bytes
+
+        if duration_ms < self.slow_ms:
+            return
+
+        entry = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "call": call,
+            "user_id": user_id,
+            "command": event.command_name,
+            "database": event.database_name,
+            "duration_ms": round(duration_ms, 3),
+            "docs_returned": docs,
+            # Only slow commands pay for encoding the whole request
+            "request_bytes": _size(command) if payload_items else request_bytes,
+            "reply_bytes": reply_bytes,
+            "failed": reply is None,
+            "query": _summary(command)
+        }
+        with self._lock:
+            totals["slow"] += 1
+            self.slow_queries.append(entry)
+        self._schedule_explain(entry, event.database_name, command)
+
+    def _schedule_explain(self, entry: dict, database: str, command: dict):
+        if entry["command"] not in EXPLAINABLE or self._loop is None or self._loop.is_closed():
+            return
+        with self._lock:
+            if self._pending_explains >= MAX_PENDING_EXPLAINS:
+                entry["explain"] = {"skipped": "too many explains in flight"}
+                return
+            self._pending_explains += 1
+
+        cmd = {k: v for k, v in command.items() if k not in _DRIVER_FIELDS}
+        try:
+            asyncio.run_coroutine_threadsafe(self._explain(entry, database, cmd), self._loop)
+        except RuntimeError:
+            with self._lock:
+                self._pending_explains -= 1
+
+    async def _explain(self, entry: dict, database: str, command: dict):
+        _explaining.set(True)
+        try:
+            explained = await self._client[database].command(
+                {"explain": command, "verbosity": EXPLAIN_VERBOSITY}
+            )
+            entry["explain"] = _plan(explained)
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+        finally:
+            with self._lock:
+                self._pending_explains -= 1
+
+    def report(self, user_id: str = None) -> dict:
+        """Per-call totals (all users, like /metrics) and the slow commands `user_id` issued (all when None)."""
+        with self._lock:
+            by_call = {
+                call: {**totals, "db_ms": round(totals["db_ms"], 3)}
+                for call, totals in sorted(self.by_call.items(), key=lambda kv: -kv[1]["db_ms"])
+            }
+            slow = [
+                {k: v for k, v in entry.items() if k != "user_id"}
+                for entry in reversed(self.slow_queries)
+                if user_id is None or entry["user_id"] == user_id
+            ]
+        return {
+            "enabled": ENABLED,
+            "slow_query_ms": self.slow_ms,
+            "by_call": by_call,
+            "slow_queries": slow
+        }
+
+
+command_profiler = CommandProfiler()
@@ -0,0 +1,329 @@
+import os
+import asyncio
+import hashlib
+import logging
+import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from tenancy import acting_as
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("RECURRING_SCHEDULER", "on").lower() not in ("0", "off", "false", "no")
+# Seconds between scheduler passes; occurrences are per day, so this only bounds the delay
+INTERVAL = float(os.getenv("RECURRING_INTERVAL", 3600))
+# Occurrences written per insert_many
+BATCH_SIZE = int(os.getenv("RECURRING_BATCH_SIZE", "1000"))
+# A cron schedule that matches no day within this many days is rejected
+MAX_SEARCH_DAYS = 5 * 366
+# Seconds after which a pass that claimed a rule but never confirmed it is presumed dead and taken over
+PENDING_LEASE = float(os.getenv("RECURRING_PENDING_LEASE", 600))
+
+DUE_INDEX = "mx_recurring_active_due"
+USER_INDEX = "mx_recurring_user"
+PENDING_INDEX = "mx_recurring_pending"
+
+
+def _cron_field(spec: str, low: int, high: int) -> set:
+    """Values matched by one cron field: *, N, A-B, lists and /steps."""
+    values = set()
+    for part in spec.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            first, last = (int(v) for v in part.split("-", 1))
+        else:
+            first = last = int(part)
+        if first < low or last > high or first > last:
+            raise ValueError(f"Cron field {spec!r} is outside {low}-{high}")
+        step = int(step) if step else 1
+        if step <= 0:
+            raise ValueError(f"Cron field {spec!r} has a step that is not positive")
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def parse_cron(expr: str) -> dict:
+    """Day-level cron: "day month weekday", or the usual 5 fields with minute and hour ignored.
+
+    Weekdays are 0-6 from Sunday (7 is also Sunday). As in cron, when both
+    day and weekday are restricted a date matching either one is due.
+    """
+    fields = expr.split()
+    if len(fields) == 5:
+        fields = fields[2:]
+    if len(fields) != 3:
+        raise ValueError(f"Invalid cron expression {expr!r}; expected 'day month weekday' or 5 fields")
+
+    day, month, weekday = fields
+    return {
+        "days": _cron_field(day, 1, 31),
+        "months": _cron_field(month, 1, 12),
+        "weekdays": {w % 7 for w in _cron_field(weekday, 0, 7)},
+        "any_day": day == "*",
+        "any_weekday": weekday == "*"
+    }
+
+
+def _cron_matches(cron: dict, date: datetime.date) -> bool:
+    if date.month not in cron["months"]:
+        return False
+    day_ok = date.day in cron["days"]
+    weekday_ok = date.isoweekday() % 7 in cron["weekdays"]
+    if cron["any_day"] or cron["any_weekday"]:
+        return day_ok and weekday_ok
+    return day_ok or weekday_ok
+
+
+def next_occurrence(schedule: dict, on_or_after: datetime.date):
+    """First due date on or after a date, or None when the schedule never fires again."""
+    if "day_of_month" in schedule:
+        day = schedule["day_of_month"]
+        year, month = on_or_after.year, on_or_after.month
+        while True:
+            # Months shorter than the day fall on their last day (31 -> Feb 28)
+            last = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)).day
+            candidate = datetime.date(year, month, min(day, last))
+            if candidate >= on_or_after:
+                return candidate
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    cron = parse_cron(schedule["cron"])
+    date = on_or_after
+    for _ in range(MAX_SEARCH_DAYS):
+        if _cron_matches(cron, date):
+            return date
+        date += datetime.timedelta(days=1)
+    return None
+
+
+def build_schedule(day_of_month=None, cron=None) -> dict:
+    """Validated schedule document for a rule."""
+    if cron:
+        parse_cron(cron)
+        return {"cron": " ".join(cron.split())}
+    day = int(day_of_month)
+    if not 1 <= day <= 31:
+        raise ValueError("day_of_month must be between 1 and 31")
+    return {"day_of_month": day}
+
+
+def occurrences(rule: dict, through: datetime.date) -> list:
+    """Every due date of a rule from its next_due up to `through` (inclusive)."""
+    end = datetime.date.fromisoformat(rule["end_date"]) if rule.get("end_date") else None
+    limit = min(through, end) if end else through
+
+    dates = []
+    date = datetime.date.fromisoformat(rule["next_due"]) if rule.get("next_due") else None
+    while date is not None and date <= limit:
+        dates.append(date)
+        date = next_occurrence(rule["schedule"], date + datetime.timedelta(days=1))
+    return dates
+
+
+def occurrence_id(rule_id, date: datetime.date) -> ObjectId:
+    """Idempotency key: the same rule and day always map to the same _id."""
+    return ObjectId(hashlib.sha1(f"recurring:{rule_id}:{date.isoformat()}".encode("utf-8")).digest()[:12])
+
+
+def serialize_rule(rule: dict) -> dict:
+    """Client representation of a rule."""
+    return {
+        "id": str(rule["_id"]),
+        **{f: rule.get(f) for f in ("amount", "category", "subcategory", "note", "payment_method",
+                                     "schedule", "start_date", "end_date", "next_due", "active")}
+    }
+
+
+class RecurringScheduler:
+    """Recurring expense rules and the background task that materializes them.
+
+    Each pass loads the rules that are due, builds every missed occurrence
+    (so downtime is caught up in the same pass) and writes them with
+    unordered insert_many batches. Occurrence _ids are derived from the rule
+    and the day, so a second process repeating a pass hits duplicate-key
+    errors instead of double-booking.
+
+    A pass first claims its rules: next_due is advanced and the dates being
+    written are recorded as `pending` on the rule, in one conditional
+    update. `pending` is only cleared once the occurrences are stored and
+    `on_inserted` has run. A claim older than `pending_lease` seconds
+    belongs to a pass that died; the next pass takes it over, writes the
+    same occurrences again and runs `on_inserted` for all of them, including
+    the ones that now come back as duplicates, so rollups and budgets are
+    not left without expenses the dead pass stored.
+    """
+
+    def __init__(self, rules, expenses, build_expense, on_inserted=None, pending_lease: float = PENDING_LEASE):
+        self.rules = rules
+        self.expenses = expenses
+        self.build_expense = build_expense
+        self.on_inserted = on_inserted
+        self.pending_lease = pending_lease
+        self._lock = asyncio.Lock()
+        self.last_run = None
+        # user_id -> that user's share of the last pass that touched their rules
+        self.last_runs = {}
+
+    async def ensure_indexes(self):
+        await self.rules.create_index([("active", 1), ("next_due", 1)], name=DUE_INDEX)
+        await self.rules.create_index([("user_id", 1), ("created_at", 1)], name=USER_INDEX)
+        await self.rules.create_index([("pending.at", 1)], name=PENDING_INDEX, sparse=True)
+
+    async def add_rule(self, user_id: str, expense: dict, schedule: dict, start_date: str, end_date: str = None) -> dict:
+        first = next_occurrence(schedule, datetime.date.fromisoformat(start_date))
+        if first is None:
+            raise ValueError("Schedule never matches a date")
+
+        rule = {
+            "user_id": user_id,
+            **{f: expense[f] for f in ("amount", "category", "subcategory", "note", "payment_method")},
+            "schedule": schedule,
+            "start_date": start_date,
+            "end_date": end_date,
+            "next_due": first.isoformat(),
+            "active": True,
+            "created_at": datetime.datetime.now()
+        }
+        result = await self.rules.insert_one(rule)
+        rule["_id"] = result.inserted_id
+        return rule
+
+    async def list_rules(self, user_id: str) -> list:
+        return await self.rules.find({"user_id": user_id}).sort("created_at", 1).to_list(None)
+
+    async def delete_rule(self, user_id: str, rule_id: ObjectId) -> bool:
+        """Stop a rule; expenses it already created are kept."""
+        result = await self.rules.delete_one({"_id": rule_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+    def _documents(self, rule: dict, dates: list) -> list:
+        docs = []
+        with acting_as(rule["user_id"]):
+            for date in dates:
+                doc = self.build_expense(
+                    date.isoformat(), rule["amount"], rule["category"],
+                    rule.get("subcategory", ""), rule.get("note", ""), rule.get("payment_method", "cash")
+                )
+                doc["_id"] = occurrence_id(rule["_id"], date)
+                doc["recurring_id"] = rule["_id"]
+                docs.append(doc)
+        return docs
+
+    async def _insert(self, docs: list) -> tuple:
+        """insert_many in batches; returns (inserted docs, duplicate docs)."""
+        inserted, duplicates = [], []
+        for start in range(0, len(docs), BATCH_SIZE):
+            batch = docs[start:start + BATCH_SIZE]
+            failed = set()
+            try:
+                await self.expenses.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    failed.add(error["index"])
+            for i, doc in enumerate(batch):
+                (duplicates if i in failed else inserted).append(doc)
+        return inserted, duplicates
+
+    async def materialize(self, today: datetime.date = None, query: dict = None) -> dict:
+        """Write every occurrence due up to `today` for the due rules (optionally narrowed by `query`)."""
+        today = today or datetime.date.today()
+        async with self._lock:
+            now = datetime.datetime.now()
+            token = ObjectId()
+            due = await self.rules.find({
+                "active": True, "next_due": {"$lte": today.isoformat()}, "pending": {"$exists": False}, **(query or {})
+            }).to_list(None)
+            # Claims of passes that died before confirming, e.g. a crash between the insert and on_inserted
+            stale = await self.rules.find({
+                "pending.at": {"$lt": now - datetime.timedelta(seconds=self.pending_lease)}, **(query or {})
+            }).to_list(None)
+
+            docs, claims = {}, []
+            owners = {rule["_id"]: rule["user_id"] for rule in due + stale}
+            for rule in due:
+                dates = occurrences(rule, today)
+                try:
+                    docs[rule["_id"]] = self._documents(rule, dates)
+                except ValueError as e:
+                    # e.g. its category was removed from the catalog; retried next pass
+                    logger.warning(f"Recurring rule {rule['_id']} skipped: {e}")
+                    continue
+                following = next_occurrence(rule["schedule"], today + datetime.timedelta(days=1))
+                end = rule.get("end_date")
+                active = following is not None and (not end or following.isoformat() <= end)
+                claims.append(UpdateOne(
+                    {"_id": rule["_id"], "next_due": rule["next_due"], "pending": {"$exists": False}},
+                    {"$set": {"next_due": following.isoformat() if active else None, "active": active,
+                              "last_run_at": now,
+                              "pending": {"token": token, "at": now, "dates": [d.isoformat() for d in dates]}}}
+                ))
+
+            recovered = set()
+            for rule in stale:
+                try:
+                    docs[rule["_id"]] = self._documents(
+                        rule, [datetime.date.fromisoformat(d) for d in rule["pending"]["dates"]]
+                    )
+                except ValueError as e:
+                    logger.warning(f"Recurring rule {rule['_id']} not recovered: {e}")
+                    continue
+                recovered.add(rule["_id"])
+                claims.append(UpdateOne(
+                    {"_id": rule["_id"], "pending.token": rule["pending"]["token"]},
+                    {"$set": {"pending.token": token, "pending.at": now}}
+                ))
+
+            # Another process may have claimed some of these rules first
+            claimed = set()
+            if claims:
+                await self.rules.bulk_write(claims, ordered=False)
+                claimed = {r["_id"] for r in await self.rules.find({"pending.token": token}, {"_id": 1}).to_list(None)}
+
+            inserted, duplicates = await self._insert([doc for rule_id in claimed for doc in docs[rule_id]])
+            # A recovered rule's duplicates were stored by the dead pass but never reached on_inserted
+            applied = inserted + [doc for doc in duplicates if doc["recurring_id"] in recovered]
+            if applied and self.on_inserted is not None:
+                await self.on_inserted(applied)
+            if claimed:
+                await self.rules.update_many({"pending.token": token}, {"$unset": {"pending": ""}})
+
+        at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.last_run = self._run_report(at, claimed, recovered, inserted, duplicates)
+        for user_id in {owners[rule_id] for rule_id in claimed}:
+            self.last_runs[user_id] = self._run_report(
+                at, {rule_id for rule_id in claimed if owners[rule_id] == user_id}, recovered,
+                [doc for doc in inserted if doc["user_id"] == user_id],
+                [doc for doc in duplicates if doc["user_id"] == user_id]
+            )
+        if claimed:
+            logger.info(f"Recurring expenses: {self.last_run}")
+        return self.last_run
+
+    @staticmethod
+    def _run_report(at: str, claimed: set, recovered: set, inserted: list, duplicates: list) -> dict:
+        return {
+            "at": at,
+            "rules": len(claimed),
+            "recovered": len(claimed & recovered),
+            "inserted": len(inserted),
+            "duplicates": len(duplicates)
+        }
+
+    def last_run_for(self, user_id: str):
+        """The last pass that materialized any of this user's rules, counting only their occurrences."""
+        return self.last_runs.get(user_id)
+
+    async def run(self, interval: float = INTERVAL):
+        """Materialize due occurrences every `interval` seconds until cancelled."""
+        while True:
+            try:
+                await self.materialize()
+            except Exception as e:
+                logger.error(f"Recurring expense pass failed: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,122 @@
+import json
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """In-process LRU cache for read tool results, bounded by entries and bytes.
+
+    Every entry remembers the inclusive ISO date range it was computed
+    from (None for an open end), so a write only evicts the entries whose
+    range contains the affected date.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 8 * 1024 * 1024, size_of=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Defaults to the JSON-serialized size of a tool result
+        self.size_of = size_of or (lambda value: len(json.dumps(value, default=str)))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bumped on every invalidation; results computed across one are not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["value"]
+
+    def get_covering(self, kind: str, start: str, end: str):
+        """Any entry of `kind` (the key's first element) whose range contains [start, end]."""
+        if not self.enabled:
+            return None
+
+        for key, entry in self._entries.items():
+            if (key[0] == kind
+                    and (entry["start"] is None or entry["start"] <= start)
+                    and (entry["end"] is None or end <= entry["end"])):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value, start, end, generation: int):
+        """Store a result computed while the cache was at `generation`."""
+        if not self.enabled or generation != self.generation:
+            return
+
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = {"value": value, "start": start, "end": end, "size": size}
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def invalidate_dates(self, dates):
+        """Evict every entry whose date range contains any of the given ISO dates."""
+        dates = [d for d in dates if d]
+        if not dates:
+            return
+
+        self.generation += 1
+        stale = [
+            key for key, entry in self._entries.items()
+            if any(
+                (entry["start"] is None or entry["start"] <= d) and (entry["end"] is None or d <= entry["end"])
+                for d in dates
+            )
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
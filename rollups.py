@@ -0,0 +1,362 @@
+import asyncio
+import logging
+import datetime
+import calendar
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from tenancy import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+# Rollup documents are flat so the unique keys double as range-scan indexes
+DAILY_KEYS = ["user_id", "day", "category", "payment_method"]
+MONTHLY_KEYS = ["user_id", "month", "category", "payment_method"]
+DAILY_INDEX = "mx_rollup_user_day_key"
+MONTHLY_INDEX = "mx_rollup_user_month_key"
+
+# Tolerance when comparing float sums during verification
+SUM_TOLERANCE = 1e-6
+# Reconciliation passes a rebuild makes while concurrent writes keep moving the rollups
+REBUILD_ATTEMPTS = 10
+
+
+async def ensure_rollup_indexes(daily, monthly):
+    """Create the unique key indexes that upserts and range scans rely on."""
+    for collection, keys, name in ((daily, DAILY_KEYS, DAILY_INDEX), (monthly, MONTHLY_KEYS, MONTHLY_INDEX)):
+        # Drop key indexes from before rollups were partitioned by user
+        for existing in await collection.index_information():
+            if existing.startswith("mx_") and existing != name:
+                await collection.drop_index(existing)
+        await collection.create_index([(k, 1) for k in keys], name=name, unique=True)
+
+
+def _bucket(expense: dict) -> tuple:
+    """(user_id, day, category, payment_method) bucket an expense contributes to."""
+    return (
+        expense.get("user_id") or DEFAULT_USER_ID,
+        expense["date"],
+        expense.get("category"),
+        expense.get("payment_method")
+    )
+
+
+def _accumulate(deltas: dict, expense: dict, sign: int):
+    """Add one expense's contribution (sign=+1) or removal (sign=-1) to deltas."""
+    key = _bucket(expense)
+    total, count = deltas.get(key, (0.0, 0))
+    deltas[key] = (total + sign * float(expense["amount"]), count + sign)
+
+
+def _deltas(before, after) -> dict:
+    """Net (sum, count) change per bucket for one expense write."""
+    deltas = {}
+    if before:
+        _accumulate(deltas, before, -1)
+    if after:
+        _accumulate(deltas, after, 1)
+
+    return {key: d for key, d in deltas.items() if d != (0.0, 0)}
+
+
+async def apply_deltas(daily, monthly, deltas: dict):
+    """$inc every affected daily and monthly bucket in one bulk write each."""
+    if not deltas:
+        return
+
+    monthly_deltas = {}
+    for (user_id, day, category, payment_method), (total, count) in deltas.items():
+        key = (user_id, day[:7], category, payment_method)
+        m_total, m_count = monthly_deltas.get(key, (0.0, 0))
+        monthly_deltas[key] = (m_total + total, m_count + count)
+
+    daily_ops = [
+        UpdateOne(dict(zip(DAILY_KEYS, key)), {"$inc": {"sum": total, "count": count}}, upsert=True)
+        for key, (total, count) in deltas.items()
+    ]
+    monthly_ops = [
+        UpdateOne(dict(zip(MONTHLY_KEYS, key)), {"$inc": {"sum": total, "count": count}}, upsert=True)
+        for key, (total, count) in monthly_deltas.items()
+    ]
+
+    await asyncio.gather(
+        daily.bulk_write(daily_ops, ordered=False),
+        monthly.bulk_write(monthly_ops, ordered=False)
+    )
+
+
+async def apply_change(daily, monthly, before=None, after=None):
+    """Keep rollups current for one insert (after), delete (before) or update (both)."""
+    await apply_deltas(daily, monthly, _deltas(before, after))
+
+
+async def apply_inserts(daily, monthly, expenses: list):
+    """Fold a batch of newly inserted expenses into the rollups in one pass."""
+    deltas = {}
+    for expense in expenses:
+        _accumulate(deltas, expense, 1)
+    await apply_deltas(daily, monthly, deltas)
+
+
+def split_range(start: str, end: str) -> tuple:
+    """Split an inclusive ISO day range into (day ranges, whole month range).
+
+    Returns a list of (first_day, last_day) spans to read from the daily
+    rollups and an optional (first_month, last_month) span for the monthly
+    rollups covering every calendar month fully inside the range.
+    """
+    start_d = datetime.date.fromisoformat(start)
+    end_d = datetime.date.fromisoformat(end)
+
+    if start_d > end_d:
+        return [], None
+
+    # First day of the first whole month inside the range
+    first_full = start_d if start_d.day == 1 else (start_d.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    # Last day of the last whole month inside the range
+    last_day_of_end_month = calendar.monthrange(end_d.year, end_d.month)[1]
+    last_full = end_d if end_d.day == last_day_of_end_month else end_d.replace(day=1) - datetime.timedelta(days=1)
+
+    if first_full > last_full:
+        return [(start, end)], None
+
+    day_spans = []
+    if start_d < first_full:
+        day_spans.append((start, (first_full - datetime.timedelta(days=1)).isoformat()))
+    if last_full < end_d:
+        day_spans.append(((last_full + datetime.timedelta(days=1)).isoformat(), end))
+
+    return day_spans, (first_full.isoformat()[:7], last_full.isoformat()[:7])
+
+
+async def summarize_range(daily, monthly, user_id: str, start: str, end: str, category=None) -> list:
+    """Per-category totals for one user's range, answered from rollups only.
+
+    Whole months come from the monthly rollups and the leftover days at
+    either edge from the daily rollups, so cost depends on the number of
+    buckets touched rather than on the number of expenses in the range.
+    """
+    day_spans, month_span = split_range(start, end)
+
+    queries = []
+    for first, last in day_spans:
+        match = {"user_id": user_id, "day": {"$gte": first, "$lte": last}}
+        if category:
+            match["category"] = category
+        queries.append(daily.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$category", "total": {"$sum": "$sum"}, "count": {"$sum": "$count"}}}
+        ]).to_list(None))
+
+    if month_span:
+        match = {"user_id": user_id, "month": {"$gte": month_span[0], "$lte": month_span[1]}}
+        if category:
+            match["category"] = category
+        queries.append(monthly.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$category", "total": {"$sum": "$sum"}, "count": {"$sum": "$count"}}}
+        ]).to_list(None))
+
+    totals = {}
+    for rows in await asyncio.gather(*queries):
+        for r in rows:
+            total, count = totals.get(r["_id"], (0.0, 0))
+            totals[r["_id"]] = (total + r["total"], count + r["count"])
+
+    results = [
+        {"_id": cat, "total": total}
+        for cat, (total, count) in totals.items()
+        if count > 0
+    ]
+    results.sort(key=lambda r: r["total"], reverse=True)
+    return results
+
+
+async def _raw_daily_buckets(expenses) -> dict:
+    """Recompute (user_id, day, category, payment_method) -> (sum, count) from raw expenses."""
+    rows = await expenses.aggregate([
+        {"$group": {
+            "_id": {
+                "user_id": {"$ifNull": ["$user_id", DEFAULT_USER_ID]},
+                "day": "$date",
+                "category": "$category",
+                "payment_method": "$payment_method"
+            },
+            "sum": {"$sum": "$amount"},
+            "count": {"$sum": 1}
+        }}
+    ]).to_list(None)
+
+    return {
+        tuple(r["_id"].get(k) for k in DAILY_KEYS): (r["sum"], r["count"])
+        for r in rows
+    }
+
+
+def _monthly_buckets(daily_buckets: dict) -> dict:
+    """Roll (user_id, day, ...) buckets up to (user_id, month, ...)."""
+    monthly = {}
+    for (user_id, day, category, payment_method), (total, count) in daily_buckets.items():
+        key = (user_id, day[:7], category, payment_method)
+        m_total, m_count = monthly.get(key, (0.0, 0))
+        monthly[key] = (m_total + total, m_count + count)
+    return monthly
+
+
+async def _stored_buckets(collection, keys: list) -> dict:
+    return {tuple(d.get(k) for k in keys): (d["sum"], d["count"]) async for d in collection.find({}, {"_id": 0})}
+
+
+async def _reconcile(collection, expected: dict, before: dict, actual: dict, keys: list) -> tuple:
+    """$inc every drifted bucket by its difference, only where it still holds the value read.
+
+    Buckets that changed between the `before` and `actual` reads were
+    written while expenses were aggregated and are left for the next pass.
+    Returns (buckets corrected, whether every bucket is now reconciled).
+    """
+    ops, moving = [], 0
+    for key in expected.keys() | actual.keys() | before.keys():
+        if before.get(key) != actual.get(key):
+            moving += 1
+            continue
+        exp_sum, exp_count = expected.get(key, (0.0, 0))
+        fields = dict(zip(keys, key))
+        if key not in actual:
+            # Fails on the unique index if a write created the bucket meanwhile
+            ops.append(UpdateOne(
+                {**fields, "count": {"$exists": False}}, {"$set": {"sum": exp_sum, "count": exp_count}}, upsert=True
+            ))
+            continue
+        act_sum, act_count = actual[key]
+        if act_count != exp_count or abs(act_sum - exp_sum) > SUM_TOLERANCE:
+            ops.append(UpdateOne(
+                {**fields, "sum": act_sum, "count": act_count},
+                {"$inc": {"sum": exp_sum - act_sum, "count": exp_count - act_count}}
+            ))
+    if not ops:
+        return 0, not moving
+
+    try:
+        result = await collection.bulk_write(ops, ordered=False)
+        applied = result.matched_count + result.upserted_count
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        applied = len(ops) - len(e.details.get("writeErrors", []))
+    return applied, not moving and applied == len(ops)
+
+
+async def rebuild(expenses, daily, monthly) -> dict:
+    """Bring both rollup levels in line with raw expenses without losing concurrent writes.
+
+    Works like budgets.BudgetBook.seed: raw expenses are aggregated between
+    two reads of the rollups and the differences are applied as conditional
+    $inc updates, so a delta applied by add_expense & co. meanwhile is never
+    wiped out. Buckets that move during a pass are retried in the next one.
+    Emptied buckets are dropped afterwards.
+    """
+    await ensure_rollup_indexes(daily, monthly)
+
+    corrected, consistent = 0, False
+    for _ in range(REBUILD_ATTEMPTS):
+        before = await asyncio.gather(_stored_buckets(daily, DAILY_KEYS), _stored_buckets(monthly, MONTHLY_KEYS))
+        buckets = await _raw_daily_buckets(expenses)
+        actual_daily, actual_monthly = await asyncio.gather(
+            _stored_buckets(daily, DAILY_KEYS), _stored_buckets(monthly, MONTHLY_KEYS)
+        )
+        results = await asyncio.gather(
+            _reconcile(daily, buckets, before[0], actual_daily, DAILY_KEYS),
+            _reconcile(monthly, _monthly_buckets(buckets), before[1], actual_monthly, MONTHLY_KEYS)
+        )
+        corrected += sum(n for n, _ in results)
+        if all(ok for _, ok in results):
+            consistent = True
+            break
+
+    if not consistent:
+        logger.warning(f"Rollups kept changing during {REBUILD_ATTEMPTS} rebuild attempts; "
+                       "run `python rollups.py verify` to check them")
+
+    # Atomic per document, so a bucket an $inc refills meanwhile no longer matches
+    await asyncio.gather(daily.delete_many({"count": 0}), monthly.delete_many({"count": 0}))
+
+    logger.info(f"Rollups rebuilt from {sum(c for _, c in buckets.values())} expenses, {corrected} buckets corrected")
+    return {
+        "daily_buckets": len(buckets),
+        "expenses": sum(c for _, c in buckets.values()),
+        "corrected_buckets": corrected,
+        "consistent": consistent
+    }
+
+
+def _compare(expected: dict, actual: dict, keys: list) -> list:
+    drift = []
+    for key in expected.keys() | actual.keys():
+        exp_sum, exp_count = expected.get(key, (0.0, 0))
+        act_sum, act_count = actual.get(key, (0.0, 0))
+        if exp_count != act_count or abs(exp_sum - act_sum) > SUM_TOLERANCE:
+            drift.append({
+                **dict(zip(keys, key)),
+                "expected": {"sum": exp_sum, "count": exp_count},
+                "actual": {"sum": act_sum, "count": act_count}
+            })
+    return drift
+
+
+async def verify(expenses, daily, monthly) -> dict:
+    """Compare rollups against a fresh recomputation and report every drifted bucket."""
+    expected_daily = await _raw_daily_buckets(expenses)
+    expected_monthly = _monthly_buckets(expected_daily)
+
+    actual_daily = {
+        tuple(d.get(k) for k in DAILY_KEYS): (d["sum"], d["count"])
+        async for d in daily.find({"count": {"$ne": 0}})
+    }
+    actual_monthly = {
+        tuple(d.get(k) for k in MONTHLY_KEYS): (d["sum"], d["count"])
+        async for d in monthly.find({"count": {"$ne": 0}})
+    }
+
+    daily_drift = _compare(expected_daily, actual_daily, DAILY_KEYS)
+    monthly_drift = _compare(expected_monthly, actual_monthly, MONTHLY_KEYS)
+
+    return {
+        "status": "ok" if not daily_drift and not monthly_drift else "drift",
+        "daily_drift": daily_drift,
+        "monthly_drift": monthly_drift
+    }
+
+
+async def ensure_built(expenses, daily, monthly):
+    """Build rollups on first start against a database that predates them
+    (or predates their partitioning by user)."""
+    if await daily.find_one({"user_id": {"$exists": False}}) is not None:
+        logger.info("Rollups are not partitioned by user; rebuilding from raw expenses")
+        await rebuild(expenses, daily, monthly)
+        return
+
+    await ensure_rollup_indexes(daily, monthly)
+
+    if await daily.find_one({}) is None and await expenses.find_one({}) is not None:
+        logger.info("Rollups missing; rebuilding from raw expenses")
+        await rebuild(expenses, daily, monthly)
+
+
+if __name__ == "__main__":
+    # python rollups.py rebuild | verify
+    import json
+    import sys
+    from db import expenses_collection, daily_rollups_collection, monthly_rollups_collection
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    collections = (expenses_collection, daily_rollups_collection, monthly_rollups_collection)
+
+    if command == "rebuild":
+        print(json.dumps(asyncio.run(rebuild(*collections)), indent=2))
+    elif command == "verify":
+        report = asyncio.run(verify(*collections))
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["status"] == "ok" else 1)
+    else:
+        print("Usage: python rollups.py [rebuild|verify]")
+        sys.exit(2)
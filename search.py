@@ -0,0 +1,65 @@
+import re
+from typing import Optional
+
+from dates import to_datetime
+
+# Fields covered by the text index and by search_terms
+TEXT_FIELDS = ("note", "subcategory", "category")
+# Relevance weights for the text index; a hit in the note counts most
+TEXT_WEIGHTS = {"note": 5, "subcategory": 2, "category": 1}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text) -> list:
+    """Lowercase word tokens of a string, in order, without duplicates."""
+    return list(dict.fromkeys(_WORD_RE.findall(str(text or "").lower())))
+
+
+def search_terms(expense: dict) -> list:
+    """Distinct lowercase words of an expense's text fields, stored for prefix search."""
+    return tokenize(" ".join(str(expense.get(field) or "") for field in TEXT_FIELDS))
+
+
+def build_query(user_id: str, text: str, prefix: bool = False, start: Optional[str] = None,
+                end: Optional[str] = None, min_amount: Optional[float] = None,
+                max_amount: Optional[float] = None) -> tuple:
+    """(filter, extra projection, sort) for one search, with every filter in the same query.
+
+    Word search uses the text index and ranks by relevance. Prefix search
+    matches each query word against the start of a stored search term
+    (anchored, so it walks the user_id + search_terms index) and ranks by
+    recency.
+    """
+    words = tokenize(text)
+    if not words:
+        raise ValueError("Search text must contain at least one word")
+
+    query = {"user_id": user_id}
+    if prefix:
+        query["$and"] = [{"search_terms": {"$regex": f"^{re.escape(word)}"}} for word in words]
+        projection = {}
+        sort = [("date_at", -1), ("_id", -1)]
+    else:
+        query["$text"] = {"$search": " ".join(words)}
+        projection = {"score": {"$meta": "textScore"}}
+        sort = [("score", {"$meta": "textScore"}), ("date_at", -1)]
+
+    if start or end:
+        query["date_at"] = {}
+        if start:
+            query["date_at"]["$gte"] = to_datetime(start)
+        if end:
+            query["date_at"]["$lte"] = to_datetime(end)
+
+    if min_amount is not None or max_amount is not None:
+        query["amount"] = {}
+        if min_amount is not None:
+            query["amount"]["$gte"] = float(min_amount)
+        if max_amount is not None:
+            query["amount"]["$lte"] = float(max_amount)
+
+    return query, projection, sort
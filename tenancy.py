@@ -0,0 +1,57 @@
+import os
+import re
+import hashlib
+import logging
+import contextvars
+from contextlib import contextmanager
+
+from mcp.server.auth.middleware.auth_context import get_access_token
+
+logger = logging.getLogger(__name__)
+
+# Owner of requests without an authenticated client, and of rows that predate user_id
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "default")
+
+# Set by background jobs that act on behalf of a specific user
+_acting_user = contextvars.ContextVar("acting_user", default=None)
+
+# User ids used verbatim as directory names; anything else is hashed
+_PLAIN_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+
+
+def current_user_id() -> str:
+    """User id for the current request.
+
+    Taken from the authenticated MCP client when the server runs with
+    auth, otherwise the default user, so a single-user deployment keeps
+    working unchanged.
+    """
+    acting = _acting_user.get()
+    if acting:
+        return acting
+
+    token = get_access_token()
+    if token is not None and token.client_id:
+        return token.client_id
+    return DEFAULT_USER_ID
+
+
+def user_dir(base: str, user_id: str) -> str:
+    """A user's own subdirectory of a shared directory (e.g. EXPORT_DIR).
+
+    Ids that are not a safe file name become "~" plus a hash, which no
+    plain id can collide with since "~" is not allowed in one.
+    """
+    if _PLAIN_ID.fullmatch(user_id):
+        return os.path.join(base, user_id)
+    return os.path.join(base, "~" + hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:24])
+
+
+@contextmanager
+def acting_as(user_id: str):
+    """Run a block (e.g. a background job) as a specific user."""
+    reset = _acting_user.set(user_id)
+    try:
+        yield
+    finally:
+        _acting_user.reset(reset)
@@ -0,0 +1,60 @@
+import pytest
+
+from budgets import ALL_CATEGORIES, alerts, per_expense, period_key
+
+
+def status(category, period, key, limit, spent, count, crossed=()):
+    return {"category": category, "period": period, "key": key, "limit": limit,
+            "spent": spent, "count": count, "crossed": list(crossed)}
+
+
+def expense(date, amount, category="food"):
+    return {"date": date, "amount": amount, "category": category}
+
+
+@pytest.mark.parametrize("period, date, expected", [
+    ("monthly", "2025-03-09", "2025-03"),
+    ("yearly", "2025-03-09", "2025"),
+    ("weekly", "2025-03-09", "2025-W10"),
+    # ISO weeks: Dec 29 2025 is in week 1 of 2026
+    ("weekly", "2025-12-29", "2026-W01"),
+])
+def test_period_key(period, date, expected):
+    assert period_key(period, date) == expected
+
+
+def test_per_expense_replays_the_batch_in_order():
+    # 70 spent before the batch; 5 + 10 + 20 takes it to 105, crossing 80% and 100%
+    statuses = [status("food", "monthly", "2025-03", 100, 105, 5, crossed=[0.8, 1.0])]
+    batch = [expense("2025-03-01", 5), expense("2025-03-02", 10), expense("2025-03-03", 20)]
+
+    own = per_expense(statuses, batch)
+
+    assert [[s["spent"] for s in statuses] for statuses in own] == [[75], [85], [105]]
+    assert [[s["count"] for s in statuses] for statuses in own] == [[3], [4], [5]]
+    assert [[s["crossed"] for s in statuses] for statuses in own] == [[[]], [[0.8]], [[1.0]]]
+    assert own[2][0]["over_budget"] and not own[1][0]["over_budget"]
+    assert own[1][0]["remaining"] == 15
+
+
+def test_per_expense_only_reports_budgets_an_expense_touches():
+    statuses = [
+        status("food", "monthly", "2025-03", 100, 30, 2),
+        status(ALL_CATEGORIES, "monthly", "2025-03", 500, 50, 3),
+    ]
+    batch = [expense("2025-03-01", 10), expense("2025-03-02", 20, "transport"), expense("2025-04-01", 7)]
+
+    own = per_expense(statuses, batch)
+
+    assert [(s["category"], s["spent"]) for s in own[0]] == [("food", 30), (ALL_CATEGORIES, 30)]
+    assert [(s["category"], s["spent"]) for s in own[1]] == [(ALL_CATEGORIES, 50)]
+    # Next month's counter was not part of the statuses
+    assert own[2] == []
+
+
+def test_alerts():
+    statuses = per_expense(
+        [status(ALL_CATEGORIES, "yearly", "2025", 1000, 850, 4, crossed=[0.8])],
+        [expense("2025-05-05", 100)]
+    )[0]
+    assert alerts(statuses) == ["Overall yearly budget (2025) reached 80%: 850.0 of 1000 spent, 150.0 remaining"]
@@ -0,0 +1,89 @@
+import os
+import json
+
+import pytest
+
+import catalog
+from catalog import CategoryCatalog, normalize_key
+
+CATEGORIES = {
+    "food": ["groceries", "dining_out", "other"],
+    "transport": ["fuel", "cab_ride_hailing", "other"],
+    "utilities": ["electricity", "other"],
+    "misc": ["other"],
+}
+
+
+@pytest.fixture
+def categories(tmp_path, monkeypatch):
+    # Re-check the file on every call so edits are picked up immediately
+    monkeypatch.setattr(catalog, "CHECK_INTERVAL", 0)
+    path = tmp_path / "category.json"
+    path.write_text(json.dumps(CATEGORIES), encoding="utf-8")
+    return CategoryCatalog(str(path))
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Food & Dining", "food_and_dining"),
+    ("  Bank-Fees ", "bank_fees"),
+    ("cab/ride hailing", "cab_ride_hailing"),
+])
+def test_normalize_key(name, expected):
+    assert normalize_key(name) == expected
+
+
+@pytest.mark.parametrize("category, subcategory, expected", [
+    # Canonical names, any case
+    ("food", "", ("food", "")),
+    ("FOOD", "Groceries", ("food", "groceries")),
+    # Aliases, some implying a subcategory
+    ("Food & Dining", "", ("food", "")),
+    ("restaurant", "", ("food", "dining_out")),
+    ("Uber", "", ("transport", "cab_ride_hailing")),
+    ("Bills & Utilities", "", ("utilities", "")),
+    ("miscellaneous", "", ("misc", "")),
+    # A subcategory that belongs to one category resolves on its own
+    ("groceries", "", ("food", "groceries")),
+    ("Electricity", "", ("utilities", "electricity")),
+    # An explicit subcategory wins over the one an alias implies
+    ("restaurant", "groceries", ("food", "groceries")),
+    # Subcategory given by alias
+    ("transport", "taxi", ("transport", "cab_ride_hailing")),
+    # Unknown subcategories are kept as given
+    ("food", "  Late night ", ("food", "Late night")),
+])
+def test_resolve(categories, category, subcategory, expected):
+    assert categories.resolve(category, subcategory) == expected
+
+
+def test_resolve_unknown_category(categories):
+    with pytest.raises(ValueError, match="Unknown category: crypto"):
+        categories.resolve("crypto")
+
+
+def test_aliases_to_missing_categories_are_ignored(categories):
+    # "healthcare" -> "health", which this catalog does not have
+    with pytest.raises(ValueError, match="Unknown category"):
+        categories.resolve("healthcare")
+
+
+def test_canonical_category(categories):
+    assert categories.canonical_category("Dining") == "food"
+    assert categories.canonical_category("Transportation") == "transport"
+    assert categories.canonical_category("crypto") == "crypto"
+
+
+def test_reloads_when_file_changes(categories, tmp_path):
+    with pytest.raises(ValueError):
+        categories.resolve("health")
+    (tmp_path / "category.json").write_text(json.dumps({**CATEGORIES, "health": ["medicines"]}), encoding="utf-8")
+    # Force a different mtime on filesystems with coarse timestamps
+    stat = (tmp_path / "category.json").stat()
+    os.utime(tmp_path / "category.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert categories.resolve("medical") == ("health", "")
+
+
+def test_missing_file_disables_validation(tmp_path):
+    missing = CategoryCatalog(str(tmp_path / "absent.json"))
+    assert missing.resolve("Anything", "goes") == ("Anything", "goes")
+    assert missing.current() == {}
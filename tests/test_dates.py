@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+
+import dates
+from dates import convert_date
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    dates._convert.cache_clear()
+    yield
+    dates._convert.cache_clear()
+
+
+@pytest.mark.parametrize("value, expected", [
+    # Strict ISO
+    ("2025-01-03", "2025-01-03"),
+    ("  2025-01-03 ", "2025-01-03"),
+    # Day first, 2- and 4-digit years
+    ("3/1/25", "2025-01-03"),
+    ("03/01/2025", "2025-01-03"),
+    ("3-1-2025", "2025-01-03"),
+    ("3.1.2025", "2025-01-03"),
+    # Year first with other separators
+    ("2025/01/03", "2025-01-03"),
+    ("2025.1.3", "2025-01-03"),
+    # Named months
+    ("Jan 3 2025", "2025-01-03"),
+    ("January 3rd, 2025", "2025-01-03"),
+    ("3 Jan 2025", "2025-01-03"),
+    ("3-Jan-2025", "2025-01-03"),
+    ("3rd January, 2025", "2025-01-03"),
+])
+def test_fast_path_formats(value, expected):
+    assert convert_date(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    # Impossible day first: retried month first by dateutil
+    ("12/31/2025", "2025-12-31"),
+    ("1/13/2025", "2025-01-13"),
+    # Year first beyond the bare ISO shape keeps year, month, day
+    ("2025-01-03 10:00", "2025-01-03"),
+    ("2025-01-03T10:00:00", "2025-01-03"),
+    ("20250103", "2025-01-03"),
+    ("2025/01/03 9am", "2025-01-03"),
+    # Other shapes stay day first
+    ("13 Jan 2025 10:00", "2025-01-13"),
+    ("03/01/2025 10:00", "2025-01-03"),
+])
+def test_dateutil_fallback(value, expected):
+    assert convert_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["31-02-2025", "2025-02-30", "notadate", "", "32/13/2025"])
+def test_invalid_dates(value):
+    with pytest.raises(ValueError, match="Invalid date format"):
+        convert_date(value)
+
+
+@pytest.mark.parametrize("value", [None, 20250103, datetime.date(2025, 1, 3)])
+def test_non_string_input(value):
+    with pytest.raises(ValueError, match="Invalid date format"):
+        convert_date(value)
+
+
+def test_two_digit_years_stay_within_fifty_years():
+    this_year = datetime.date.today().year
+    assert dates._expand_year(f"{this_year % 100:02d}") == this_year
+    assert dates._expand_year(f"{(this_year + 49) % 100:02d}") == this_year + 49
+    assert dates._expand_year(f"{(this_year + 50) % 100:02d}") == this_year - 50
+    assert dates._expand_year("2025") == 2025
+
+
+def test_results_are_memoized():
+    convert_date("Jan 3 2025")
+    convert_date(" Jan 3 2025 ")
+    info = dates._convert.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_native_round_trip():
+    value = dates.to_datetime("2025-01-03")
+    assert value == datetime.datetime(2025, 1, 3)
+    assert dates.from_datetime(value) == "2025-01-03"
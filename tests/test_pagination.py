@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from pagination import apply_cursor, clamp_page_size, decode_cursor, encode_cursor, parse_fields
+
+
+def test_cursor_round_trip():
+    doc = {"date_at": datetime.datetime(2025, 3, 9), "_id": ObjectId()}
+    token = encode_cursor(doc)
+    assert "=" not in token
+    assert decode_cursor(token) == (doc["date_at"], doc["_id"])
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not a cursor",
+    "eyJkIjoiMjAyNS0wMy0wOSJ9",  # {"d":"2025-03-09"}, no _id
+    "eyJkIjoiMjAyNS0wMy0wOSIsImkiOiJ4eXoifQ",  # {"d":"2025-03-09","i":"xyz"}
+])
+def test_decode_cursor_rejects_garbage(token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(token)
+
+
+def test_apply_cursor():
+    doc = {"date_at": datetime.datetime(2025, 3, 9), "_id": ObjectId()}
+    keyset = {"$or": [
+        {"date_at": {"$gt": doc["date_at"]}},
+        {"date_at": doc["date_at"], "_id": {"$gt": doc["_id"]}}
+    ]}
+    assert apply_cursor({"user_id": "u"}, None) == {"user_id": "u"}
+    assert apply_cursor({}, encode_cursor(doc)) == keyset
+    assert apply_cursor({"user_id": "u"}, encode_cursor(doc)) == {"$and": [{"user_id": "u"}, keyset]}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (50, 50), ("20", 20), (0, 1), (-5, 1), (10 ** 6, 1000), (None, 100), ("abc", 100),
+])
+def test_clamp_page_size(value, expected):
+    assert clamp_page_size(value) == expected
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("date, amount,date") == ["date", "amount"]
+    with pytest.raises(ValueError, match="Unknown field"):
+        parse_fields("date,user_id")
@@ -0,0 +1,88 @@
+import datetime
+
+import pytest
+
+from recurring import build_schedule, next_occurrence, occurrences, parse_cron
+
+D = datetime.date
+
+
+def test_parse_cron_fields():
+    cron = parse_cron("1,15 */3 *")
+    assert cron["days"] == {1, 15}
+    assert cron["months"] == {1, 4, 7, 10}
+    assert cron["weekdays"] == set(range(7))
+    assert not cron["any_day"] and cron["any_weekday"]
+
+
+def test_parse_cron_ignores_minute_and_hour():
+    assert parse_cron("30 9 1 * *") == parse_cron("1 * *")
+
+
+def test_parse_cron_sunday_is_0_or_7():
+    assert parse_cron("* * 7")["weekdays"] == {0}
+    assert parse_cron("* * 5-7")["weekdays"] == {5, 6, 0}
+
+
+@pytest.mark.parametrize("expr, message", [
+    ("*/0 * *", "step"),
+    ("* 1-12/0 *", "step"),
+    ("* * */-1", "step"),
+    ("0 * *", "outside 1-31"),
+    ("* 13 *", "outside 1-12"),
+    ("* 5-2 *", "outside 1-12"),
+    ("1 *", "expected"),
+])
+def test_parse_cron_rejects(expr, message):
+    with pytest.raises(ValueError, match=message):
+        parse_cron(expr)
+
+
+@pytest.mark.parametrize("day, on_or_after, expected", [
+    (15, D(2025, 1, 10), D(2025, 1, 15)),
+    (15, D(2025, 1, 15), D(2025, 1, 15)),
+    (15, D(2025, 1, 16), D(2025, 2, 15)),
+    # Short months fall on their last day
+    (31, D(2025, 2, 1), D(2025, 2, 28)),
+    (31, D(2024, 2, 1), D(2024, 2, 29)),
+    (31, D(2025, 4, 1), D(2025, 4, 30)),
+    (30, D(2025, 3, 1), D(2025, 3, 30)),
+    # Year rollover
+    (5, D(2025, 12, 6), D(2026, 1, 5)),
+])
+def test_next_occurrence_day_of_month(day, on_or_after, expected):
+    assert next_occurrence({"day_of_month": day}, on_or_after) == expected
+
+
+@pytest.mark.parametrize("cron, on_or_after, expected", [
+    # Mondays
+    ("* * 1", D(2025, 3, 5), D(2025, 3, 10)),
+    # Day and weekday both restricted: either one matches
+    ("13 * 5", D(2025, 6, 1), D(2025, 6, 6)),
+    ("13 * 5", D(2025, 6, 7), D(2025, 6, 13)),
+    # Only in February, and 29 only in leap years
+    ("29 2 *", D(2025, 1, 1), D(2028, 2, 29)),
+    ("28 2 *", D(2025, 3, 1), D(2026, 2, 28)),
+])
+def test_next_occurrence_cron(cron, on_or_after, expected):
+    assert next_occurrence({"cron": cron}, on_or_after) == expected
+
+
+def test_next_occurrence_cron_that_never_matches():
+    assert next_occurrence({"cron": "31 2 *"}, D(2025, 1, 1)) is None
+
+
+def test_occurrences_catch_up_and_end_date():
+    rule = {"schedule": {"day_of_month": 31}, "next_due": "2025-01-31", "end_date": "2025-04-15"}
+    assert occurrences(rule, D(2025, 12, 31)) == [D(2025, 1, 31), D(2025, 2, 28), D(2025, 3, 31)]
+    assert occurrences(rule, D(2025, 2, 27)) == [D(2025, 1, 31)]
+    assert occurrences({**rule, "next_due": None}, D(2025, 12, 31)) == []
+
+
+def test_build_schedule():
+    assert build_schedule(cron=" 1   *  * ") == {"cron": "1 * *"}
+    assert build_schedule(day_of_month="5") == {"day_of_month": 5}
+    with pytest.raises(ValueError, match="between 1 and 31"):
+        build_schedule(day_of_month=32)
+    with pytest.raises(ValueError, match="step"):
+        build_schedule(cron="*/0 * *")
@@ -0,0 +1,58 @@
+from result_cache import ResultCache
+
+
+def filled(**ranges) -> ResultCache:
+    cache = ResultCache(max_entries=16, max_bytes=1 << 20)
+    for key, (start, end) in ranges.items():
+        cache.put(key, {"key": key}, start, end, cache.generation)
+    return cache
+
+
+def test_invalidate_dates_evicts_only_ranges_containing_a_date():
+    cache = filled(jan=("2025-01-01", "2025-01-31"), feb=("2025-02-01", "2025-02-28"), q1=("2025-01-01", "2025-03-31"))
+    cache.invalidate_dates(["2025-02-14"])
+    assert cache.get("jan") is not None
+    assert cache.get("feb") is None
+    assert cache.get("q1") is None
+    assert cache.invalidations == 2
+
+
+def test_invalidate_dates_range_ends_are_inclusive():
+    cache = filled(jan=("2025-01-01", "2025-01-31"))
+    cache.invalidate_dates(["2025-02-01"])
+    assert cache.get("jan") is not None
+    cache.invalidate_dates(["2025-01-31"])
+    assert cache.get("jan") is None
+
+
+def test_invalidate_dates_open_ended_ranges():
+    cache = filled(everything=(None, None), since=("2025-06-01", None), until=(None, "2025-01-31"))
+    cache.invalidate_dates(["2025-03-01"])
+    assert cache.get("everything") is None
+    assert cache.get("since") is not None
+    assert cache.get("until") is not None
+
+
+def test_invalidate_dates_ignores_empty_dates():
+    cache = filled(jan=("2025-01-01", "2025-01-31"))
+    generation = cache.generation
+    cache.invalidate_dates([None, ""])
+    assert cache.get("jan") is not None
+    assert cache.generation == generation
+
+
+def test_results_computed_across_an_invalidation_are_not_stored():
+    cache = filled()
+    generation = cache.generation
+    cache.invalidate_dates(["2025-01-15"])
+    cache.put("jan", {"stale": True}, "2025-01-01", "2025-01-31", generation)
+    assert cache.get("jan") is None
+
+
+def test_invalidate_dates_frees_bytes():
+    cache = filled(jan=("2025-01-01", "2025-01-31"), feb=("2025-02-01", "2025-02-28"))
+    before = cache.stats()["bytes"]
+    cache.invalidate_dates(["2025-01-10", "2025-02-10"])
+    assert before > 0
+    assert cache.stats()["bytes"] == 0
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+from tenancy import user_dir
+
+
+@pytest.mark.parametrize("user_id", ["default", "client-42", "a.b_c"])
+def test_user_dir_plain_ids(user_id):
+    assert user_dir("exports", user_id) == os.path.join("exports", user_id)
+
+
+@pytest.mark.parametrize("user_id", ["../other", "a/b", ".hidden", "..", "", "x y"])
+def test_user_dir_unsafe_ids_stay_inside_base(user_id):
+    path = user_dir("exports", user_id)
+    assert os.path.dirname(path) == "exports"
+    assert os.path.basename(path).startswith("~")
+
+
+def test_user_dir_distinct_ids_get_distinct_dirs():
+    assert user_dir("exports", "a/b") != user_dir("exports", "a_b")
+    assert user_dir("exports", "a/b") != user_dir("exports", "a?b")
@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import logging
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, WriteError
+
+from metrics import LATENCY_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds the first insert of a batch waits for others to join it; 0 keeps one insert_one per call
+WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", 0))
+# A batch is flushed as soon as it holds this many inserts, without waiting out the window
+MAX_SIZE = int(os.getenv("WRITE_BATCH_MAX_SIZE", 100))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class WriteBatcher:
+    """Group commit for single-document inserts.
+
+    Concurrent `insert` calls are queued for up to `window_ms` (or until
+    `max_size` are waiting) and written with one unordered insert_many, so
+    N sessions adding an expense at once cost one round trip instead of N.
+    Each caller gets its own outcome: its _id, or the write error for its
+    document only. `after_insert` runs once per flush with the inserted
+    documents and returns one value per document, handed back to its caller.
+
+    Only used when `enabled`; with a zero window (the default) callers
+    keep writing with one insert_one per call.
+    """
+
+    def __init__(self, collection, after_insert=None, window_ms: float = WINDOW_MS, max_size: int = MAX_SIZE):
+        self.collection = collection
+        self.after_insert = after_insert
+        self.window_ms = window_ms
+        self.max_size = max(1, max_size)
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+
+        self.flushes = 0
+        self.documents = 0
+        self.errors = 0
+        self.reasons = {"size": 0, "window": 0, "drain": 0}
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.flush_latency = Histogram(LATENCY_BUCKETS)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_size > 1
+
+    async def insert(self, doc: dict) -> tuple:
+        """Queue one document for the next flush; returns (inserted _id, its after_insert value)."""
+        # Assigned up front, as insert_one would, so the id is known before the flush
+        doc.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_size:
+            self._flush_pending("size")
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_ms / 1000, self._flush_pending, "window")
+        return await future
+
+    def _flush_pending(self, reason: str):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._flush(batch, reason))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: list, reason: str):
+        t0 = time.perf_counter()
+        docs = [doc for doc, _ in batch]
+        failed = {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: only the documents listed in writeErrors were rejected
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = WriteError(error.get("errmsg"), error.get("code"), error)
+        except Exception as e:
+            failed = {i: e for i in range(len(batch))}
+
+        positions = [i for i in range(len(batch)) if i not in failed]
+        extras = {}
+        if positions and self.after_insert is not None:
+            try:
+                extras = dict(zip(positions, await self.after_insert([docs[i] for i in positions])))
+            except Exception as e:
+                logger.error(f"Error after batched insert: {e}")
+
+        self.flushes += 1
+        self.documents += len(batch)
+        self.errors += len(failed)
+        self.reasons[reason] += 1
+        self.batch_size.observe(len(batch))
+        self.flush_latency.observe(time.perf_counter() - t0)
+
+        for i, (doc, future) in enumerate(batch):
+            # A caller cancelled while waiting still had its document written
+            if future.done():
+                continue
+            if i in failed:
+                future.set_exception(failed[i])
+            else:
+                future.set_result((doc["_id"], extras.get(i)))
+
+    async def drain(self):
+        """Flush whatever is queued and wait for in-flight batches (used on shutdown)."""
+        self._flush_pending("drain")
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_size": self.max_size,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "documents": self.documents,
+            "errors": self.errors,
+            "flush_reasons": dict(self.reasons),
+            "mean_batch_size": round(self.documents / self.flushes, 2) if self.flushes else None,
+            "p50_batch_size": self.batch_size.quantile(0.5),
+            "p95_batch_size": self.batch_size.quantile(0.95),
+            "mean_flush_ms": round(self.flush_latency.sum / self.flushes * 1000, 3) if self.flushes else None,
+            "p95_flush_ms": round(self.flush_latency.quantile(0.95) * 1000, 3) if self.flushes else None
+        }
+
+    def render_prometheus(self) -> str:
+        """Flush metrics in the Prometheus text format, appended to /metrics."""
+        lines = [
+            "# HELP write_batch_flushes_total Batched insert_many flushes by trigger.",
+            "# TYPE write_batch_flushes_total counter",
+        ]
+        lines += [f'write_batch_flushes_total{{reason="{reason}"}} {count}' for reason, count in self.reasons.items()]
+        lines += [
+            "# HELP write_batch_documents_total Documents written through the batcher.",
+            "# TYPE write_batch_documents_total counter",
+            f"write_batch_documents_total {self.documents}",
+            "# HELP write_batch_errors_total Batched documents rejected by the server.",
+            "# TYPE write_batch_errors_total counter",
+            f"write_batch_errors_total {self.errors}",
+        ]
+        for metric, help_text, histogram in (
+            ("write_batch_size", "Documents per flush.", self.batch_size),
+            ("write_batch_flush_duration_seconds", "insert_many plus post-insert hooks per flush.", self.flush_latency),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for le, total in histogram.cumulative():
+                le_label = "+Inf" if le == float("inf") else f"{le:g}"
+                lines.append(f'{metric}_bucket{{le="{le_label}"}} {total}')
+            lines.append(f"{metric}_sum {histogram.sum:g}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"